@@ -8,8 +8,19 @@ from modules.pages import (
     build_drawer,
     home,
 )
-from modules.servers.utils import load_servers
+from modules.servers.utils import (
+    load_servers,
+    dedupe_server_jars,
+    collect_forge_libraries,
+    attach_detached_servers,
+    discover_java_runtimes,
+    full_stop,
+    start_metrics_db,
+    start_search_indexer,
+    start_watchdog,
+)
 from modules.utils import load_server_versions
+from modules.diagnostics import loop_monitor
 from modules.telemetry import TelemetryClient
 from appdirs import user_data_dir
 
@@ -27,8 +38,20 @@ class Main:
         """
         self.telemetry_client = TelemetryClient()
         app.add_static_files("/static", os.path.join(os.getcwd(), "static"))
+        # first, to catch whatever blocks the loop at startup
+        app.on_startup(loop_monitor.start)
         load_servers()
         load_server_versions()
+        app.on_startup(dedupe_server_jars)
+        app.on_startup(collect_forge_libraries)
+        app.on_startup(start_search_indexer)
+        app.on_startup(discover_java_runtimes)
+        app.on_startup(attach_detached_servers)
+        app.on_startup(start_watchdog)
+        app.on_startup(start_metrics_db)
+        # also stops the servers when the host shuts down (SIGTERM),
+        # detached servers are stopped by their runner
+        app.on_shutdown(full_stop)
 
         # V2 migration
         app_data_dir = user_data_dir("mcsc")
@@ -19,10 +19,110 @@ AVAILABLE_LANGAGUES = ["en", "it"]
 SERVERS_JSON_PATH = os.path.join(os.getcwd(), "config", "servers.json")
 JAR_VERSIONS_FILTER = "stable"  # "stable", "none"
 MAX_LOG_LINES = 300
+CONSOLE_FLUSH_RATE = 10  # console UI updates per second
+CONSOLE_READ_SIZE = 64 * 1024
+CONSOLE_MAX_LINE_LENGTH = 16 * 1024
+CONSOLE_DIR = os.path.join(os.getcwd(), "console")
+CONSOLE_RING_SIZE = 16 * 1024 * 1024  # bytes of console kept per session
+CONSOLE_SESSIONS_KEPT = 20
+SCROLLBACK_PAGE_SIZE = 500
+STARTUP_HISTORY_DIR = os.path.join(os.getcwd(), "startup")
+STARTUP_HISTORY_SIZE = 100
+STARTUP_BASELINE_RUNS = 5  # starts the regression baseline is computed on
+STARTUP_REGRESSION_THRESHOLD = 0.25  # 25% slower than the baseline
+STARTUP_REGRESSION_MIN_SECONDS = 2
+
+# SEARCH SETTINGS
+SEARCH_INDEX_PATH = os.path.join(os.getcwd(), "index", "search.db")
+SEARCH_SCAN_INTERVAL = 300  # seconds between scans of logs/
+SEARCH_MAX_RESULTS = 200
+PROVISIONING_WORKERS = 2
+PROVISIONING_HISTORY_SIZE = 50
+PROVISIONING_LOG_LINES = 500
+
+# CACHE SETTINGS
+CACHE_DIR = os.path.join(os.getcwd(), "cache")
+JAR_CACHE_DIR = os.path.join(CACHE_DIR, "jars")
+JAR_CACHE_MAX_SIZE_MB = 2048
+FORGE_LIBRARY_CACHE_DIR = os.path.join(CACHE_DIR, "forge")
+TEMPLATES_DIR = os.path.join(os.getcwd(), "templates")
+CDS_DIR = os.path.join(CACHE_DIR, "cds")
+CDS_ENABLED = True  # class data sharing archives (Java 13+)
+RUNTIMES_CACHE_PATH = os.path.join(CACHE_DIR, "runtimes.json")
+RUNTIMES_DIR = os.path.join(os.getcwd(), "runtimes")
+RUNTIME_ARCHIVES_DIR = os.path.join(RUNTIMES_DIR, "archives")  # JDK .zip/.tar.gz to install
 
 # SERVER EXECUTION SETTINGS
 JAVA_BIT_MODEL = "64"
 NOGUI = True
+CHECKPOINT_SAVE_TIMEOUT = 30  # seconds to wait for save-all before hibernating
+CHECKPOINT_TIMEOUT = 60  # seconds to wait for the JVM to write its image
+CHECKPOINT_RESTORE_TIMEOUT = 10  # seconds for a restored server to answer
+STOP_TIMEOUT = 60  # seconds a server has to save and stop before SIGTERM
+STOP_TERMINATE_TIMEOUT = 10  # seconds between SIGTERM and SIGKILL
+RUNNERS_DIR = os.path.join(os.getcwd(), "runners")  # detached servers state
+RUNNER_BACKLOG_SIZE = 1024 * 1024  # bytes of console replayed when re-attaching
+RUNNER_START_TIMEOUT = 10
+RUNNER_POLL_INTERVAL = 0.5
+MONITOR_INTERVAL = 1  # seconds between resource samples while a server page is open
+MONITOR_IDLE_INTERVAL = 5  # seconds between resource samples otherwise
+MONITOR_TICK = 0.5  # how often the sampler looks for samples that are due
+METRICS_RESOLUTIONS = [  # (seconds per point, points kept) of the resource usage history
+    (1, 3600),  # 1 hour
+    (60, 1440),  # 1 day
+    (3600, 720),  # 30 days
+]
+METRICS_CHART_POINTS = 300
+METRICS_LIVE_WINDOW = 3600  # longer chart windows are read from the database
+METRICS_DB_PATH = os.path.join(os.getcwd(), "metrics", "metrics.db")
+METRICS_DB_TIERS = [  # (seconds per row, seconds kept) of the persisted history
+    (10, 2 * 24 * 3600),
+    (60, 14 * 24 * 3600),
+    (3600, 400 * 24 * 3600),
+]
+METRICS_DB_FLUSH_INTERVAL = 10  # seconds between batched writes
+METRICS_DB_COMPACT_INTERVAL = 300
+
+# FLEET SETTINGS
+HOST_RESERVED_RAM_MB = 2048  # kept for the system and MCSC itself
+JVM_OVERHEAD_MB = 256  # native memory of a JVM besides its heap
+JVM_OVERHEAD_RATIO = 0.1  # ... plus this fraction of the heap
+ZGC_OVERHEAD_RATIO = 0.1  # extra for ZGC
+MODDED_OVERHEAD_MB = 512  # extra for Forge servers
+FLEET_MAX_CONCURRENT_BOOTS = 2
+FLEET_START_INTERVAL = 5  # seconds between two server starts
+FLEET_POLL_INTERVAL = 1
+
+# SUPERVISOR SETTINGS
+RESTART_HISTORY_DIR = os.path.join(os.getcwd(), "restarts")
+RESTART_HISTORY_SIZE = 100
+RESTART_BACKOFF_BASE = 5  # seconds before the first restart, doubled at each crash
+RESTART_BACKOFF_MAX = 300
+RESTART_STABLE_UPTIME = 600  # a server that ran this long is not crash looping
+CRASH_LOOP_COUNT = 5  # crashes in CRASH_LOOP_WINDOW seconds
+CRASH_LOOP_WINDOW = 900
+
+# DIAGNOSTICS SETTINGS
+LOOP_LAG_INTERVAL = 0.1  # seconds between event loop lag measures
+LOOP_LAG_HISTORY = 3000  # measures kept (5 minutes)
+SLOW_CALLBACK_THRESHOLD = 0.1  # seconds the loop can be blocked before it is recorded
+SLOW_CALLBACKS_KEPT = 200
+TRACEMALLOC_ENABLED = False  # trace MCSC allocations from the start (slower)
+TRACEMALLOC_FRAMES = 5
+TRACEMALLOC_INTERVAL = 60  # seconds between memory samples
+TRACEMALLOC_TOP = 20
+
+# WATCHDOG SETTINGS
+WATCHDOG_INTERVAL = 15
+WATCHDOG_SILENCE = 120  # seconds without console output before probing
+WATCHDOG_PING_TIMEOUT = 10
+WATCHDOG_FAILED_PINGS = 2  # unanswered probes before a server is not responding
+WATCHDOG_SAMPLES = 3  # thread dumps taken of a server that is not responding
+WATCHDOG_SAMPLE_INTERVAL = 5
+WATCHDOG_DUMP_TIMEOUT = 30
+WATCHDOG_STOP_TIMEOUT = 15  # a hung server can't save: don't wait long
+HANG_DUMPS_DIR = os.path.join(os.getcwd(), "hangs")
+HANG_REPORTS_SIZE = 20
 
 # URLS
 VANILLA_VERSION_LIST_URL = "https://raw.githubusercontent.com/ddavidel/minecraft-server-jars/refs/heads/main/versions/vanilla_version_list.json"
@@ -22,4 +22,25 @@ UPDATE_FILES = [
     {"filename": "logger.py", "path": "modules"},
     {"filename": "paper.py", "path": "modules/servers"},
     {"filename": "telemetry.py", "path": "modules"},
+    {"filename": "search.py", "path": "modules"},
+    {"filename": "cache.py", "path": "modules/servers"},
+    {"filename": "jobs.py", "path": "modules/servers"},
+    {"filename": "templates.py", "path": "modules/servers"},
+    {"filename": "console.py", "path": "modules/servers"},
+    {"filename": "scrollback.py", "path": "modules/servers"},
+    {"filename": "log_parser.py", "path": "modules/servers"},
+    {"filename": "startup.py", "path": "modules/servers"},
+    {"filename": "jvm.py", "path": "modules/servers"},
+    {"filename": "cds.py", "path": "modules/servers"},
+    {"filename": "checkpoint.py", "path": "modules/servers"},
+    {"filename": "runtimes.py", "path": "modules/servers"},
+    {"filename": "admission.py", "path": "modules/servers"},
+    {"filename": "supervisor.py", "path": "modules/servers"},
+    {"filename": "runner.py", "path": "modules/servers"},
+    {"filename": "detached.py", "path": "modules/servers"},
+    {"filename": "watchdog.py", "path": "modules/servers"},
+    {"filename": "metrics.py", "path": "modules/servers"},
+    {"filename": "metrics_db.py", "path": "modules/servers"},
+    {"filename": "exporter.py", "path": "modules/servers"},
+    {"filename": "diagnostics.py", "path": "modules"},
 ]
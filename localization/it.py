@@ -77,4 +77,141 @@ translations = {
     "There are still servers running. Are you sure you want to quit?" : "Ci sono ancora server in esecuzione. Sei sicuro di voler uscire?",
     "No, take me back": "No, riportami indietro",
     "Yes, quit": "Si, esci",
+    "Queued": "In coda",
+    "Cancelled": "Annullato",
+    "Creating server folder": "Creazione cartella del server",
+    "Downloading server jar": "Download del jar del server",
+    "Accepting EULA": "Accettazione EULA",
+    "Installing Forge": "Installazione di Forge",
+    "Setting JVM arguments": "Impostazione argomenti JVM",
+    "Jobs": "Attività",
+    "No jobs yet": "Nessuna attività",
+    "Linking shared libraries": "Collegamento librerie condivise",
+    "Sharing libraries": "Condivisione librerie",
+    "Cloning template": "Clonazione modello",
+    "Template not found": "Modello non trovato",
+    "Template": "Modello",
+    "Save as template": "Salva come modello",
+    "Saving template {name}": "Salvataggio modello {name}",
+    "Template name": "Nome del modello",
+    "Template name can't be empty": "Il nome del modello non può essere vuoto",
+    "Template saved!": "Modello salvato!",
+    "Include world": "Includi mondo",
+    "New servers can be created from this server's files instantly.": "I nuovi server possono essere creati istantaneamente dai file di questo server.",
+    "Stop the server before saving it as a template": "Ferma il server prima di salvarlo come modello",
+    "{lines} lines/s, {kb} KB/s": "{lines} righe/s, {kb} KB/s",
+    "Console history": "Cronologia terminale",
+    "Session": "Sessione",
+    "Lines {start}-{end} of {total}": "Righe {start}-{end} di {total}",
+    "Search logs": "Cerca nei log",
+    "Search": "Cerca",
+    "Servers": "Server",
+    "{count} results": "{count} risultati",
+    "Time": "Ora",
+    "Server": "Server",
+    "Source": "Origine",
+    "Line": "Riga",
+    "Startup history": "Cronologia avvii",
+    "The server has not been started yet": "Il server non è ancora stato avviato",
+    "Ready": "Pronto",
+    "First output": "Primo output",
+    "Baseline": "Riferimento",
+    "Plugins/mods": "Plugin/mod",
+    "Version": "Versione",
+    "JVM flags": "Flag JVM",
+    "Slower than usual ({changes})": "Più lento del solito ({changes})",
+    "JVM settings": "Impostazioni JVM",
+    "Garbage collector flags. Applied the next time the server starts.": "Flag del garbage collector. Applicati al prossimo avvio del server.",
+    "JVM profile": "Profilo JVM",
+    "Large pages": "Pagine grandi",
+    "Backs the heap with huge pages": "Usa pagine di memoria grandi per l'heap",
+    "Pre-touch heap": "Pre-alloca heap",
+    "Commits all the RAM at startup: slower start, steadier ticks": "Alloca tutta la RAM all'avvio: avvio più lento, tick più stabili",
+    "Automatic heap": "Heap automatico",
+    "Sizes the heap from the server type and the device RAM instead of Dedicated RAM": "Dimensiona l'heap in base al tipo di server e alla RAM del dispositivo invece della RAM dedicata",
+    "Class data sharing saves {seconds}s per start": "La condivisione dei dati delle classi fa risparmiare {seconds}s per avvio",
+    "Instant start": "Avvio istantaneo",
+    "Idle servers are hibernated when stopped and restored in about a second. Needs a CRaC JDK on Linux.": "I server inattivi vengono ibernati quando fermati e ripristinati in circa un secondo. Richiede una JDK con CRaC su Linux.",
+    "Java runtime": "Runtime Java",
+    "Empty: the best installed runtime for the server version": "Vuoto: il miglior runtime installato per la versione del server",
+    "{path} (not found)": "{path} (non trovato)",
+    "{count} runtimes installed": "{count} runtime installati",
+    "No Java runtime found": "Nessun runtime Java trovato",
+    "Java runtimes": "Runtime Java",
+    "JDK archives (.zip, .tar.gz) placed in {path} can be installed.": "Gli archivi JDK (.zip, .tar.gz) messi in {path} possono essere installati.",
+    "Rescan": "Cerca di nuovo",
+    "Install from archives": "Installa dagli archivi",
+    "Needs {need} MB, the host can give servers {budget} MB": "Servono {need} MB, l'host può dare ai server {budget} MB",
+    "Waiting for other servers to boot": "In attesa dell'avvio di altri server",
+    "Waiting to stagger boots": "In attesa per scaglionare gli avvii",
+    "Waiting for RAM ({need} MB needed, {free} MB free)": "In attesa di RAM ({need} MB richiesti, {free} MB liberi)",
+    "{count} servers queued": "{count} server in coda",
+    "{committed} of {budget} MB committed": "{committed} di {budget} MB impegnati",
+    "Start queue": "Coda di avvio",
+    "No servers waiting": "Nessun server in attesa",
+    "Groups": "Gruppi",
+    "Group": "Gruppo",
+    "Set a group in the server settings to start servers together": "Imposta un gruppo nelle impostazioni del server per avviare i server insieme",
+    "Servers that can run together": "Server che possono essere eseguiti insieme",
+    "All servers need {demand} MB": "Tutti i server richiedono {demand} MB",
+    "Set {index}: {names} - {used} MB": "Insieme {index}: {names} - {used} MB",
+    "{name} needs {size} MB and can't run on this host": "{name} richiede {size} MB e non può essere eseguito su questo host",
+    "Fleet": "Flotta",
+    "Start all": "Avvia tutti",
+    "Restarting": "Riavvio in corso",
+    "Restart history": "Cronologia riavvii",
+    "Crashed": "Crash",
+    "Out of memory": "Memoria esaurita",
+    "Killed by the OOM killer": "Terminato dall'OOM killer",
+    "Killed": "Terminato",
+    "Failed to start": "Avvio fallito",
+    "Restarted": "Riavviato",
+    "Crash loop: not restarted": "Crash ripetuti: non riavviato",
+    "Restarted after {delay}s": "Riavviato dopo {delay}s",
+    "Exit": "Uscita",
+    "Exit code": "Codice di uscita",
+    "Uptime": "Tempo di attività",
+    "Action": "Azione",
+    "Restart on crash": "Riavvia in caso di crash",
+    "Restarts the server if it crashes or runs out of memory": "Riavvia il server se va in crash o esaurisce la memoria",
+    "Stopping servers...": "Arresto dei server...",
+    "Stopping servers ({stopped}/{total})": "Arresto dei server ({stopped}/{total})",
+    "Detached": "Separato",
+    "Keeps the server running when MCSC is closed or updated": "Mantiene il server in esecuzione quando MCSC viene chiuso o aggiornato",
+    "Not responding": "Non risponde",
+    "Restart when hung": "Riavvia se bloccato",
+    "Kills the server if it stops responding, so that it is restarted": "Termina il server se smette di rispondere, così che venga riavviato",
+    "Hang reports": "Rapporti di blocco",
+    "The server never stopped responding": "Il server non ha mai smesso di rispondere",
+    "Server thread stuck ({state}) at {frame}": "Server thread bloccato ({state}) in {frame}",
+    "Server thread not stuck": "Server thread non bloccato",
+    "No thread dump could be taken": "Non è stato possibile acquisire un thread dump",
+    "Threads": "Thread",
+    "Open files": "File aperti",
+    "5 minutes": "5 minuti",
+    "1 hour": "1 ora",
+    "6 hours": "6 ore",
+    "1 day": "1 giorno",
+    "7 days": "7 giorni",
+    "30 days": "30 giorni",
+    "Min": "Min",
+    "Max": "Max",
+    "Average": "Media",
+    "Players": "Giocatori",
+    "Diagnostics": "Diagnostica",
+    "Event loop lag": "Ritardo dell'event loop",
+    "Worst offenders": "Maggiori responsabili",
+    "Clear": "Pulisci",
+    "Nothing blocked the event loop for more than {ms}ms": "Niente ha bloccato l'event loop per più di {ms}ms",
+    "{culprit}: {count} times, {total}s in total, longest {max}s": "{culprit}: {count} volte, {total}s in totale, la più lunga {max}s",
+    "MCSC memory": "Memoria di MCSC",
+    "Resident memory: {mb} MB": "Memoria residente: {mb} MB",
+    "Start tracing to see where memory is allocated": "Avvia il tracciamento per vedere dove viene allocata la memoria",
+    "Waiting for the next memory sample": "In attesa del prossimo campione di memoria",
+    "Allocated at": "Allocata in",
+    "Blocks": "Blocchi",
+    "Stop tracing": "Ferma tracciamento",
+    "Start tracing": "Avvia tracciamento",
+    "Event loop lag: {current}ms now, p50 {p50}ms, p99 {p99}ms, max {max}ms": "Ritardo dell'event loop: {current}ms ora, p50 {p50}ms, p99 {p99}ms, max {max}ms",
+    "Forge installer failed with exit code {code}": "L'installer di Forge è fallito con codice {code}",
 }
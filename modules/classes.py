@@ -3,8 +3,12 @@ Classes
 """
 
 import asyncio
+import threading
+import time
+
 import psutil
 
+from config import settings as mcssettings
 from modules.logger import RotatingLogger
 
 
@@ -13,17 +17,22 @@ logger = RotatingLogger()
 
 class ProcessMonitor:
     """
-    Monitor a process system resource usage
+    Monitor a process system resource usage.
+    The values are sampled by the shared resource_sampler.
     """
 
-    def __init__(self, process=None, interval: int = 1):
+    def __init__(self, process=None, interval: int = mcssettings.MONITOR_INTERVAL):
         self.process = process
         self.interval = interval
         self.active = False
+        self.watchers = 0
+        self.subscribers = []
         self.ram_usage = 0
         self.cpu_usage = 0
         self.disk_read = 0
         self.disk_write = 0
+        self.threads = 0
+        self.open_files = 0
         logger.info(f"{self} initialized")
 
     def __repr__(self):
@@ -31,85 +40,219 @@ class ProcessMonitor:
             return f"ProcessMonitor(pid={self.process.pid}, active={self.active})"
         return f"ProcessMonitor(active={self.active})"
 
-    def stop(self):
-        """Stop monitoring the process"""
-        self.active = False
+    @property
+    def sample_interval(self) -> float:
+        """Seconds between samples: short while someone looks at the values"""
+        return self.interval if self.watchers else mcssettings.MONITOR_IDLE_INTERVAL
+
+    def watch(self):
+        """Samples faster until unwatch is called (a page shows the values)"""
+        self.watchers += 1
+        resource_sampler.wake()
+
+    def unwatch(self):
+        """Undoes watch"""
+        self.watchers = max(self.watchers - 1, 0)
+
+    def subscribe(self, callback):
+        """Registers callback(snapshot: dict), called on the event loop with every sample"""
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Removes a subscriber"""
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def _reset(self):
         self.ram_usage = 0
         self.cpu_usage = 0
         self.disk_read = 0
         self.disk_write = 0
-        logger.info(f"{self} stopped")
+        self.threads = 0
+        self.open_files = 0
 
-    async def run(self):
-        """Start monitoring the process"""
-        if not self.process:
-            logger.warning("No process to monitor. Use the 'process' attribute to set one.")
+    def start(self, process):
+        """Start monitoring the process. Must be called from the event loop."""
+        if self.active:
+            self.stop()
+        self.process = process
+        self.active = True
+        resource_sampler.add(self)
+        logger.info(f"{self} started")
+
+    def stop(self):
+        """Stop monitoring the process"""
+        if not self.active:
             return
+        resource_sampler.remove(self)
+        self.active = False
+        self._reset()
+        logger.info(f"{self} stopped")
 
-        if self.active:
+    def publish(self, snapshot: dict):
+        """Stores a sample taken by the sampler. Runs on the event loop."""
+        if not self.active:
+            # stopped while the sample was on its way
             return
+        for name, value in snapshot.items():
+            setattr(self, name, value)
+        for callback in self.subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Error in monitor subscriber {callback}: {e}")
 
-        try:
-            proc = psutil.Process(self.process.pid)
-
-            prev_disk_read = 0
-            prev_disk_write = 0
-
-            logger.info(f"{self} started")
-
-            while self.process.returncode is None:
-                self.active = True
-                # Get all child processes
-                children = proc.children(recursive=True)
-
-                # RAM usage in MB (sum of parent and children)
-                self.ram_usage = round(
-                    (
-                        proc.memory_info().rss
-                        + sum(child.memory_info().rss for child in children)
-                    )
-                    / (1024 * 1024),
-                    2,
-                )
-
-                # CPU usage as a percentage (sum of parent and children)
-                self.cpu_usage = round(
-                    proc.cpu_percent(interval=0.1)
-                    + sum(child.cpu_percent(interval=0.1) for child in children),
-                    2,
-                )
-
-                # Disk I/O (read and write in MB, current cycle)
-                io_counters = proc.io_counters()
-                current_disk_read = io_counters.read_bytes
-                current_disk_write = io_counters.write_bytes
-                for child in children:
-                    child_io = child.io_counters()
-                    current_disk_read += child_io.read_bytes
-                    current_disk_write += child_io.write_bytes
-
-                # Calculate current cycle usage
-                self.disk_read = round(
-                    (current_disk_read - prev_disk_read) / (1024 * 1024), 2
-                )
-                self.disk_write = round(
-                    (current_disk_write - prev_disk_write) / (1024 * 1024), 2
-                )
-
-                # Update previous values
-                prev_disk_read = current_disk_read
-                prev_disk_write = current_disk_write
-
-                await asyncio.sleep(self.interval)
 
+class ProcessTree:
+    """
+    psutil handles of a process and its children, kept between samples:
+    cpu_percent and I/O rates are measured against the previous sample.
+    """
+
+    def __init__(self, pid: int):
+        self.root = psutil.Process(pid)
+        self.processes = {pid: self.root}
+        self.last_sample = None
+        self.last_io = None
+
+    def refresh(self):
+        """Tracks children started or gone since the previous sample"""
+        current = {self.root.pid: self.root}
+        for child in self.root.children(recursive=True):
+            # reuse the handle so cpu_percent keeps its baseline
+            current[child.pid] = self.processes.get(child.pid, child)
+        self.processes = current
+
+    def sample(self) -> dict:
+        """CPU, RAM, I/O rates, threads and open files of the whole tree"""
+        self.refresh()
+        now = time.monotonic()
+        ram = cpu = read_bytes = write_bytes = threads = open_files = 0
+        for process in self.processes.values():
+            try:
+                with process.oneshot():
+                    ram += process.memory_info().rss
+                    cpu += process.cpu_percent(interval=None)
+                    threads += process.num_threads()
+                    if hasattr(process, "num_fds"):
+                        open_files += process.num_fds()
+                    else:
+                        open_files += process.num_handles()
+                    if hasattr(process, "io_counters"):
+                        io_counters = process.io_counters()
+                        read_bytes += io_counters.read_bytes
+                        write_bytes += io_counters.write_bytes
+            except psutil.NoSuchProcess:
+                if process is self.root:
+                    raise
+            except psutil.AccessDenied:
+                pass
+
+        disk_read = disk_write = 0
+        if self.last_io is not None:
+            elapsed = max(now - self.last_sample, 1e-3)
+            # a child that exited takes its counters away
+            disk_read = max(read_bytes - self.last_io[0], 0) / elapsed
+            disk_write = max(write_bytes - self.last_io[1], 0) / elapsed
+        self.last_sample = now
+        self.last_io = (read_bytes, write_bytes)
+
+        return {
+            "ram_usage": round(ram / (1024 * 1024), 2),
+            "cpu_usage": round(cpu, 2),
+            "disk_read": round(disk_read / (1024 * 1024), 2),
+            "disk_write": round(disk_write / (1024 * 1024), 2),
+            "threads": threads,
+            "open_files": open_files,
+        }
+
+
+class ResourceSampler:
+    """
+    Samples every monitored process tree from a single worker thread,
+    so psutil calls never block the event loop. Each monitor is sampled
+    at its own interval and gets its values back on the event loop.
+    """
+
+    def __init__(self, tick: float = mcssettings.MONITOR_TICK):
+        self.tick = tick
+        self._monitors = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._loop = None
+
+    def __repr__(self):
+        return f"ResourceSampler(monitors={len(self._monitors)})"
+
+    def add(self, monitor: ProcessMonitor):
+        """Starts sampling a monitor. Must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            # tree handles are created by the worker, first sample right away
+            self._monitors[monitor] = {"tree": None, "due": 0, "last": 0}
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="resource-sampler", daemon=True
+            )
+            self._thread.start()
+        self.wake()
+
+    def remove(self, monitor: ProcessMonitor):
+        """Stops sampling a monitor"""
+        with self._lock:
+            self._monitors.pop(monitor, None)
+
+    def wake(self):
+        """Makes the worker check the intervals again now"""
+        self._wakeup.set()
+
+    def _sample(self, monitor: ProcessMonitor, entry: dict) -> dict | None:
+        """Samples a monitor, None if its process is gone"""
+        process = monitor.process
+        if process is None or process.returncode is not None:
+            return None
+        try:
+            if entry["tree"] is None or entry["tree"].root.pid != process.pid:
+                entry["tree"] = ProcessTree(process.pid)
+            return entry["tree"].sample()
         except psutil.NoSuchProcess:
-            logger.info("The process has exited.")
-            self.active = False
+            return None
+
+    def _run(self):
+        """Worker loop: one pass over the monitors that are due every tick"""
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                if not self._monitors:
+                    self._thread = None
+                    return
+                due = []
+                for monitor, entry in self._monitors.items():
+                    # a newly watched monitor must not wait out its idle interval
+                    entry["due"] = min(entry["due"], entry["last"] + monitor.sample_interval)
+                    if entry["due"] <= now:
+                        due.append((monitor, entry))
+
+            for monitor, entry in due:
+                try:
+                    snapshot = self._sample(monitor, entry)
+                except Exception as e:
+                    logger.error(f"Error monitoring process: {e}")
+                    snapshot = None
+                entry["last"] = now
+                entry["due"] = now + monitor.sample_interval
+                if snapshot is None:
+                    # exited: the server clears the values once it has noticed
+                    continue
+                try:
+                    self._loop.call_soon_threadsafe(monitor.publish, snapshot)
+                except RuntimeError:
+                    # the event loop is closed: the app is shutting down
+                    return
+
+            self._wakeup.wait(self.tick)
 
-        except Exception as e:
-            logger.error(f"Error monitoring process: {e}")
-            self.active = False
 
-        finally:
-            if self.active:
-                self.stop()
+resource_sampler = ResourceSampler()
@@ -0,0 +1,219 @@
+"""
+Event loop diagnostics: lag, stalls and MCSC memory
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import deque
+
+import psutil
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+APP_ROOT = os.getcwd()
+
+
+def _is_app_file(filename: str) -> bool:
+    """True for MCSC's own source files (not the standard library or packages)"""
+    path = os.path.abspath(filename)
+    return (
+        path.startswith(APP_ROOT + os.sep)
+        and "site-packages" not in path
+        and os.sep + "venv" + os.sep not in path
+    )
+
+
+def culprit(frames: list[traceback.FrameSummary]) -> str:
+    """
+    Innermost MCSC frame of a stack: the code that made the blocking call.
+    Falls back to the innermost frame.
+    """
+    for frame in reversed(frames):
+        if _is_app_file(frame.filename):
+            return _location(frame, os.path.relpath(frame.filename, APP_ROOT))
+    if frames:
+        return _location(frames[-1], frames[-1].filename)
+    return "?"
+
+
+def _location(frame: traceback.FrameSummary, filename: str) -> str:
+    location = f"{filename}:{frame.lineno}"
+    return f"{location} ({frame.name})" if frame.name else location
+
+
+class LoopMonitor:
+    """
+    Measures the event loop lag and catches what blocks the loop.
+    A task on the loop sleeps for a short interval and records how late
+    it wakes up; a watcher thread notices when the loop stops beating
+    and takes the stack of the loop thread, which shows the blocking call.
+    Optionally samples tracemalloc for the biggest allocations of MCSC.
+    """
+
+    def __init__(
+        self,
+        interval: float = mcssettings.LOOP_LAG_INTERVAL,
+        threshold: float = mcssettings.SLOW_CALLBACK_THRESHOLD,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=mcssettings.LOOP_LAG_HISTORY)
+        self.stalls = deque(maxlen=mcssettings.SLOW_CALLBACKS_KEPT)
+        self.offenders = {}
+        self.allocations = []
+        self.rss_mb = 0
+        self._beat = None
+        self._loop_thread_id = None
+        self._task = None
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"LoopMonitor(stalls={len(self.stalls)}, tracing={self.tracing})"
+
+    @property
+    def tracing(self) -> bool:
+        """True while tracemalloc records allocations"""
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """Starts measuring. Must be called from the event loop."""
+        if self._task and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._measure())
+        self._watcher = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watcher.start()
+        if mcssettings.TRACEMALLOC_ENABLED:
+            self.start_tracing()
+        logger.info(f"{self} started")
+
+    def start_tracing(self):
+        """Starts recording allocations (slows MCSC down a little)"""
+        if not self.tracing:
+            tracemalloc.start(mcssettings.TRACEMALLOC_FRAMES)
+            logger.info("Memory tracing started")
+
+    def stop_tracing(self):
+        """Stops recording allocations and frees the traces"""
+        if self.tracing:
+            tracemalloc.stop()
+            self.allocations = []
+            logger.info("Memory tracing stopped")
+
+    async def _measure(self):
+        """Wakes up every interval and records how late it is"""
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            self.lags.append((time.time(), max(now - before - self.interval, 0)))
+
+    def _watch(self):
+        """Catches the loop while it is stuck, from a separate thread"""
+        stall = None
+        next_memory_sample = 0
+        while True:
+            time.sleep(self.threshold / 2)
+            now = time.monotonic()
+            late = now - self._beat - self.interval
+
+            if stall and self._beat != stall["beat"]:
+                # the loop is running again
+                self._record(stall, self._beat - stall["beat"] - self.interval)
+                stall = None
+            if stall is None and late > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)  # pylint: disable=protected-access
+                frames = traceback.extract_stack(frame) if frame else []
+                stall = {"beat": self._beat, "time": time.time() - late, "frames": frames}
+
+            if now >= next_memory_sample:
+                next_memory_sample = now + mcssettings.TRACEMALLOC_INTERVAL
+                self._sample_memory()
+
+    def _record(self, stall: dict, duration: float):
+        """Stores a stall and adds it to its offender"""
+        frames = stall["frames"]
+        record = {
+            "time": stall["time"],
+            "duration": round(duration, 3),
+            "culprit": culprit(frames),
+            "stack": "".join(traceback.format_list(frames)),
+        }
+        logger.warning(
+            f"Event loop blocked for {record['duration']}s by {record['culprit']}"
+        )
+        with self._lock:
+            self.stalls.append(record)
+            offender = self.offenders.setdefault(
+                record["culprit"], {"count": 0, "total": 0, "max": 0, "stack": ""}
+            )
+            offender["count"] += 1
+            offender["total"] = round(offender["total"] + duration, 3)
+            if duration >= offender["max"]:
+                offender["max"] = round(duration, 3)
+                offender["stack"] = record["stack"]
+
+    def _sample_memory(self):
+        try:
+            self.rss_mb = round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+        except psutil.Error:
+            pass
+        if not self.tracing:
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        self.allocations = [
+            {
+                "where": culprit(
+                    [
+                        traceback.FrameSummary(frame.filename, frame.lineno, "")
+                        for frame in stat.traceback
+                    ]
+                ),
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("traceback")[: mcssettings.TRACEMALLOC_TOP]
+        ]
+
+    def lag_stats(self) -> dict:
+        """Current, p50, p99 and max lag in milliseconds"""
+        lags = sorted(lag for _time, lag in list(self.lags))
+        if not lags:
+            return {"current": 0, "p50": 0, "p99": 0, "max": 0}
+        return {
+            "current": round(self.lags[-1][1] * 1000, 1),
+            "p50": round(lags[len(lags) // 2] * 1000, 1),
+            "p99": round(lags[min(int(len(lags) * 0.99), len(lags) - 1)] * 1000, 1),
+            "max": round(lags[-1] * 1000, 1),
+        }
+
+    def worst_offenders(self, limit: int = 20) -> list[dict]:
+        """Code that blocked the loop the longest in total"""
+        with self._lock:
+            offenders = [
+                {"culprit": name, **offender} for name, offender in self.offenders.items()
+            ]
+        return sorted(offenders, key=lambda offender: offender["total"], reverse=True)[:limit]
+
+    def clear(self):
+        """Forgets the stalls recorded so far"""
+        with self._lock:
+            self.stalls.clear()
+            self.offenders.clear()
+
+
+loop_monitor = LoopMonitor()
@@ -3,13 +3,20 @@ Pages
 """
 
 import asyncio
-from nicegui import ui, html
+import time
+from datetime import datetime
+from fastapi.responses import PlainTextResponse
+from nicegui import app, ui, html
 
 from config import settings as mcssettings
 
 from modules.utils import (
     popup_create_server,
     popup_edit_server,
+    popup_fleet,
+    popup_jobs,
+    popup_runtimes,
+    popup_save_template,
     write_to_console_and_clean,
     popup_delete_server,
     shutdown,
@@ -17,10 +24,24 @@ from modules.utils import (
     popup_app_settings,
     open_file_explorer,
     minimize_window,
+    start_servers,
 )
-from modules.servers.models import MinecraftServer, get_server_list
+from modules.servers.models import (
+    MinecraftServer,
+    STARTING,
+    READY,
+    RESTARTING,
+    STOPPED,
+    get_server_list,
+)
+from modules.servers.exporter import CONTENT_TYPE, render_metrics
+from modules.servers.metrics_db import metrics_db
 from modules.servers.paper import PaperServer
+from modules.servers.supervisor import supervisor
+from modules.servers.watchdog import watchdog
 from modules.servers.utils import get_server_by_uuid, FILE_TO_ATTR
+from modules.search import search_index
+from modules.diagnostics import loop_monitor
 from modules.translations import translate as _
 from modules.logger import RotatingLogger
 from update import check_for_updates
@@ -95,6 +116,31 @@ def build_drawer():
             on_click=home.refresh,
             icon="space_dashboard",
         ).classes("drawer-button")
+        ui.button(
+            _("Search logs"),
+            on_click=lambda x: ui.navigate.to("/search"),
+            icon="search",
+        ).classes("drawer-button")
+        ui.button(
+            _("Jobs"),
+            on_click=popup_jobs().open,
+            icon="pending_actions",
+        ).classes("drawer-button")
+        ui.button(
+            _("Fleet"),
+            on_click=popup_fleet().open,
+            icon="dns",
+        ).classes("drawer-button")
+        ui.button(
+            _("Java runtimes"),
+            on_click=popup_runtimes().open,
+            icon="coffee",
+        ).classes("drawer-button")
+        ui.button(
+            _("Diagnostics"),
+            on_click=lambda x: ui.navigate.to("/diagnostics"),
+            icon="monitor_heart",
+        ).classes("drawer-button")
 
         # Split the buttons
         ui.space()
@@ -154,13 +200,17 @@ def server_detail(uuid: str):
         ).classes("circular-button"):
             ui.tooltip(_("Open server folder")).style("font-size: 15px;")
         with ui.button_group().style("margin-top: 15px"):
-            ui.button(_("Start"), icon="play_arrow").on_click(server.start).classes(
+            ui.button(_("Start"), icon="play_arrow").on_click(
+                lambda x: start_servers([server])
+            ).classes(
                 "start-button"
-            ).bind_enabled_from(server, "running", lambda s: not s)
+            ).bind_enabled_from(server, "state", lambda s: s == STOPPED)
 
             ui.button(icon="stop").on_click(server.stop).classes(
                 "stop-button"
-            ).bind_enabled_from(server, "running")
+            ).bind_enabled_from(
+                server, "state", lambda s: s in (STARTING, READY, RESTARTING)
+            )
 
     with ui.left_drawer(top_corner=True, fixed=True).classes("left-drawer"):
         ui.label(_("Settings")).style("font-size: 35px")
@@ -169,6 +219,26 @@ def server_detail(uuid: str):
             on_click=None,
             icon="terminal",
         ).classes("drawer-button")
+        ui.button(
+            _("Console history"),
+            on_click=lambda x: ui.navigate.to(f"/scrollback/{server.uuid}"),
+            icon="history",
+        ).classes("drawer-button")
+        ui.button(
+            _("Startup history"),
+            on_click=lambda x: ui.navigate.to(f"/startup/{server.uuid}"),
+            icon="timer",
+        ).classes("drawer-button")
+        ui.button(
+            _("Restart history"),
+            on_click=lambda x: ui.navigate.to(f"/restarts/{server.uuid}"),
+            icon="restart_alt",
+        ).classes("drawer-button")
+        ui.button(
+            _("Hang reports"),
+            on_click=lambda x: ui.navigate.to(f"/hangs/{server.uuid}"),
+            icon="hourglass_disabled",
+        ).classes("drawer-button")
         ui.button(
             _("Edit server settings"),
             on_click=popup_edit_server(server=server).open,
@@ -199,6 +269,11 @@ def server_detail(uuid: str):
                 server,
                 "has_paper_yml",
             )
+        ui.button(
+            _("Save as template"),
+            on_click=popup_save_template(server=server).open,
+            icon="content_copy",
+        ).classes("drawer-button")
         ui.button(
             _("Delete server"),
             on_click=lambda x: popup_delete_server(server=server),
@@ -211,35 +286,57 @@ def server_detail(uuid: str):
         ui.space()
         # ui.label(_("System Usage")).style("font-size: 25px opacity: 0.6;")
         ui.separator()
-        with ui.grid(rows=2, columns=2).classes("stat-grid"):
+        server.monitor.watch()
+        ui.context.client.on_disconnect(server.monitor.unwatch)
+
+        def show_stats():
+            ui.navigate.to(f"/stats/{server.uuid}")
+
+        with ui.grid(rows=3, columns=2).classes("stat-grid"):
             # RAM usage
-            with ui.chip("", icon="donut_large").bind_text_from(
+            with ui.chip("", icon="donut_large", on_click=show_stats).bind_text_from(
                 server.monitor, "ram_usage", lambda x: f"{x} MB"
             ).classes("stat-chip"):
                 ui.tooltip(_("RAM usage")).style("font-size: 15px;")
             # CPU usage
-            with ui.chip("", icon="memory").bind_text_from(
+            with ui.chip("", icon="memory", on_click=show_stats).bind_text_from(
                 server.monitor, "cpu_usage", lambda x: f"{x} %"
             ).classes("stat-chip"):
                 ui.tooltip(_("CPU usage")).style("font-size: 15px;")
             # Disk read
-            with ui.chip("", icon="swap_vert").bind_text_from(
+            with ui.chip("", icon="swap_vert", on_click=show_stats).bind_text_from(
                 server.monitor,
                 "disk_read",
                 lambda x: f"{x} MB/s",
             ).classes("stat-chip"):
                 ui.tooltip(_("Disk read")).style("font-size: 15px;")
             # Disk write
-            with ui.chip("", icon="swap_vert").bind_text_from(
+            with ui.chip("", icon="swap_vert", on_click=show_stats).bind_text_from(
                 server.monitor,
                 "disk_write",
                 lambda x: f"{x} MB/s",
             ).classes("stat-chip"):
                 ui.tooltip(_("Disk write")).style("font-size: 15px;")
+            # Threads
+            with ui.chip("", icon="account_tree", on_click=show_stats).bind_text_from(
+                server.monitor, "threads", str
+            ).classes("stat-chip"):
+                ui.tooltip(_("Threads")).style("font-size: 15px;")
+            # Open files
+            with ui.chip("", icon="description", on_click=show_stats).bind_text_from(
+                server.monitor, "open_files", str
+            ).classes("stat-chip"):
+                ui.tooltip(_("Open files")).style("font-size: 15px;")
 
     with container:
         log = ui.log(mcssettings.MAX_LOG_LINES).classes("log-window")
-        server.log = log
+        # Output produced before the page was opened
+        if server.scrollback and server.scrollback.ring is not None:
+            backlog = server.scrollback.tail(mcssettings.MAX_LOG_LINES)
+            if backlog:
+                log.push("\n".join(backlog))
+        server.console.add_viewer(log)
+        ui.context.client.on_disconnect(lambda: server.console.remove_viewer(log))
 
         with ui.row().style("width: 100%;"):
             console_input = (
@@ -252,6 +349,666 @@ def server_detail(uuid: str):
                 )
                 .classes("console-input")
             )
+            ui.label("").style("opacity: 0.6; margin-top: 20px;").bind_text_from(
+                server.console,
+                "lines_per_sec",
+                backward=lambda value: _(
+                    "{lines} lines/s, {kb} KB/s",
+                    lines=value,
+                    kb=round(server.console.bytes_per_sec / 1024, 1),
+                ),
+            )
+
+
+@ui.page("/scrollback/{uuid}")
+async def server_scrollback(uuid: str, session: str = None, line: int = None):
+    """
+    Page that pages through the console history of a server.
+    Only one page of lines is sent to the browser at a time,
+    archived sessions are read in a worker thread.
+    session and line open the page at a line (search results link here).
+    """
+    logger.info(f"GET /scrollback/{uuid}")
+    # setup content
+    load_head()
+    header = ui.header().classes("content-header")
+    container = html.section().classes("content")
+
+    server = get_server_by_uuid(uuid=uuid)
+    scrollback = await asyncio.to_thread(server.get_scrollback)
+    sessions = await asyncio.to_thread(scrollback.sessions)
+    page_size = mcssettings.SCROLLBACK_PAGE_SIZE
+    if session not in sessions:
+        session, line = None, None
+    view_state = {"session": session or (sessions[0] if sessions else None), "start": 0}
+
+    build_base_window(header=header)
+
+    with header:
+        with ui.button(
+            "", on_click=ui.navigate.back, icon="arrow_back_ios_new"
+        ).classes("back-button"):
+            ui.tooltip(_("Back")).style("font-size: 15px;").props("delay=1500")
+        ui.label(server.name).style("font-size: 40px;")
+
+    def _load_page(session: str, start: int) -> tuple[int, int, list[str]]:
+        first, end = scrollback.line_range(session)
+        start = max(first, min(start, end - page_size))
+        return start, end, scrollback.read(session, start, page_size)
+
+    async def _render():
+        session = view_state["session"]
+        if scrollback.is_live(session):
+            # the ring is written on the event loop: read it there
+            page = _load_page(session, view_state["start"])
+        else:
+            page = await asyncio.to_thread(_load_page, session, view_state["start"])
+        view_state["start"], end, lines = page
+        view.clear()
+        if lines:
+            view.push("\n".join(lines))
+        position.set_text(
+            _(
+                "Lines {start}-{end} of {total}",
+                start=view_state["start"] + 1 if lines else view_state["start"],
+                end=view_state["start"] + len(lines),
+                total=end,
+            )
+        )
+
+    async def _move(offset: int | None = None, absolute: int | None = None):
+        if absolute is not None:
+            view_state["start"] = absolute
+        else:
+            view_state["start"] += offset
+        await _render()
+
+    async def _select_session(session: str):
+        view_state["session"] = session
+        await _move(absolute=0)
+
+    with container:
+        with ui.row().style("width: 100%; align-items: center;"):
+            ui.select(
+                sessions,
+                value=view_state["session"],
+                label=_("Session"),
+                on_change=lambda x: _select_session(x.value),
+            ).classes("create-server-input")
+            ui.button(icon="first_page", on_click=lambda: _move(absolute=0))
+            ui.button(icon="chevron_left", on_click=lambda: _move(-page_size))
+            ui.button(icon="chevron_right", on_click=lambda: _move(page_size))
+            ui.button(icon="last_page", on_click=lambda: _move(absolute=2**63))
+            ui.button(icon="refresh", on_click=_render)
+            position = ui.label("").style("opacity: 0.6")
+
+        view = ui.log(page_size).classes("log-window")
+
+    if line is not None:
+        await _move(absolute=line)
+    elif view_state["session"]:
+        await _move(absolute=2**63)
+
+
+@ui.page("/startup/{uuid}")
+def server_startup_history(uuid: str):
+    """Page that shows how long the starts of a server took"""
+    logger.info(f"GET /startup/{uuid}")
+    # setup content
+    load_head()
+    header = ui.header().classes("content-header")
+    container = html.section().classes("content")
+
+    server = get_server_by_uuid(uuid=uuid)
+    history = server.get_startup_history()
+    records = history.records
+
+    build_base_window(header=header)
+
+    with header:
+        with ui.button(
+            "", on_click=ui.navigate.back, icon="arrow_back_ios_new"
+        ).classes("back-button"):
+            ui.tooltip(_("Back")).style("font-size: 15px;").props("delay=1500")
+        ui.label(server.name).style("font-size: 40px;")
+
+    labels = [
+        datetime.fromtimestamp(record["started_at"]).strftime("%Y-%m-%d %H:%M")
+        for record in records
+    ]
+
+    with container:
+        if not records:
+            ui.label(_("The server has not been started yet")).style("opacity: 0.6")
+            return
+
+        cds_gain = history.cds_gain()
+        if cds_gain is not None:
+            ui.label(
+                _("Class data sharing saves {seconds}s per start", seconds=cds_gain)
+            ).style("opacity: 0.6")
+
+        ui.echart(
+            {
+                "tooltip": {"trigger": "axis"},
+                "legend": {"data": [_("Ready"), _("First output"), _("Baseline")]},
+                "xAxis": {"type": "category", "data": labels},
+                "yAxis": {"type": "value", "name": "s"},
+                "series": [
+                    {
+                        "name": _("Ready"),
+                        "type": "line",
+                        "data": [
+                            {
+                                "value": record["ready"],
+                                "itemStyle": {
+                                    "color": "rgb(216, 68, 68)"
+                                    if record.get("regression")
+                                    else None
+                                },
+                                "symbolSize": 12 if record.get("regression") else 6,
+                            }
+                            for record in records
+                        ],
+                    },
+                    {
+                        "name": _("First output"),
+                        "type": "line",
+                        "data": [record["first_output"] for record in records],
+                    },
+                    {
+                        "name": _("Baseline"),
+                        "type": "line",
+                        "lineStyle": {"type": "dashed"},
+                        "data": [record.get("baseline") for record in records],
+                    },
+                ],
+            }
+        ).style("width: 100%; height: 350px;")
+
+        ui.table(
+            columns=[
+                {"name": "time", "label": _("Time"), "field": "time", "align": "left"},
+                {"name": "ready", "label": _("Ready"), "field": "ready", "align": "left"},
+                {
+                    "name": "first_output",
+                    "label": _("First output"),
+                    "field": "first_output",
+                    "align": "left",
+                },
+                {"name": "version", "label": _("Version"), "field": "version", "align": "left"},
+                {"name": "ram", "label": "RAM", "field": "ram", "align": "left"},
+                {"name": "addons", "label": _("Plugins/mods"), "field": "addons", "align": "left"},
+                {"name": "jvm_args", "label": _("JVM flags"), "field": "jvm_args", "align": "left"},
+                {"name": "cds", "label": "CDS", "field": "cds", "align": "left"},
+                {"name": "regression", "label": "", "field": "regression", "align": "left"},
+            ],
+            rows=[
+                {
+                    "time": label,
+                    "ready": f"{record['ready']}s",
+                    "first_output": f"{record['first_output']}s",
+                    "version": record.get("version"),
+                    "ram": f"{record.get('ram')} GB",
+                    "addons": record.get("addons"),
+                    "jvm_args": " ".join(record.get("jvm_args", [])),
+                    "cds": record.get("cds") or "",
+                    "regression": (
+                        _("Slower than usual ({changes})", changes=", ".join(record["changes"]))
+                        if record.get("regression")
+                        else ""
+                    ),
+                }
+                for label, record in reversed(list(zip(labels, records)))
+            ],
+            pagination=20,
+        ).style("width: 100%;")
+
+
+@ui.page("/restarts/{uuid}")
+def server_restart_history(uuid: str):
+    """Page that shows how the runs of a server ended and what the supervisor did"""
+    logger.info(f"GET /restarts/{uuid}")
+    # setup content
+    load_head()
+    header = ui.header().classes("content-header")
+    container = html.section().classes("content")
+
+    server = get_server_by_uuid(uuid=uuid)
+    records = supervisor.get_history(server).records
+
+    build_base_window(header=header)
+
+    with header:
+        with ui.button(
+            "", on_click=ui.navigate.back, icon="arrow_back_ios_new"
+        ).classes("back-button"):
+            ui.tooltip(_("Back")).style("font-size: 15px;").props("delay=1500")
+        ui.label(server.name).style("font-size: 40px;")
+
+    exits = {
+        "clean": _("Stopped"),
+        "crash": _("Crashed"),
+        "out_of_memory": _("Out of memory"),
+        "oom_killed": _("Killed by the OOM killer"),
+        "killed": _("Killed"),
+        "failed": _("Failed to start"),
+        "hung": _("Not responding"),
+    }
+    actions = {
+        "none": "",
+        "restart": _("Restarted"),
+        "gave_up": _("Crash loop: not restarted"),
+    }
+
+    with container:
+        if not records:
+            ui.label(_("The server has not been started yet")).style("opacity: 0.6")
+            return
+
+        ui.table(
+            columns=[
+                {"name": "time", "label": _("Time"), "field": "time", "align": "left"},
+                {"name": "exit", "label": _("Exit"), "field": "exit", "align": "left"},
+                {"name": "code", "label": _("Exit code"), "field": "code", "align": "left"},
+                {"name": "uptime", "label": _("Uptime"), "field": "uptime", "align": "left"},
+                {"name": "action", "label": _("Action"), "field": "action", "align": "left"},
+            ],
+            rows=[
+                {
+                    "time": datetime.fromtimestamp(record["time"]).strftime(
+                        "%Y-%m-%d %H:%M:%S"
+                    ),
+                    "exit": exits.get(record["exit"], record["exit"]),
+                    "code": record.get("returncode"),
+                    "uptime": f"{record['uptime']}s",
+                    "action": (
+                        _("Restarted after {delay}s", delay=record["delay"])
+                        if record["action"] == "restart"
+                        else actions.get(record["action"], record["action"])
+                    ),
+                }
+                for record in reversed(records)
+            ],
+            pagination=20,
+        ).style("width: 100%;")
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus exporter. Runs in a worker thread, not on the event loop"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
+@ui.page("/stats/{uuid}")
+def server_stats(uuid: str):
+    """Page that charts the resource usage of a server"""
+    logger.info(f"GET /stats/{uuid}")
+    # setup content
+    load_head()
+    header = ui.header().classes("content-header")
+    container = html.section().classes("content")
+
+    server = get_server_by_uuid(uuid=uuid)
+    metrics = {
+        "ram_usage": (_("RAM usage"), "MB"),
+        "cpu_usage": (_("CPU usage"), "%"),
+        "disk_read": (_("Disk read"), "MB/s"),
+        "disk_write": (_("Disk write"), "MB/s"),
+        "threads": (_("Threads"), ""),
+        "open_files": (_("Open files"), ""),
+        "players": (_("Players"), ""),
+        "tps": ("TPS", ""),
+    }
+    windows = {
+        300: _("5 minutes"),
+        3600: _("1 hour"),
+        6 * 3600: _("6 hours"),
+        24 * 3600: _("1 day"),
+        7 * 24 * 3600: _("7 days"),
+        30 * 24 * 3600: _("30 days"),
+    }
+    view_state = {"window": 3600, "loaded": 0}
+    charts = {}
+
+    build_base_window(header=header)
+
+    with header:
+        with ui.button(
+            "", on_click=ui.navigate.back, icon="arrow_back_ios_new"
+        ).classes("back-button"):
+            ui.tooltip(_("Back")).style("font-size: 15px;").props("delay=1500")
+        ui.label(server.name).style("font-size: 40px;")
+
+    def _draw(chart, times: list, mins: list, maxs: list, avgs: list):
+        times = [timestamp * 1000 for timestamp in times]
+        # min as an invisible base, the band stacked on it up to max
+        chart.options["series"][0]["data"] = list(zip(times, mins))
+        chart.options["series"][1]["data"] = list(
+            zip(times, [high - low for low, high in zip(mins, maxs)])
+        )
+        chart.options["series"][2]["data"] = list(zip(times, [round(avg, 2) for avg in avgs]))
+        chart.update()
+
+    async def _refresh():
+        window = view_state["window"]
+        if window <= mcssettings.METRICS_LIVE_WINDOW:
+            for metric, chart in charts.items():
+                points = server.metrics.query(metric, window)
+                _draw(
+                    chart,
+                    points["time"].tolist(),
+                    points["min"].tolist(),
+                    points["max"].tolist(),
+                    points["avg"].tolist(),
+                )
+            return
+
+        # longer windows come from the database: they survive restarts
+        if time.monotonic() - view_state["loaded"] < mcssettings.METRICS_DB_FLUSH_INTERVAL:
+            # nothing new written yet
+            return
+        view_state["loaded"] = time.monotonic()
+        for metric, chart in charts.items():
+            points = (
+                await asyncio.to_thread(
+                    metrics_db.query, [server.uuid], metric, time.time() - window
+                )
+            )[server.uuid]
+            if view_state["window"] != window:
+                # changed while loading
+                return
+            _draw(chart, points["time"], points["min"], points["max"], points["avg"])
+
+    async def _set_window(event):
+        view_state["window"] = event.value
+        view_state["loaded"] = 0
+        await _refresh()
+
+    with container:
+        ui.toggle(windows, value=view_state["window"], on_change=_set_window)
+        for metric, (label, unit) in metrics.items():
+            charts[metric] = ui.echart(
+                {
+                    "title": {"text": label, "textStyle": {"fontSize": 15}},
+                    "tooltip": {"trigger": "axis"},
+                    "xAxis": {"type": "time"},
+                    "yAxis": {"type": "value", "name": unit},
+                    "series": [
+                        {
+                            "name": _("Min"),
+                            "type": "line",
+                            "stack": "band",
+                            "symbol": "none",
+                            "lineStyle": {"opacity": 0},
+                            "data": [],
+                        },
+                        {
+                            "name": _("Max"),
+                            "type": "line",
+                            "stack": "band",
+                            "symbol": "none",
+                            "lineStyle": {"opacity": 0},
+                            "areaStyle": {"opacity": 0.3},
+                            "tooltip": {"show": False},
+                            "data": [],
+                        },
+                        {
+                            "name": _("Average"),
+                            "type": "line",
+                            "symbol": "none",
+                            "data": [],
+                        },
+                    ],
+                }
+            ).style("width: 100%; height: 250px;")
+
+    # sample faster while the charts are open
+    server.monitor.watch()
+    ui.context.client.on_disconnect(server.monitor.unwatch)
+    ui.timer(mcssettings.MONITOR_INTERVAL * 2, _refresh)
+
+
+@ui.page("/hangs/{uuid}")
+def server_hang_reports(uuid: str):
+    """Page that shows the thread dumps taken when a server stopped responding"""
+    logger.info(f"GET /hangs/{uuid}")
+    # setup content
+    load_head()
+    header = ui.header().classes("content-header")
+    container = html.section().classes("content")
+
+    server = get_server_by_uuid(uuid=uuid)
+    reports = watchdog.get_reports(server)
+
+    build_base_window(header=header)
+
+    with header:
+        with ui.button(
+            "", on_click=ui.navigate.back, icon="arrow_back_ios_new"
+        ).classes("back-button"):
+            ui.tooltip(_("Back")).style("font-size: 15px;").props("delay=1500")
+        ui.label(server.name).style("font-size: 40px;")
+
+    with container:
+        if not reports.records:
+            ui.label(_("The server never stopped responding")).style("opacity: 0.6")
+            return
+
+        for record in reversed(reports.records):
+            title = datetime.fromtimestamp(record["time"]).strftime("%Y-%m-%d %H:%M:%S")
+            if record["stuck"]:
+                title += " - " + _(
+                    "Server thread stuck ({state}) at {frame}",
+                    state=record["thread_state"],
+                    frame=record["top_frame"],
+                )
+            else:
+                title += " - " + _("Server thread not stuck")
+            with ui.expansion(title, icon="hourglass_disabled").style("width: 100%;"):
+                if not record["dumps"]:
+                    ui.label(_("No thread dump could be taken")).style("opacity: 0.6")
+                for filename in record["dumps"]:
+                    with ui.expansion(filename).style("width: 100%;"):
+                        ui.code(reports.read_dump(filename), language="text").style(
+                            "width: 100%; max-height: 500px; overflow: auto;"
+                        )
+
+
+@ui.page("/diagnostics")
+def diagnostics():
+    """Page that shows what blocks the event loop and what uses MCSC's memory"""
+    logger.info("GET /diagnostics")
+    # setup content
+    load_head()
+    header = ui.header().classes("content-header")
+    container = html.section().classes("content")
+
+    build_base_window(header=header)
+
+    with header:
+        with ui.button(
+            "", on_click=ui.navigate.back, icon="arrow_back_ios_new"
+        ).classes("back-button"):
+            ui.tooltip(_("Back")).style("font-size: 15px;").props("delay=1500")
+        ui.label(_("Diagnostics")).style("font-size: 40px;")
+
+    with container:
+        stats_label = ui.label().style("font-size: 18px;")
+        lag_chart = ui.echart(
+            {
+                "tooltip": {"trigger": "axis"},
+                "xAxis": {"type": "time"},
+                "yAxis": {"type": "value", "name": "ms"},
+                "series": [
+                    {"name": _("Event loop lag"), "type": "line", "symbol": "none", "data": []}
+                ],
+            }
+        ).style("width: 100%; height: 250px;")
+
+        with ui.row().classes("items-center"):
+            ui.label(_("Worst offenders")).style("font-size: 25px;")
+            ui.button(_("Clear"), on_click=lambda: (loop_monitor.clear(), offenders.refresh()))
+
+        @ui.refreshable
+        def offenders():
+            worst = loop_monitor.worst_offenders()
+            if not worst:
+                ui.label(
+                    _(
+                        "Nothing blocked the event loop for more than {ms}ms",
+                        ms=int(loop_monitor.threshold * 1000),
+                    )
+                ).style("opacity: 0.6")
+            for offender in worst:
+                title = _(
+                    "{culprit}: {count} times, {total}s in total, longest {max}s",
+                    culprit=offender["culprit"],
+                    count=offender["count"],
+                    total=offender["total"],
+                    max=offender["max"],
+                )
+                with ui.expansion(title, icon="hourglass_bottom").style("width: 100%;"):
+                    ui.code(offender["stack"], language="text").style("width: 100%;")
+
+        offenders()
+
+        with ui.row().classes("items-center"):
+            ui.label(_("MCSC memory")).style("font-size: 25px;")
+            tracing_button = ui.button()
+
+        @ui.refreshable
+        def allocations():
+            ui.label(_("Resident memory: {mb} MB", mb=loop_monitor.rss_mb))
+            if not loop_monitor.tracing:
+                ui.label(_("Start tracing to see where memory is allocated")).style(
+                    "opacity: 0.6"
+                )
+                return
+            if not loop_monitor.allocations:
+                ui.label(_("Waiting for the next memory sample")).style("opacity: 0.6")
+                return
+            ui.table(
+                columns=[
+                    {"name": "where", "label": _("Allocated at"), "field": "where", "align": "left"},
+                    {"name": "size_kb", "label": "KB", "field": "size_kb", "align": "left"},
+                    {"name": "count", "label": _("Blocks"), "field": "count", "align": "left"},
+                ],
+                rows=loop_monitor.allocations,
+            ).style("width: 100%;")
+
+        allocations()
+
+    def _update_tracing_button():
+        tracing_button.text = _("Stop tracing") if loop_monitor.tracing else _("Start tracing")
+
+    def _toggle_tracing():
+        if loop_monitor.tracing:
+            loop_monitor.stop_tracing()
+        else:
+            loop_monitor.start_tracing()
+        _update_tracing_button()
+        allocations.refresh()
+
+    tracing_button.on_click(_toggle_tracing)
+    _update_tracing_button()
+
+    def _refresh():
+        stats = loop_monitor.lag_stats()
+        stats_label.text = _(
+            "Event loop lag: {current}ms now, p50 {p50}ms, p99 {p99}ms, max {max}ms",
+            **stats,
+        )
+        lag_chart.options["series"][0]["data"] = [
+            (timestamp * 1000, round(lag * 1000, 1)) for timestamp, lag in list(loop_monitor.lags)
+        ]
+        lag_chart.update()
+
+    def _refresh_details():
+        offenders.refresh()
+        allocations.refresh()
+
+    ui.timer(1, _refresh)
+    ui.timer(mcssettings.TRACEMALLOC_INTERVAL / 4, _refresh_details)
+
+
+@ui.page("/search")
+def search_logs():
+    """Page that searches the logs and console history of the servers"""
+    logger.info("GET /search")
+    # setup content
+    load_head()
+    header = ui.header().classes("content-header")
+    container = html.section().classes("content")
+    server_names = {server.uuid: server.name for server in get_server_list()}
+
+    build_base_window(header=header)
+
+    with header:
+        with ui.button(
+            "", on_click=ui.navigate.back, icon="arrow_back_ios_new"
+        ).classes("back-button"):
+            ui.tooltip(_("Back")).style("font-size: 15px;").props("delay=1500")
+        ui.label(_("Search logs")).style("font-size: 40px;")
+
+    def _open_console(row: dict):
+        """Opens a console result in the scrollback at its line"""
+        kind, _sep, session = row["source"].rpartition(":")[0].partition("/")
+        if kind == "console":
+            ui.navigate.to(
+                f"/scrollback/{row['uuid']}?session={session}&line={row['line']}"
+            )
+
+    async def _search():
+        results = await asyncio.to_thread(
+            search_index.search,
+            query_input.value or "",
+            servers_select.value or None,
+            mcssettings.SEARCH_MAX_RESULTS,
+        )
+        table.rows = [
+            {
+                "server": server_names.get(result["uuid"], result["uuid"]),
+                "time": (
+                    datetime.fromtimestamp(result["ts"] / 1000).strftime(
+                        "%Y-%m-%d %H:%M:%S.%f"
+                    )[:-3]
+                    if result["ts"]
+                    else ""
+                ),
+                "source": f"{result['source']}:{result['line'] + 1}",
+                "text": result["text"],
+                "uuid": result["uuid"],
+                "line": result["line"],
+            }
+            for result in results
+        ]
+        summary.set_text(_("{count} results", count=len(results)))
+
+    with container:
+        with ui.row().style("width: 100%; align-items: center;"):
+            query_input = (
+                ui.input(_("Search"))
+                .classes("create-server-input")
+                .on("keydown.enter", _search)
+            )
+            servers_select = ui.select(
+                server_names, multiple=True, label=_("Servers"), clearable=True
+            ).classes("create-server-input")
+            ui.button(icon="search", on_click=_search)
+            summary = ui.label("").style("opacity: 0.6")
+
+        table = ui.table(
+            columns=[
+                {"name": "time", "label": _("Time"), "field": "time", "align": "left"},
+                {"name": "server", "label": _("Server"), "field": "server", "align": "left"},
+                {"name": "source", "label": _("Source"), "field": "source", "align": "left"},
+                {"name": "text", "label": _("Line"), "field": "text", "align": "left"},
+            ],
+            rows=[],
+            pagination=50,
+        ).style("width: 100%;")
+        table.on("rowClick", lambda event: _open_console(event.args[1]))
 
 
 def create_server_card(server: MinecraftServer):
@@ -264,13 +1021,17 @@ def create_server_card(server: MinecraftServer):
 
         with ui.row():
             with ui.button_group():
-                ui.button(icon="play_arrow").on_click(server.start).classes(
+                ui.button(icon="play_arrow").on_click(
+                    lambda x: start_servers([server])
+                ).classes(
                     "start-button"
-                ).bind_enabled_from(server, "running", lambda s: not s)
+                ).bind_enabled_from(server, "state", lambda s: s == STOPPED)
 
                 ui.button(icon="stop").on_click(server.stop).classes(
                     "stop-button"
-                ).bind_enabled_from(server, "running")
+                ).bind_enabled_from(
+                    server, "state", lambda s: s in (STARTING, READY, RESTARTING)
+                )
 
             ui.label("").style(
                 "opacity: 0.6; margin-left: 200px; margin-top: 10px;"
@@ -0,0 +1,398 @@
+"""
+Full-text search across server logs and console sessions
+"""
+
+import datetime
+import glob
+import gzip
+import hashlib
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+from modules.servers.scrollback import archive_first_line
+
+
+logger = RotatingLogger()
+
+LINE_TIME_RE = re.compile(r"^\[(\d{2}):(\d{2}):(\d{2})")
+ARCHIVE_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+BATCH_SIZE = 5000
+DAY_MS = 24 * 3600 * 1000
+# a log line may be stamped a little after the file's mtime (clock skew)
+MTIME_TOLERANCE_MS = 60 * 1000
+# bytes at the start of latest.log that tell one file from the next one
+HEAD_BYTES = 1024
+
+
+def _day_start_ms(date: datetime.date) -> int:
+    """Local midnight of date in epoch milliseconds"""
+    return int(datetime.datetime.combine(date, datetime.time()).timestamp() * 1000)
+
+
+class LineClock:
+    """
+    Turns the [HH:MM:SS] prefix of log lines into epoch milliseconds,
+    starting from a known date and following midnight rollovers.
+    """
+
+    def __init__(self, date: datetime.date):
+        self.day_ms = _day_start_ms(date)
+        self.last_ms = None
+
+    @classmethod
+    def resume(cls, day_ms: int, last_ms: int | None) -> "LineClock":
+        """Clock that continues from a saved state (day_ms, last_ms)"""
+        clock = cls.__new__(cls)
+        clock.day_ms = day_ms
+        clock.last_ms = last_ms
+        return clock
+
+    @classmethod
+    def ending_at(cls, lines: list[str], end: float) -> "LineClock":
+        """
+        Clock for lines written up to end (epoch seconds, the mtime of the file).
+        The start date is the one that puts the last line at or before end,
+        counting the midnights the lines go through.
+        """
+        end_date = datetime.date.fromtimestamp(end)
+        probe = cls(end_date)
+        for line in lines:
+            probe.timestamp(line)
+        overshoot = (probe.last_ms or 0) - int(end * 1000) - MTIME_TOLERANCE_MS
+        days = math.ceil(overshoot / DAY_MS) if overshoot > 0 else 0
+        return cls(end_date - datetime.timedelta(days=days))
+
+    def timestamp(self, line: str) -> int | None:
+        """Epoch milliseconds of a line (last known time if it has none)"""
+        match = LINE_TIME_RE.match(line)
+        if not match:
+            return self.last_ms
+
+        hours, minutes, seconds = (int(value) for value in match.groups())
+        ms = self.day_ms + ((hours * 60 + minutes) * 60 + seconds) * 1000
+        if self.last_ms is not None and ms < self.last_ms - DAY_MS // 2:
+            # the log went past midnight
+            self.day_ms += DAY_MS
+            ms += DAY_MS
+        self.last_ms = ms
+        return ms
+
+
+class SearchIndex:
+    """
+    Trigram index (SQLite FTS5) of log lines of all servers.
+    Writes happen on a background thread; searches open their own connection.
+    """
+
+    def __init__(self, path: str = mcssettings.SEARCH_INDEX_PATH):
+        self.path = path
+        self.fts = True
+        self._queue = queue.Queue()
+        self._thread = None
+        self._targets = None
+
+    def __repr__(self):
+        return f"SearchIndex(path={self.path!r}, fts={self.fts})"
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _create_schema(self):
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                "uuid TEXT, name TEXT, kind TEXT, position INTEGER, lines INTEGER, "
+                "mtime REAL, clock_day INTEGER, clock_last INTEGER, head TEXT, "
+                "PRIMARY KEY (uuid, name))"
+            )
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(sources)")]
+            new_columns = (("clock_day", "INTEGER"), ("clock_last", "INTEGER"), ("head", "TEXT"))
+            for column, kind in new_columns:
+                # indexes created before the line clock and the file head were saved
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE sources ADD COLUMN {column} {kind}")
+            try:
+                connection.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5("
+                    "text, uuid UNINDEXED, source UNINDEXED, line_no UNINDEXED, "
+                    "ts UNINDEXED, tokenize='trigram')"
+                )
+            except sqlite3.OperationalError as e:
+                # SQLite without FTS5/trigram: plain table, LIKE scans
+                logger.warning(f"Trigram index not available, search will be slower: {e}")
+                self.fts = False
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS lines ("
+                    "text TEXT, uuid TEXT, source TEXT, line_no INTEGER, ts INTEGER)"
+                )
+        connection.close()
+
+    # Writer side
+
+    def start(self, get_targets):
+        """
+        Creates the index if needed and starts the background indexer.
+        get_targets() returns [(uuid, server_path), ...] of servers to index.
+        """
+        if self._thread:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._create_schema()
+        self._targets = get_targets
+        self._thread = threading.Thread(target=self._worker, name="search-index", daemon=True)
+        self._thread.start()
+        logger.info(f"{self} started")
+
+    def add_console_lines(self, uuid: str, session: str, first_line: int, lines: list[str]):
+        """Queues live console lines. Cheap enough to call from the event loop"""
+        self._queue.put(("console", uuid, session, first_line, int(time.time() * 1000), lines))
+
+    def forget(self, uuid: str):
+        """Queues the removal of everything indexed for a server"""
+        self._queue.put(("forget", uuid))
+
+    def _worker(self):
+        connection = self._connect()
+        next_scan = 0
+        while True:
+            timeout = max(next_scan - time.monotonic(), 0)
+            try:
+                task = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                task = None
+
+            try:
+                if task is None:
+                    for uuid, server_path in self._targets():
+                        self._scan_server(connection, uuid, server_path)
+                    next_scan = time.monotonic() + mcssettings.SEARCH_SCAN_INTERVAL
+                elif task[0] == "console":
+                    self._index_console(connection, *task[1:])
+                elif task[0] == "forget":
+                    with connection:
+                        connection.execute("DELETE FROM lines WHERE uuid = ?", (task[1],))
+                        connection.execute("DELETE FROM sources WHERE uuid = ?", (task[1],))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Search indexer error: {e}")
+
+    def _source(self, connection, uuid: str, name: str):
+        return connection.execute(
+            "SELECT kind, position, lines, mtime, clock_day, clock_last, head FROM sources "
+            "WHERE uuid = ? AND name = ?",
+            (uuid, name),
+        ).fetchone()
+
+    def _save_source(
+        self, connection, uuid, name, kind, position, lines, mtime, clock=None, head=None
+    ):
+        connection.execute(
+            "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                uuid,
+                name,
+                kind,
+                position,
+                lines,
+                mtime,
+                clock.day_ms if clock else None,
+                clock.last_ms if clock else None,
+                head,
+            ),
+        )
+
+    def _insert(self, connection, rows: list[tuple]):
+        connection.executemany(
+            "INSERT INTO lines (text, uuid, source, line_no, ts) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def _index_console(self, connection, uuid, session, first_line, ts, lines):
+        name = f"console/{session}"
+        source = self._source(connection, uuid, name)
+        indexed = source[2] if source else 0
+        rows = [
+            (line, uuid, name, first_line + index, ts)
+            for index, line in enumerate(lines)
+            if first_line + index >= indexed
+        ]
+        with connection:
+            self._insert(connection, rows)
+            self._save_source(
+                connection, uuid, name, "console", 0, first_line + len(lines), time.time()
+            )
+
+    def _index_stream(self, connection, uuid, name, lines, clock, first_line=0):
+        """Indexes an iterable of lines in batches. Returns the number of lines"""
+        rows = []
+        count = first_line
+        for line in lines:
+            line = line.rstrip("\r\n")
+            rows.append((line, uuid, name, count, clock.timestamp(line)))
+            count += 1
+            if len(rows) >= BATCH_SIZE:
+                with connection:
+                    self._insert(connection, rows)
+                rows = []
+        with connection:
+            self._insert(connection, rows)
+        return count
+
+    def _scan_server(self, connection, uuid: str, server_path: str):
+        """Indexes new content of logs/ and archived console sessions"""
+        logs_dir = os.path.join(server_path, "logs")
+
+        # Rotated logs never change: index them once
+        for path in sorted(glob.glob(os.path.join(logs_dir, "*.log.gz"))):
+            name = f"logs/{os.path.basename(path)}"
+            if self._source(connection, uuid, name):
+                continue
+            match = ARCHIVE_DATE_RE.search(os.path.basename(path))
+            date = (
+                datetime.date.fromisoformat(match.group(1))
+                if match
+                else datetime.date.fromtimestamp(os.path.getmtime(path))
+            )
+            with gzip.open(path, "rt", encoding="utf-8", errors="replace") as file:
+                count = self._index_stream(connection, uuid, name, file, LineClock(date))
+            with connection:
+                self._save_source(connection, uuid, name, "archive", 0, count, os.path.getmtime(path))
+            logger.info(f"Indexed {count} lines of {path}")
+
+        # latest.log grows: index from the last position
+        latest_path = os.path.join(logs_dir, "latest.log")
+        if os.path.exists(latest_path):
+            self._scan_latest(connection, uuid, latest_path)
+
+        # Console sessions captured while the indexer was not running
+        console_dir = os.path.join(mcssettings.CONSOLE_DIR, uuid)
+        for path in glob.glob(os.path.join(console_dir, "*.log.gz")):
+            session = os.path.basename(path).replace(".log.gz", "")
+            name = f"console/{session}"
+            if self._source(connection, uuid, name):
+                continue
+            # 2024-10-18_12-34-56, with a counter after quick restarts
+            match = ARCHIVE_DATE_RE.match(session)
+            date = (
+                datetime.date.fromisoformat(match.group(1))
+                if match
+                else datetime.date.fromtimestamp(os.path.getmtime(path))
+            )
+            # numbered like the live ring, as when the session was indexed while running
+            first_line = archive_first_line(path)
+            with gzip.open(path, "rt", encoding="utf-8", errors="replace") as file:
+                count = self._index_stream(
+                    connection, uuid, name, file, LineClock(date), first_line=first_line
+                )
+            with connection:
+                self._save_source(connection, uuid, name, "console", 0, count, os.path.getmtime(path))
+
+    @staticmethod
+    def _head(file, position: int) -> str:
+        """Digest of the start of a file, up to position (at most HEAD_BYTES)"""
+        file.seek(0)
+        return hashlib.sha1(file.read(min(position, HEAD_BYTES))).hexdigest()
+
+    def _scan_latest(self, connection, uuid: str, path: str):
+        name = "logs/latest.log"
+        source = self._source(connection, uuid, name)
+        position, count = (source[1], source[2]) if source else (0, 0)
+        clock_state = (source[4], source[5]) if source and source[4] is not None else None
+
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            # the server starts a new latest.log on every boot, which may have
+            # grown past the old position by now: compare the start of the file
+            if position and (stat.st_size < position or self._head(file, position) != source[6]):
+                # rotated: its old content now lives in a .log.gz
+                with connection:
+                    connection.execute(
+                        "DELETE FROM lines WHERE uuid = ? AND source = ?", (uuid, name)
+                    )
+                position, count, clock_state = 0, 0, None
+
+            if stat.st_size == position:
+                return
+
+            file.seek(position)
+            data = file.read()
+            # only index complete lines
+            data = data[: data.rfind(b"\n") + 1]
+            if not data:
+                return
+            head = self._head(file, position + len(data))
+
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        if clock_state:
+            # carry on from the previous scan, midnights included
+            clock = LineClock.resume(*clock_state)
+        else:
+            clock = LineClock.ending_at(lines, stat.st_mtime)
+        count = self._index_stream(connection, uuid, name, lines, clock, first_line=count)
+        with connection:
+            self._save_source(
+                connection,
+                uuid,
+                name,
+                "latest",
+                position + len(data),
+                count,
+                stat.st_mtime,
+                clock,
+                head,
+            )
+
+    # Reader side
+
+    def search(self, query: str, uuids: list[str] = None, limit: int = 200) -> list[dict]:
+        """
+        Returns the newest lines containing query (case insensitive).
+        Blocking: call it from a worker thread.
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        started = time.perf_counter()
+        sql = "SELECT uuid, source, line_no, ts, text FROM lines WHERE "
+        if self.fts and len(query) >= 3:
+            sql += "lines MATCH ?"
+            params = ['"' + query.replace('"', '""') + '"']
+        else:
+            sql += "text LIKE ? ESCAPE '\\'"
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params = [f"%{escaped}%"]
+
+        if uuids:
+            sql += f" AND uuid IN ({', '.join('?' * len(uuids))})"
+            params += list(uuids)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+        logger.info(
+            f"Search {query!r}: {len(rows)} results in "
+            f"{(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return [
+            {"uuid": uuid, "source": source, "line": line_no, "ts": ts, "text": text}
+            for uuid, source, line_no, ts, text in rows
+        ]
+
+
+search_index = SearchIndex()
@@ -0,0 +1,264 @@
+"""
+Host RAM admission control module
+"""
+
+import asyncio
+import time
+
+import psutil
+
+from config import settings as mcssettings
+from modules.translations import translate as _
+from modules.servers.jvm import ZGC_PROFILE, heap_size_mb
+from modules.servers.models import STARTING, STOPPED, MinecraftServer, get_server_list
+from modules.servers.supervisor import supervisor
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+QUEUED = "queued"
+ADMITTED = "admitted"
+REJECTED = "rejected"
+CANCELLED = "cancelled"
+
+
+def footprint_mb(settings: dict) -> int:
+    """
+    RAM a server is expected to use: its heap plus what the JVM needs
+    outside of it (metaspace, code cache, thread stacks, GC structures).
+    """
+    heap_mb = heap_size_mb(settings)
+    overhead_mb = mcssettings.JVM_OVERHEAD_MB + heap_mb * mcssettings.JVM_OVERHEAD_RATIO
+    if settings.get("jvm_profile") == ZGC_PROFILE:
+        # ZGC keeps more native memory for its colored pointers and page tables
+        overhead_mb += heap_mb * mcssettings.ZGC_OVERHEAD_RATIO
+    if settings.get("jar_type") == 2:
+        # mods load many more classes
+        overhead_mb += mcssettings.MODDED_OVERHEAD_MB
+    return int(heap_mb + overhead_mb)
+
+
+def host_budget_mb() -> int:
+    """RAM servers can use: the host RAM minus what is kept for the system"""
+    total_mb = psutil.virtual_memory().total / (1024 * 1024)
+    return max(int(total_mb - mcssettings.HOST_RESERVED_RAM_MB), 0)
+
+
+class StartRequest:
+    """A server waiting to be started"""
+
+    def __init__(self, server: MinecraftServer):
+        self.server = server
+        self.footprint_mb = footprint_mb(server.settings)
+        self.state = QUEUED
+        self.reason = _("Queued")
+        self.queued_at = time.time()
+
+    def __repr__(self):
+        return f"StartRequest(server={self.server.uuid}, state={self.state})"
+
+    @property
+    def waited(self) -> float:
+        """Seconds spent in the queue"""
+        return time.time() - self.queued_at
+
+
+class AdmissionController:
+    """
+    Starts servers only when their RAM fits in the host budget,
+    a few at a time so concurrent boots don't fight for CPU and disk.
+    Starts that don't fit wait in the queue until other servers stop;
+    smaller servers further back may start in the meantime.
+    """
+
+    def __init__(
+        self,
+        max_boots: int = mcssettings.FLEET_MAX_CONCURRENT_BOOTS,
+        interval: float = mcssettings.FLEET_START_INTERVAL,
+    ):
+        self.max_boots = max_boots
+        self.interval = interval
+        self.queue = []
+        self._tasks = {}
+        self._worker = None
+        self._last_launch = 0
+
+    def __repr__(self):
+        return f"AdmissionController(queued={len(self.queue)}, launched={len(self._tasks)})"
+
+    def _active_servers(self) -> list[MinecraftServer]:
+        """Servers running, or launched and not yet marked as starting"""
+        return [
+            server
+            for server in get_server_list()
+            if server.state != STOPPED or server in self._tasks
+        ]
+
+    def committed_mb(self) -> int:
+        """RAM committed to active servers (measured, or estimated if higher)"""
+        return int(
+            sum(
+                max(footprint_mb(server.settings), server.monitor.ram_usage)
+                for server in self._active_servers()
+            )
+        )
+
+    def booting(self) -> int:
+        """Servers that are still booting"""
+        return sum(
+            1
+            for server in self._active_servers()
+            if server.state in (STARTING, STOPPED)
+        )
+
+    def fits(self, server: MinecraftServer) -> bool:
+        """True if the server can start without overcommitting the host"""
+        return self.committed_mb() + footprint_mb(server.settings) <= host_budget_mb()
+
+    def get_request(self, server: MinecraftServer) -> StartRequest | None:
+        """Queued request of a server"""
+        for request in self.queue:
+            if request.server is server:
+                return request
+        return None
+
+    def submit(self, servers: list[MinecraftServer]) -> list[StartRequest]:
+        """
+        Queues servers to be started.
+        Servers that are already active or queued are skipped.
+        Must be called from the event loop.
+        """
+        requests = []
+        budget = host_budget_mb()
+        for server in servers:
+            if server in self._active_servers() or self.get_request(server):
+                continue
+            request = StartRequest(server)
+            requests.append(request)
+            if request.footprint_mb > budget:
+                request.state = REJECTED
+                request.reason = _(
+                    "Needs {need} MB, the host can give servers {budget} MB",
+                    need=request.footprint_mb,
+                    budget=budget,
+                )
+                logger.warning(f"Server {server.uuid} can't fit on this host: {request.reason}")
+                continue
+            self.queue.append(request)
+            logger.info(f"Queued start of server {server.uuid} ({request.footprint_mb} MB)")
+
+        if self.queue and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._run())
+        return requests
+
+    def start_all(self) -> list[StartRequest]:
+        """Queues every stopped server"""
+        return self.submit(get_server_list())
+
+    def start_group(self, group: str) -> list[StartRequest]:
+        """Queues the stopped servers of a group"""
+        return self.submit(
+            [server for server in get_server_list() if server.group == group]
+        )
+
+    @staticmethod
+    def groups() -> list[str]:
+        """Groups in use"""
+        return sorted({server.group for server in get_server_list() if server.group})
+
+    def cancel(self, server: MinecraftServer):
+        """Removes a server from the queue"""
+        request = self.get_request(server)
+        if request:
+            request.state = CANCELLED
+            self.queue.remove(request)
+            logger.info(f"Cancelled queued start of server {server.uuid}")
+
+    def clear(self):
+        """Removes every server from the queue"""
+        for request in self.queue:
+            request.state = CANCELLED
+        if self.queue:
+            logger.info(f"Cancelled {len(self.queue)} queued starts")
+        self.queue.clear()
+
+    def _launch(self, request: StartRequest):
+        request.state = ADMITTED
+        self.queue.remove(request)
+        self._last_launch = time.monotonic()
+        server = request.server
+        logger.info(
+            f"Admitted server {server.uuid} after {request.waited:.1f}s "
+            f"({self.committed_mb() + request.footprint_mb}/{host_budget_mb()} MB committed)"
+        )
+        task = supervisor.run(server)
+        self._tasks[server] = task
+        task.add_done_callback(lambda _task: self._tasks.pop(server, None))
+
+    async def _run(self):
+        """Admits queued servers while there is room"""
+        while self.queue:
+            for request in list(self.queue):
+                if request.server.state != STOPPED or request.server not in get_server_list():
+                    # started some other way, or deleted
+                    self.queue.remove(request)
+                    continue
+
+                if self.booting() >= self.max_boots:
+                    request.reason = _("Waiting for other servers to boot")
+                    break
+
+                if time.monotonic() - self._last_launch < self.interval:
+                    request.reason = _("Waiting to stagger boots")
+                    break
+
+                if not self.fits(request.server):
+                    request.reason = _(
+                        "Waiting for RAM ({need} MB needed, {free} MB free)",
+                        need=request.footprint_mb,
+                        free=max(host_budget_mb() - self.committed_mb(), 0),
+                    )
+                    continue
+
+                self._launch(request)
+                break
+
+            await asyncio.sleep(mcssettings.FLEET_POLL_INTERVAL)
+
+    def packing_report(self, servers: list[MinecraftServer] = None) -> dict:
+        """
+        Splits servers into sets that can run together (first-fit decreasing).
+        One set means every server fits on the host at once.
+        """
+        budget = host_budget_mb()
+        servers = get_server_list() if servers is None else servers
+        sized = sorted(
+            ((server, footprint_mb(server.settings)) for server in servers),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+        bins = []
+        oversized = []
+        for server, size in sized:
+            if size > budget:
+                oversized.append((server, size))
+                continue
+            for current in bins:
+                if current["used_mb"] + size <= budget:
+                    current["servers"].append((server, size))
+                    current["used_mb"] += size
+                    break
+            else:
+                bins.append({"servers": [(server, size)], "used_mb": size})
+
+        return {
+            "budget_mb": budget,
+            "demand_mb": sum(size for _server, size in sized),
+            "bins": bins,
+            "oversized": oversized,
+        }
+
+
+admission_controller = AdmissionController()
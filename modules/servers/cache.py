@@ -0,0 +1,542 @@
+"""
+Local caches shared by all servers
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import requests
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+CHUNK_SIZE = 1024 * 1024
+FICLONE = 0x40049409  # linux/fs.h
+
+# Jars in the Maven layout of libraries/ are named by their version
+# and never modified in place: safe to hardlink.
+# Anything else (mods/, plugins/, server jars) may be updated in place.
+IMMUTABLE_EXTENSIONS = (".jar",)
+IMMUTABLE_DIRS = ("libraries",)
+
+
+def is_immutable(relative_path: str) -> bool:
+    """True if the file can be shared through a hardlink"""
+    parts = relative_path.replace("\\", "/").split("/")
+    return parts[-1].endswith(IMMUTABLE_EXTENSIONS) and any(
+        part in IMMUTABLE_DIRS for part in parts[:-1]
+    )
+
+
+def hash_file(path: str, algorithm: str = "sha256") -> str:
+    """Returns the hex digest of a file (sha256 by default)"""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """
+    Tries to create a copy-on-write clone of src (btrfs, xfs, ...).
+    Returns True on success.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+
+    import fcntl  # pylint: disable=import-outside-toplevel
+
+    try:
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.unlink(dst)
+        return False
+
+
+def clone_file(src: str, dst: str, allow_hardlink: bool = True) -> str:
+    """
+    Places a copy of src at dst using the cheapest method available:
+    reflink, then hardlink (if allowed), then a regular copy.
+    Returns the method used.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.lexists(dst):
+        os.unlink(dst)
+
+    if _reflink(src, dst):
+        return "reflink"
+
+    if allow_hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+class JarCache:
+    """
+    Content-addressed store of server jars.
+    Jars are stored once by sha256 and indexed by (jar_type, version).
+    Servers get reflinks or copies, never hardlinks: a server.jar rewritten
+    in place (a jar swap, a self-updating server) must not change the
+    stored jar and every other server using it.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = mcssettings.JAR_CACHE_DIR,
+        max_size_mb: int = mcssettings.JAR_CACHE_MAX_SIZE_MB,
+    ):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.downloads_dir = os.path.join(cache_dir, "downloads")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.max_size = max_size_mb * 1024 * 1024
+        self._lock = threading.RLock()
+        # one lock per (jar_type, version): downloads of different jars run in parallel
+        self._key_locks = {}
+        # loaded on first use: importing the module doesn't touch the disk
+        self._index = None
+
+    def __repr__(self):
+        return f"JarCache(path={self.cache_dir!r}, entries={len(self.index['entries'])})"
+
+    @property
+    def index(self) -> dict:
+        """Content of index.json"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load_index()
+        return self._index
+
+    def _load_index(self) -> dict:
+        """Loads index.json"""
+        index = {"entries": {}, "files": {}}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as file:
+                    index.update(json.load(file))
+            except (OSError, ValueError) as e:
+                logger.error(f"Can't read jar cache index, starting empty: {e}")
+        return index
+
+    def _save_index(self):
+        """Saves index.json atomically"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.index, file, indent=4)
+            file.flush()
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _key(jar_type: int, version: str) -> str:
+        return f"{jar_type}:{version}"
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def object_path(self, sha256: str) -> str:
+        """Path of the stored object for a digest"""
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def lookup(self, jar_type: int, version: str) -> str | None:
+        """Returns the stored jar path for (jar_type, version) if cached"""
+        with self._lock:
+            entry = self.index["entries"].get(self._key(jar_type, version))
+            if not entry:
+                return None
+
+            path = self.object_path(entry["sha256"])
+            if not os.path.exists(path):
+                del self.index["entries"][self._key(jar_type, version)]
+                self._save_index()
+                return None
+            return path
+
+    def _store(self, tmp_path: str, sha256: str) -> str:
+        """Moves a verified file into the object store"""
+        path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        return path
+
+    def _download(self, url: str, progress=None) -> tuple[str, str]:
+        """
+        Downloads url into the downloads dir, resuming a previous partial
+        download when the server supports range requests.
+        Returns (path, sha256).
+        """
+        os.makedirs(self.downloads_dir, exist_ok=True)
+        part_name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part"
+        part_path = os.path.join(self.downloads_dir, part_name)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with requests.get(url, stream=True, headers=headers, timeout=30) as response:
+            if response.status_code == 416:
+                # partial file is already complete
+                response.close()
+            else:
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    logger.info(f"Server does not support resume for {url}")
+                    offset = 0
+
+                total = int(response.headers.get("Content-Length", 0)) + offset
+                mode = "ab" if offset else "wb"
+                with open(part_path, mode) as file:
+                    done = offset
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        file.write(chunk)
+                        done += len(chunk)
+                        if progress:
+                            progress(done, total)
+
+        return part_path, hash_file(part_path)
+
+    def fetch(
+        self,
+        url: str,
+        jar_type: int,
+        version: str,
+        expected_sha256: str = None,
+        expected_sha1: str = None,
+        progress=None,
+    ) -> str:
+        """
+        Returns the path of the cached jar, downloading it if needed.
+        Raises ValueError if the checksum does not match.
+        The download runs outside the cache lock, so only requests for
+        the same jar wait for each other.
+        """
+        key = self._key(jar_type, version)
+        with self._key_lock(key):
+            with self._lock:
+                path = self.lookup(jar_type, version)
+                sha256 = self.index["entries"][key]["sha256"] if path else None
+            if path and hash_file(path) != sha256:
+                logger.warning(f"Cached jar {sha256} is corrupted, downloading again")
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                path = None
+
+            if not path:
+                logger.info(f"Downloading {url} into jar cache")
+                part_path, sha256 = self._download(url, progress=progress)
+                if (expected_sha256 and sha256 != expected_sha256.lower()) or (
+                    expected_sha1 and hash_file(part_path, "sha1") != expected_sha1.lower()
+                ):
+                    os.unlink(part_path)
+                    raise ValueError(f"Checksum mismatch for {url}")
+                with self._lock:
+                    path = self._store(part_path, sha256)
+            else:
+                logger.info(f"Jar cache hit for {key}")
+
+            with self._lock:
+                self.index["entries"][key] = {
+                    "sha256": sha256,
+                    "url": url,
+                    "size": os.path.getsize(path),
+                    "last_used": time.time(),
+                }
+                # the object found by dedupe is known by its version now
+                self.index["entries"].pop(f"dedupe:{sha256}", None)
+                self._save_index()
+
+        return path
+
+    def install(
+        self,
+        url: str,
+        jar_type: int,
+        version: str,
+        dest: str,
+        expected_sha256: str = None,
+        expected_sha1: str = None,
+        progress=None,
+    ) -> str:
+        """Places the jar for (jar_type, version) at dest. Returns the method used"""
+        method = None
+        while method is None:
+            path = self.fetch(
+                url=url,
+                jar_type=jar_type,
+                version=version,
+                expected_sha256=expected_sha256,
+                expected_sha1=expected_sha1,
+                progress=progress,
+            )
+            # under the lock, so evict can't remove the jar before it is cloned
+            with self._lock:
+                if os.path.exists(path):
+                    method = clone_file(path, dest, allow_hardlink=False)
+        logger.info(f"Installed {jar_type}:{version} at {dest} ({method})")
+        self.evict()
+        return method
+
+    def evict(self, max_size: int = None):
+        """
+        Removes least recently used jars until the store fits max_size.
+        Jars still hardlinked by a server (linked by older versions) are removed last.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        with self._lock:
+            by_sha = {}
+            for key, entry in self.index["entries"].items():
+                current = by_sha.setdefault(entry["sha256"], {"keys": [], "last_used": 0})
+                current["keys"].append(key)
+                current["last_used"] = max(current["last_used"], entry["last_used"])
+
+            objects = []
+            total = 0
+            for sha256, info in by_sha.items():
+                path = self.object_path(sha256)
+                if not os.path.exists(path):
+                    continue
+                stat = os.stat(path)
+                total += stat.st_size
+                objects.append((stat.st_nlink > 1, info["last_used"], sha256, stat.st_size))
+
+            if total <= max_size:
+                return
+
+            for _in_use, _last_used, sha256, size in sorted(objects):
+                if total <= max_size:
+                    break
+                os.unlink(self.object_path(sha256))
+                for key in by_sha[sha256]["keys"]:
+                    del self.index["entries"][key]
+                total -= size
+                logger.info(f"Evicted {sha256} from jar cache")
+
+            self._save_index()
+
+    def _index_object(self, sha256: str):
+        """Adds an entry for an object no (jar_type, version) refers to, so it can be evicted"""
+        if any(entry["sha256"] == sha256 for entry in self.index["entries"].values()):
+            return
+        self.index["entries"][f"dedupe:{sha256}"] = {
+            "sha256": sha256,
+            "url": None,
+            "size": os.path.getsize(self.object_path(sha256)),
+            "last_used": time.time(),
+        }
+
+    def dedupe(self, servers_dir: str, skip: set[str] = frozenset()) -> tuple[int, int]:
+        """
+        Shares identical server.jar files under servers_dir with the store
+        through reflinks, on filesystems that support them. Jars hardlinked
+        to the store by older versions get their own copy back.
+        Folders in skip (servers that are running) are left alone.
+        Jars are hashed outside the cache lock.
+        Returns (files reflinked, bytes saved).
+        """
+        linked = 0
+        saved = 0
+        skip = {os.path.normcase(os.path.abspath(path)) for path in skip}
+        for root, dirs, files in os.walk(servers_dir):
+            if os.path.normcase(os.path.abspath(root)) in skip:
+                dirs.clear()
+                continue
+            if "server.jar" not in files:
+                continue
+
+            jar_path = os.path.join(root, "server.jar")
+            stat = os.stat(jar_path)
+            signature = [stat.st_size, stat.st_mtime, stat.st_ino]
+            known = self.index["files"].get(jar_path)
+            # unchanged since the last dedupe: already shared if it can be
+            unchanged = bool(known and known["signature"] == signature)
+            sha256 = known["sha256"] if unchanged else hash_file(jar_path)
+
+            with self._lock:
+                object_path = self.object_path(sha256)
+                if not os.path.exists(object_path):
+                    # first copy seen becomes the stored object
+                    clone_file(jar_path, object_path, allow_hardlink=False)
+
+                elif os.path.samefile(jar_path, object_path):
+                    # hardlinked: writing to the jar would change the stored one
+                    tmp_path = jar_path + ".tmp"
+                    try:
+                        clone_file(object_path, tmp_path, allow_hardlink=False)
+                        os.replace(tmp_path, jar_path)
+                    except OSError as e:
+                        logger.warning(f"Can't unlink {jar_path} from the jar cache: {e}")
+
+                elif not unchanged and _reflink(object_path, jar_path + ".tmp"):
+                    try:
+                        os.replace(jar_path + ".tmp", jar_path)
+                        linked += 1
+                        saved += stat.st_size
+                    except OSError as e:
+                        logger.warning(f"Can't reflink {jar_path}: {e}")
+
+                self._index_object(sha256)
+                stat = os.stat(jar_path)
+                self.index["files"][jar_path] = {
+                    "sha256": sha256,
+                    "signature": [stat.st_size, stat.st_mtime, stat.st_ino],
+                }
+
+        with self._lock:
+            self._save_index()
+
+        logger.info(f"Jar dedupe completed: {linked} files reflinked, {saved} bytes saved")
+        return linked, saved
+
+
+class ForgeLibraryCache:
+    """
+    Per Forge version store of the libraries/ tree generated by the installer.
+    New servers get the tree cloned in before installing, so the installer
+    finds every library (and patched jar) already in place.
+    Library jars are named by their version and never rewritten: they are
+    hardlinked when reflinks aren't available, so servers share them on any
+    filesystem. Other files are reflinked or copied, so a server that
+    rewrites one in place doesn't change it for the cache and other servers.
+    """
+
+    COMPLETE_MARKER = ".complete"
+
+    def __init__(self, cache_dir: str = mcssettings.FORGE_LIBRARY_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ForgeLibraryCache(path={self.cache_dir!r}, versions={self.versions()})"
+
+    def version_dir(self, version: str) -> str:
+        """Cache folder of a Forge version"""
+        return os.path.join(self.cache_dir, version)
+
+    def versions(self) -> list[str]:
+        """Forge versions with a complete cache"""
+        return [
+            version
+            for version in self._cached_versions()
+            if os.path.exists(
+                os.path.join(self.version_dir(version), self.COMPLETE_MARKER)
+            )
+        ]
+
+    def _cached_versions(self) -> list[str]:
+        """Versions with a cache folder, complete or not"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return os.listdir(self.cache_dir)
+
+    @staticmethod
+    def _clone_tree(src: str, dst: str) -> int:
+        """
+        Clones every file under src (a libraries/ folder) missing from dst.
+        Returns the number of files cloned.
+        """
+        count = 0
+        for root, _dirs, files in os.walk(src):
+            relative_root = os.path.join("libraries", os.path.relpath(root, src))
+            target_root = os.path.join(dst, os.path.relpath(root, src))
+            for filename in files:
+                target = os.path.join(target_root, filename)
+                if not os.path.exists(target):
+                    clone_file(
+                        os.path.join(root, filename),
+                        target,
+                        allow_hardlink=is_immutable(os.path.join(relative_root, filename)),
+                    )
+                    count += 1
+        return count
+
+    def seed(self, version: str, server_path: str) -> int:
+        """
+        Clones the cached libraries of version into server_path/libraries.
+        Returns the number of files cloned (0 on cache miss).
+        """
+        # under the lock, so collect_garbage can't delete the version meanwhile
+        with self._lock:
+            if version not in self.versions():
+                logger.info(f"No shared libraries for Forge {version}")
+                return 0
+
+            count = self._clone_tree(
+                os.path.join(self.version_dir(version), "libraries"),
+                os.path.join(server_path, "libraries"),
+            )
+        logger.info(f"Cloned {count} shared libraries for Forge {version}")
+        return count
+
+    def populate(self, version: str, server_path: str) -> int:
+        """
+        Adds the libraries of a freshly installed server to the cache.
+        Returns the number of files added.
+        """
+        libraries_path = os.path.join(server_path, "libraries")
+        if not os.path.isdir(libraries_path):
+            return 0
+
+        with self._lock:
+            os.makedirs(self.version_dir(version), exist_ok=True)
+            count = self._clone_tree(
+                libraries_path, os.path.join(self.version_dir(version), "libraries")
+            )
+            with open(
+                os.path.join(self.version_dir(version), self.COMPLETE_MARKER),
+                "w",
+                encoding="utf-8",
+            ) as marker:
+                marker.write(str(time.time()))
+
+        logger.info(f"Added {count} files to shared libraries of Forge {version}")
+        return count
+
+    def collect_garbage(self, versions_in_use: set[str]) -> int:
+        """
+        Deletes cached versions no server uses. versions_in_use must include
+        the versions of servers still being provisioned.
+        Returns the number of bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            for version in self._cached_versions():
+                if version in versions_in_use:
+                    continue
+
+                version_dir = self.version_dir(version)
+                for root, _dirs, files in os.walk(version_dir):
+                    for filename in files:
+                        stat = os.stat(os.path.join(root, filename))
+                        # hardlinked files stay on disk for their servers
+                        if stat.st_nlink == 1:
+                            freed += stat.st_size
+                shutil.rmtree(version_dir, ignore_errors=True)
+                logger.info(f"Removed shared libraries of Forge {version}")
+
+        return freed
+
+
+jar_cache = JarCache()
+forge_library_cache = ForgeLibraryCache()
@@ -0,0 +1,120 @@
+"""
+Class data sharing (AppCDS) module
+"""
+
+import glob
+import hashlib
+import os
+
+from config import settings as mcssettings
+from modules.servers.cache import hash_file
+from modules.servers.runtimes import java_major, runtime_registry
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+# -XX:ArchiveClassesAtExit (dynamic archives) exists since Java 13
+MIN_JAVA_MAJOR = 13
+
+TRAINING = "training"
+ACTIVE = "on"
+
+_jar_hashes = {}
+
+
+def jar_hash(path: str) -> str:
+    """sha256 of a jar, cached while the file is unchanged"""
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+    if key not in _jar_hashes:
+        _jar_hashes[key] = hash_file(path)
+    return _jar_hashes[key]
+
+
+class ClassDataArchive:
+    """
+    Dynamic CDS archive of a server.
+    The first successful run records the loaded classes at exit,
+    later runs map them from the archive instead of loading them.
+    An archive belongs to a (jar, plugins/mods, Java version) combination:
+    when any of them changes a new one is trained.
+    """
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+        self.path = os.path.join(mcssettings.CDS_DIR, uuid)
+        self.mode = None
+        self.archive = None
+
+    def __repr__(self):
+        return f"ClassDataArchive(uuid={self.uuid}, mode={self.mode})"
+
+    @staticmethod
+    def key(jar_sha256: str, addons_hash: str, version: str) -> str:
+        """Archive identity"""
+        return hashlib.sha256(f"{jar_sha256}:{addons_hash}:{version}".encode()).hexdigest()[
+            :32
+        ]
+
+    def _remove_stale(self, keep: str):
+        for path in glob.glob(os.path.join(self.path, "*.jsa*")):
+            if path != keep:
+                os.remove(path)
+                logger.info(f"Removed outdated class data archive {path}")
+
+    def launch_args(self, jar_path: str, addons_hash: str, java: str = "java") -> list[str]:
+        """
+        JVM options that use the archive, or train it if it doesn't exist.
+        Blocking: call it from a worker thread.
+        """
+        self.mode = None
+        self.archive = None
+        if not mcssettings.CDS_ENABLED or not os.path.exists(jar_path):
+            return []
+
+        runtime = runtime_registry.probe(java)
+        version = runtime.version if runtime else None
+        if not version or java_major(version) < MIN_JAVA_MAJOR:
+            logger.info(f"Class data sharing needs Java {MIN_JAVA_MAJOR}+, found {version}")
+            return []
+
+        os.makedirs(self.path, exist_ok=True)
+        archive = os.path.join(
+            self.path, f"{self.key(jar_hash(jar_path), addons_hash, version)}.jsa"
+        )
+        self.archive = archive
+        self._remove_stale(keep=archive)
+
+        if os.path.exists(archive):
+            self.mode = ACTIVE
+            return [f"-XX:SharedArchiveFile={archive}"]
+
+        self.mode = TRAINING
+        logger.info(f"Training class data archive for server {self.uuid}")
+        return [f"-XX:ArchiveClassesAtExit={archive}.tmp"]
+
+    def finish(self, successful: bool):
+        """
+        Called when the server exits. A training run's archive is kept
+        only if the server got ready and shut down cleanly.
+        """
+        if self.mode != TRAINING:
+            return
+        training_path = f"{self.archive}.tmp"
+        if successful and os.path.exists(training_path):
+            os.replace(training_path, self.archive)
+            logger.info(
+                f"Class data archive for server {self.uuid} created "
+                f"({os.path.getsize(self.archive) / (1024 * 1024):.1f} MB)"
+            )
+        elif os.path.exists(training_path):
+            os.remove(training_path)
+        self.mode = None
+
+    def invalidate(self):
+        """Deletes the archives of the server"""
+        for path in glob.glob(os.path.join(self.path, "*.jsa*")):
+            os.remove(path)
+        if os.path.isdir(self.path):
+            os.rmdir(self.path)
@@ -0,0 +1,179 @@
+"""
+Checkpoint/restore (CRaC) module
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+from modules.logger import RotatingLogger
+from modules.servers.log_parser import CHECKPOINT_FAILED_RE
+
+
+logger = RotatingLogger()
+
+META_FILE = "checkpoint.json"
+IMAGE_DIR = "image"
+
+# Files of the server folder that affect a running server
+CONFIG_EXTENSIONS = (".properties", ".yml", ".yaml", ".json", ".toml", ".txt")
+CONFIG_DIRS = ("config", "plugins", "mods")
+
+
+@functools.lru_cache(maxsize=16)
+def _supports_crac(java: str, _mtime: float) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            result = subprocess.run(
+                [java, f"-XX:CRaCCheckpointTo={directory}", "-version"],
+                capture_output=True,
+                timeout=30,
+                check=False,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return False
+    return result.returncode == 0
+
+
+def supports_crac(java: str = "java") -> bool:
+    """True if java is a CRaC-enabled JDK on Linux (cached)"""
+    if platform.system() != "Linux":
+        return False
+    path = shutil.which(java)
+    if not path:
+        return False
+    return _supports_crac(path, os.path.getmtime(path))
+
+
+def jcmd_path(java: str = "java") -> str | None:
+    """jcmd of the same JDK as java"""
+    path = shutil.which(java)
+    if not path:
+        return None
+    jcmd = os.path.join(os.path.dirname(os.path.realpath(path)), "jcmd")
+    return jcmd if os.path.exists(jcmd) else shutil.which("jcmd")
+
+
+def fingerprint(root: str, world_dirs: list[str], jar_sha256: str) -> str:
+    """
+    Hash of what a checkpoint depends on: the jar, the config files
+    and the world files (names, sizes and modification times).
+    Blocking: call it from a worker thread.
+    """
+    digest = hashlib.sha256(jar_sha256.encode())
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_file() and entry.name.endswith(CONFIG_EXTENSIONS):
+            stat = entry.stat()
+            digest.update(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+
+    for directory in (*CONFIG_DIRS, *world_dirs):
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, directory)):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                relative_path = os.path.relpath(path, root)
+                digest.update(f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """
+    CRaC image of a booted server, stored beside the server folder.
+    An image is valid only while the files it was taken from are unchanged.
+    """
+
+    def __init__(self, folder_path: str):
+        self.path = os.path.normpath(folder_path) + ".checkpoint"
+        self.image_path = os.path.join(self.path, IMAGE_DIR)
+        self.meta_path = os.path.join(self.path, META_FILE)
+
+    def __repr__(self):
+        return f"Checkpoint(path={self.path!r})"
+
+    @property
+    def metadata(self) -> dict | None:
+        """Metadata of the stored image, None if there is none"""
+        if not os.path.exists(self.meta_path):
+            return None
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def is_valid(self, current_fingerprint: str) -> bool:
+        """True if the image can be restored"""
+        metadata = self.metadata
+        return bool(metadata) and metadata.get("fingerprint") == current_fingerprint
+
+    def launch_args(self) -> list[str]:
+        """JVM options that allow taking a checkpoint later"""
+        return [f"-XX:CRaCCheckpointTo={self.image_path}"]
+
+    def restore_command(self, java: str = "java") -> list[str]:
+        """Command line that restores the image"""
+        return [java, f"-XX:CRaCRestoreFrom={self.image_path}"]
+
+    def prepare(self):
+        """Clears the old image before taking a new one"""
+        self.invalidate()
+        os.makedirs(self.image_path, exist_ok=True)
+
+    async def take(self, pid: int, java: str = "java") -> bool:
+        """
+        Asks the JVM to checkpoint itself. The JVM exits once the image is written.
+        Returns True if the request was accepted. jcmd exits with 0 even when
+        CRaC refuses the checkpoint, so its output is checked too.
+        """
+        jcmd = jcmd_path(java)
+        if not jcmd:
+            logger.error("jcmd not found, can't take a checkpoint")
+            return False
+
+        process = await asyncio.create_subprocess_exec(
+            jcmd,
+            str(pid),
+            "JDK.checkpoint",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        output, _ = await process.communicate()
+        output = output.decode(errors="replace")
+        if process.returncode != 0 or CHECKPOINT_FAILED_RE.search(output):
+            logger.error(f"Checkpoint of {pid} failed: {output}")
+            return False
+        return True
+
+    def commit(self, current_fingerprint: str) -> bool:
+        """Marks the image as valid once the JVM has written it"""
+        if not os.path.isdir(self.image_path) or not os.listdir(self.image_path):
+            logger.error(f"{self} has no image")
+            return False
+        with open(self.meta_path, "w", encoding="utf-8") as file:
+            json.dump({"fingerprint": current_fingerprint, "created_at": time.time()}, file)
+        logger.info(f"{self} saved")
+        return True
+
+    def consume(self):
+        """
+        A restored server changes its world:
+        the image can't be restored again.
+        """
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+    def invalidate(self):
+        """Deletes the image"""
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,161 @@
+"""
+Server console module
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+
+class Console:
+    """
+    Reads a server's output in large chunks and delivers it
+    to the viewers (ui.log elements) in batches at a bounded rate.
+    A batch keeps at most max_batch_lines lines, the most recent ones:
+    viewers don't show more than that anyway.
+    """
+
+    def __init__(
+        self,
+        flush_rate: int = mcssettings.CONSOLE_FLUSH_RATE,
+        max_line_length: int = mcssettings.CONSOLE_MAX_LINE_LENGTH,
+        max_batch_lines: int = mcssettings.MAX_LOG_LINES,
+    ):
+        self.flush_interval = 1 / flush_rate
+        self.max_line_length = max_line_length
+        self.viewers = []
+        self.subscribers = []
+        self.lines_per_sec = 0
+        self.bytes_per_sec = 0
+        self.total_lines = 0
+        self.total_bytes = 0
+        self._pending = deque(maxlen=max_batch_lines)
+        self._partial = b""
+        self._window_start = time.monotonic()
+        self._window_lines = 0
+        self._window_bytes = 0
+
+    def __repr__(self):
+        return (
+            f"Console(viewers={len(self.viewers)}, "
+            f"lines_per_sec={self.lines_per_sec}, bytes_per_sec={self.bytes_per_sec})"
+        )
+
+    def add_viewer(self, viewer):
+        """Adds a ui.log that receives the console output"""
+        if viewer not in self.viewers:
+            self.viewers.append(viewer)
+
+    def remove_viewer(self, viewer):
+        """Stops delivering output to a ui.log"""
+        if viewer in self.viewers:
+            self.viewers.remove(viewer)
+
+    def subscribe(self, callback):
+        """
+        Registers callback(lines: list[str]), called with every batch
+        of complete lines as soon as they are read.
+        """
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Removes a subscriber"""
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def _split(self, data: bytes) -> list[str]:
+        """
+        Splits data into complete lines, keeping the incomplete tail
+        for the next chunk. Lines longer than max_line_length are cut.
+        """
+        data = self._partial + data
+        raw_lines = data.split(b"\n")
+        self._partial = raw_lines.pop()
+        if len(self._partial) > self.max_line_length:
+            raw_lines.append(self._partial)
+            self._partial = b""
+
+        lines = []
+        for raw_line in raw_lines:
+            line = raw_line.decode(errors="replace").rstrip("\r")
+            while len(line) > self.max_line_length:
+                lines.append(line[: self.max_line_length])
+                line = line[self.max_line_length :]
+            lines.append(line)
+        return lines
+
+    def feed(self, data: bytes):
+        """Processes a chunk of raw output"""
+        lines = self._split(data) if data else []
+        if not data and self._partial:
+            # end of stream: deliver the last incomplete line
+            lines = [self._partial.decode(errors="replace").rstrip("\r")]
+            self._partial = b""
+
+        self.total_bytes += len(data)
+        self._window_bytes += len(data)
+        if not lines:
+            return
+
+        self.total_lines += len(lines)
+        self._window_lines += len(lines)
+        self._pending.extend(lines)
+        for callback in self.subscribers:
+            try:
+                callback(lines)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Console subscriber error: {e}")
+
+    def flush(self):
+        """Delivers pending lines to the viewers"""
+        self._update_stats()
+        if not self._pending:
+            return
+
+        lines = list(self._pending)
+        self._pending.clear()
+        for viewer in list(self.viewers):
+            if viewer.is_deleted:
+                self.remove_viewer(viewer)
+                continue
+            # no point in sending lines the viewer would drop
+            batch = lines[-viewer.max_lines :] if viewer.max_lines else lines
+            viewer.push("\n".join(batch))
+
+    def _update_stats(self):
+        """Updates lines/sec and bytes/sec once per second"""
+        elapsed = time.monotonic() - self._window_start
+        if elapsed < 1:
+            return
+        self.lines_per_sec = round(self._window_lines / elapsed, 1)
+        self.bytes_per_sec = round(self._window_bytes / elapsed, 1)
+        self._window_start = time.monotonic()
+        self._window_lines = 0
+        self._window_bytes = 0
+
+    async def _flush_loop(self):
+        """Flushes pending lines at the configured rate"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def read(self, stream: asyncio.StreamReader):
+        """Reads stream until EOF"""
+        flush_task = asyncio.create_task(self._flush_loop())
+        try:
+            while True:
+                data = await stream.read(mcssettings.CONSOLE_READ_SIZE)
+                self.feed(data)
+                if not data:
+                    break
+        finally:
+            flush_task.cancel()
+            self.flush()
+            self.lines_per_sec = 0
+            self.bytes_per_sec = 0
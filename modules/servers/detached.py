@@ -0,0 +1,221 @@
+"""
+Detached servers module.
+Servers in detached mode run under a runner process (see runner.py)
+instead of being children of MCSC, so they survive MCSC restarts.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import platform
+import secrets
+import subprocess
+import sys
+import time
+
+import psutil
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+# seconds between the creation of a process and the start time recorded for it:
+# a process with the same pid created further apart is another one
+PID_REUSE_TOLERANCE = 5
+
+
+def state_path(uuid: str) -> str:
+    """Runner state file of a server"""
+    return os.path.join(mcssettings.RUNNERS_DIR, f"{uuid}.json")
+
+
+def read_state(uuid: str) -> dict | None:
+    """Runner state of a server, None if it has no runner"""
+    try:
+        with open(state_path(uuid), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_state(uuid: str):
+    """Forgets the runner of a server"""
+    if os.path.exists(state_path(uuid)):
+        os.remove(state_path(uuid))
+
+
+def is_alive(pid: int | None, started_at: float | None = None) -> bool:
+    """
+    True if pid is running and is the process started at started_at.
+    The creation time is compared to tell a reused pid from the original process.
+    """
+    if not pid:
+        return False
+    try:
+        process = psutil.Process(pid)
+        if process.status() == psutil.STATUS_ZOMBIE:
+            return False
+        if started_at and abs(process.create_time() - started_at) > PID_REUSE_TOLERANCE:
+            # the pid has been reused
+            return False
+        return True
+    except psutil.Error:
+        return False
+
+
+class RunnerProcess:
+    """
+    A server JVM owned by a runner, with the interface of
+    asyncio.subprocess.Process the server models use.
+    """
+
+    def __init__(
+        self, uuid: str, state: dict, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self.uuid = uuid
+        self.pid = state["pid"]
+        self.runner_pid = state["runner_pid"]
+        self.runner_started_at = state.get("runner_started_at")
+        self.started_at = state["started_at"]
+        self.stdout = reader
+        self.stdin = writer
+        self.returncode = None
+
+    def __repr__(self):
+        return f"RunnerProcess(pid={self.pid}, runner_pid={self.runner_pid})"
+
+    def _signal(self, kill: bool = False):
+        if not is_alive(self.pid, self.started_at):
+            return
+        try:
+            process = psutil.Process(self.pid)
+            if kill:
+                process.kill()
+            else:
+                process.terminate()
+        except psutil.Error as e:
+            logger.error(f"Can't signal {self}: {e}")
+
+    def terminate(self):
+        """Sends SIGTERM to the JVM"""
+        self._signal()
+
+    def kill(self):
+        """Kills the JVM"""
+        self._signal(kill=True)
+
+    async def wait(self) -> int:
+        """Waits for the JVM to exit and returns its exit code"""
+        while self.returncode is None:
+            state = await asyncio.to_thread(read_state, self.uuid) or {}
+            if state.get("returncode") is not None:
+                self.returncode = state["returncode"]
+            elif not is_alive(self.runner_pid, self.runner_started_at):
+                if is_alive(self.pid, self.started_at):
+                    # nobody can talk to it anymore: Minecraft saves on SIGTERM
+                    logger.error(f"Runner of server {self.uuid} died, terminating the JVM")
+                    self.terminate()
+                else:
+                    logger.error(f"Runner of server {self.uuid} died")
+                    self.returncode = -1
+            if self.returncode is None:
+                await asyncio.sleep(mcssettings.RUNNER_POLL_INTERVAL)
+
+        self.stdin.close()
+        await asyncio.to_thread(remove_state, self.uuid)
+        return self.returncode
+
+
+async def connect_runner(uuid: str, state: dict) -> RunnerProcess:
+    """Attaches to the runner of a server"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", state["port"])
+    writer.write(f"{state['token']}\n".encode())
+    await writer.drain()
+    return RunnerProcess(uuid, state, reader, writer)
+
+
+async def spawn_runner(uuid: str, cmd: list[str], cwd: str, env: dict | None = None) -> RunnerProcess:
+    """Starts a server JVM under a new runner and attaches to it"""
+    os.makedirs(mcssettings.RUNNERS_DIR, exist_ok=True)
+    path = state_path(uuid)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "uuid": uuid,
+                "cmd": cmd,
+                "cwd": cwd,
+                "token": secrets.token_hex(16),
+                "backlog_size": mcssettings.RUNNER_BACKLOG_SIZE,
+                "stop_timeout": mcssettings.STOP_TIMEOUT,
+            },
+            file,
+            indent=4,
+        )
+
+    if platform.system() == "Windows":
+        options = {
+            "creationflags": subprocess.DETACHED_PROCESS
+            | subprocess.CREATE_NEW_PROCESS_GROUP
+        }
+    else:
+        # own session: not killed with MCSC or its terminal
+        options = {"start_new_session": True}
+
+    with open(os.path.join(mcssettings.RUNNERS_DIR, f"{uuid}.log"), "wb") as log:
+        subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", "modules.servers.runner", path],
+            cwd=os.getcwd(),
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            **options,
+        )
+
+    deadline = time.monotonic() + mcssettings.RUNNER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        state = await asyncio.to_thread(read_state, uuid) or {}
+        if state.get("error"):
+            remove_state(uuid)
+            raise FileNotFoundError(state["error"])
+        if state.get("port"):
+            logger.info(f"Server {uuid} started under runner {state['runner_pid']}")
+            return await connect_runner(uuid, state)
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Runner of server {uuid} didn't start")
+
+
+def collect_runners() -> dict[str, dict]:
+    """
+    Finds the runners left by a previous MCSC.
+    Stale state files (runner gone, pid reused) are removed and
+    JVMs that lost their runner are terminated.
+    Returns the states of the live runners by server uuid.
+    """
+    runners = {}
+    for path in glob.glob(os.path.join(mcssettings.RUNNERS_DIR, "*.json")):
+        uuid = os.path.basename(path)[: -len(".json")]
+        state = read_state(uuid)
+        if not state or not state.get("port"):
+            remove_state(uuid)
+            continue
+
+        jvm_alive = is_alive(state.get("pid"), state.get("started_at"))
+        runner_alive = is_alive(state.get("runner_pid"), state.get("runner_started_at"))
+        if state.get("returncode") is None and runner_alive and jvm_alive:
+            logger.info(f"Server {uuid} is still running (pid {state['pid']})")
+            runners[uuid] = state
+            continue
+
+        if jvm_alive and state.get("returncode") is None:
+            logger.warning(f"Server {uuid} lost its runner, terminating pid {state['pid']}")
+            try:
+                psutil.Process(state["pid"]).terminate()
+            except psutil.Error:
+                pass
+        logger.info(f"Removing stale runner state of server {uuid}")
+        remove_state(uuid)
+    return runners
@@ -0,0 +1,135 @@
+"""
+Prometheus metrics exporter module
+"""
+
+import time
+
+from modules.servers.admission import admission_controller
+from modules.servers.models import (
+    READY,
+    RESTARTING,
+    STARTING,
+    STOPPED,
+    STOPPING,
+    MinecraftServer,
+    get_server_list,
+)
+from modules.servers.supervisor import supervisor
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+STATES = (STOPPED, STARTING, READY, STOPPING, RESTARTING)
+JAR_TYPES = {0: "vanilla", 1: "paper", 2: "forge"}
+
+
+def _escape(value) -> str:
+    """Escapes a label value"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class MetricFamily:
+    """Samples of one metric, rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, kind: str, description: str):
+        self.name = name
+        self.kind = kind
+        self.description = description
+        self.samples = []
+
+    def add(self, labels: dict, value: float | None):
+        """Adds a sample, unknown values are left out"""
+        if value is not None:
+            self.samples.append((labels, value))
+
+    def render(self) -> list[str]:
+        """Lines of the family"""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for labels, value in self.samples:
+            if labels:
+                lines.append(f"{self.name}{{{_labels(labels)}}} {float(value)}")
+            else:
+                lines.append(f"{self.name} {float(value)}")
+        return lines
+
+
+def server_labels(server: MinecraftServer) -> dict:
+    """Labels that identify a server"""
+    return {
+        "uuid": server.uuid,
+        "name": server.name or "",
+        "jar_type": JAR_TYPES.get(server.jar_type, server.jar_type),
+        "version": server.settings.get("version", ""),
+    }
+
+
+def render_metrics() -> str:
+    """
+    Metrics of every server in the Prometheus text format.
+    Only reads values that are already in memory (the monitors are fed
+    by the resource sampler), so a scrape never calls psutil or touches disk.
+    """
+    families = {
+        name: MetricFamily(name, kind, description)
+        for name, kind, description in (
+            ("mcsc_server_state", "gauge", "1 for the current lifecycle state of the server"),
+            ("mcsc_server_up", "gauge", "1 if the server is ready"),
+            ("mcsc_server_unresponsive", "gauge", "1 if the watchdog found the server not responding"),
+            ("mcsc_server_uptime_seconds", "gauge", "Seconds since the server process started"),
+            ("mcsc_server_startup_seconds", "gauge", "Time the last start took to get ready"),
+            ("mcsc_server_memory_rss_bytes", "gauge", "Resident memory of the server process tree"),
+            ("mcsc_server_cpu_percent", "gauge", "CPU usage of the server process tree"),
+            ("mcsc_server_disk_read_bytes_per_second", "gauge", "Disk read rate"),
+            ("mcsc_server_disk_write_bytes_per_second", "gauge", "Disk write rate"),
+            ("mcsc_server_threads", "gauge", "Threads of the server process tree"),
+            ("mcsc_server_open_files", "gauge", "Open files of the server process tree"),
+            ("mcsc_server_players", "gauge", "Players online"),
+            ("mcsc_server_tps", "gauge", "Last TPS reported by the server"),
+            ("mcsc_server_console_lines_total", "counter", "Console lines printed by the server"),
+            ("mcsc_server_exits_total", "counter", "Server process exits by reason"),
+            ("mcsc_server_restarts_total", "counter", "Automatic restarts after a crash"),
+        )
+    }
+
+    def add(name: str, labels: dict, value: float | None):
+        families[name].add(labels, value)
+
+    now = time.time()
+    for server in list(get_server_list()):
+        labels = server_labels(server)
+        for state in STATES:
+            add("mcsc_server_state", {**labels, "state": state}, int(server.state == state))
+        add("mcsc_server_up", labels, int(server.state == READY))
+        add("mcsc_server_unresponsive", labels, int(server.unresponsive))
+        if server.state != STOPPED and server.started_at:
+            add("mcsc_server_uptime_seconds", labels, round(now - server.started_at, 3))
+        add("mcsc_server_startup_seconds", labels, server.startup_seconds)
+
+        monitor = server.monitor
+        add("mcsc_server_memory_rss_bytes", labels, int(monitor.ram_usage * 1024 * 1024))
+        add("mcsc_server_cpu_percent", labels, monitor.cpu_usage)
+        add("mcsc_server_disk_read_bytes_per_second", labels, int(monitor.disk_read * 1024 * 1024))
+        add("mcsc_server_disk_write_bytes_per_second", labels, int(monitor.disk_write * 1024 * 1024))
+        add("mcsc_server_threads", labels, monitor.threads)
+        add("mcsc_server_open_files", labels, monitor.open_files)
+
+        add("mcsc_server_players", labels, len(server.players))
+        add("mcsc_server_tps", labels, server.tps)
+        add("mcsc_server_console_lines_total", labels, server.console_lines)
+        for reason, count in list(supervisor.exits.get(server.uuid, {}).items()):
+            add("mcsc_server_exits_total", {**labels, "reason": reason}, count)
+        add("mcsc_server_restarts_total", labels, supervisor.restarts.get(server.uuid, 0))
+
+    fleet = MetricFamily("mcsc_fleet_queued_starts", "gauge", "Server starts waiting for admission")
+    fleet.add({}, len(admission_controller.queue))
+
+    lines = []
+    for family in [*families.values(), fleet]:
+        lines += family.render()
+    return "\n".join(lines) + "\n"
@@ -3,23 +3,126 @@ Forge server module
 """
 
 import asyncio
-import subprocess
+import glob
 import os
+import platform
+import shlex
+import time
 
 from modules.translations import translate as _
 
+from modules.servers.cache import forge_library_cache
+from config import settings as mcssettings
+from modules.servers.jvm import jvm_args
 from modules.servers.models import MinecraftServer
 from modules.logger import RotatingLogger
-from modules.telemetry import TelemetryClient
 
-telemetry_client = TelemetryClient()
 logger = RotatingLogger()
 
+INSTALL_FILES_TIMEOUT = 30
+# Launch arguments generated by the installer (1.17+), per platform
+ARGS_FILENAME = "win_args.txt" if platform.system() == "Windows" else "unix_args.txt"
+
+# Installer output line prefix -> install phase
+INSTALLER_PHASES = {
+    "Considering minecraft server jar": "download",
+    "Downloading libraries": "download",
+    "Building Processors": "patch",
+    "The server installed successfully": "done",
+}
+
+
+async def wait_for_path(path: str, timeout: float) -> bool:
+    """
+    Waits for path to exist without blocking the event loop.
+    Returns False on timeout.
+    """
+    delay = 0.05
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1)
+    return True
+
+
+def read_args_file(path: str) -> list[str]:
+    """
+    Splits a java @argfile into arguments:
+    whitespace separated, quotes group, # starts a comment.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return shlex.split(file.read(), comments=True, posix=True)
+
+
+class ForgeInstallReport:
+    """
+    Follows the Forge installer output and times its phases
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.phase = "setup"
+        self.phase_started_at = self.started_at
+        self.timings = {}
+        self.libraries_downloaded = 0
+        self.libraries_cached = 0
+
+    def _enter(self, phase: str):
+        """Closes the current phase and starts a new one"""
+        if phase == self.phase:
+            return
+        now = time.monotonic()
+        self.timings[self.phase] = self.timings.get(self.phase, 0) + (
+            now - self.phase_started_at
+        )
+        self.phase = phase
+        self.phase_started_at = now
+
+    def feed(self, line: str):
+        """Processes an installer output line"""
+        stripped = line.strip()
+        if stripped.startswith("Downloading library from"):
+            self.libraries_downloaded += 1
+        elif stripped.startswith("File exists: Checksum validated"):
+            self.libraries_cached += 1
+
+        for prefix, phase in INSTALLER_PHASES.items():
+            if stripped.startswith(prefix):
+                self._enter(phase)
+                break
+
+    def finish(self):
+        """Closes the last phase"""
+        self._enter("done")
+
+    @property
+    def total(self) -> float:
+        """Total seconds spent installing"""
+        return sum(self.timings.values())
+
+    def summary(self) -> str:
+        """Display-friendly timings"""
+        phases = ", ".join(
+            f"{phase} {seconds:.1f}s" for phase, seconds in self.timings.items()
+        )
+        return (
+            f"Forge installed in {self.total:.1f}s ({phases}); "
+            f"libraries downloaded: {self.libraries_downloaded}, "
+            f"already present: {self.libraries_cached}"
+        )
+
 
 class ForgeServer(MinecraftServer):
     """
     Forge server class
     """
+
+    def __init__(self, settings, uuid=""):
+        self.install_report = None
+        super().__init__(settings, uuid)
+
     @property
     def jar_path(self) -> str:
         """server's jar path"""
@@ -33,45 +136,79 @@ class ForgeServer(MinecraftServer):
         """server's jar path"""
         return os.path.join(self.settings["folder_path"], "server")
 
-    def _init_forge_server(self):
-        """Initializes forge server"""
-        # install server
+    async def _init_forge_server(self):
+        """
+        Runs the Forge installer, streaming its output into the job log.
+        Installation is complete once the installer exited successfully
+        and the files it generates are on disk.
+        """
         logger.info(f"Initializing forge server {self.uuid}")
         assert self.jar_type == 2
+        self.runtime = await asyncio.to_thread(self.get_runtime)
+        cmd = [
+            self.java,
+            "-jar",
+            "server.jar",
+            "--installServer",
+            "server",
+        ]
+        report = ForgeInstallReport()
+
+        # Start the subprocess
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=self.settings["folder_path"],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=self.runtime.env() if self.runtime else None,
+        )
         try:
-            cmd = [
-                "java",
-                "-jar",
-                "server.jar",
-                "--installServer",
-                "server",
-            ]
-
-            # Start the subprocess
-            subprocess.run(
-                cmd,
-                cwd=self.settings["folder_path"],
-                check=False,
+            async for raw_line in process.stdout:
+                line = raw_line.decode(errors="replace").rstrip()
+                report.feed(line)
+                if self.job:
+                    self.job.log_line(line)
+                    self.job.check_cancelled()
+            returncode = await process.wait()
+
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+        report.finish()
+        self.install_report = report
+        logger.info(f"Forge installer for {self.uuid}: {report.summary()}")
+        if self.job:
+            self.job.log_line(report.summary())
+
+        if returncode != 0:
+            raise RuntimeError(
+                _("Forge installer failed with exit code {code}", code=returncode)
             )
 
-        except Exception as e:
-            logger.error(f"Error while initializing forge server {self.uuid}: {e}")
+        # The installer may still be flushing its files
+        if not await wait_for_path(
+            os.path.join(self.server_path, "user_jvm_args.txt"),
+            timeout=INSTALL_FILES_TIMEOUT,
+        ):
+            raise ValueError(_("Unsupported Forge Version. THIS IS NOT A BUG!"))
+        if not self.args_file_path:
+            raise ValueError(_("Unsupported Forge Version. THIS IS NOT A BUG!"))
 
-    def _set_user_jvm_args(self):
+    def _set_user_jvm_args(self, extra_args: list[str] = ()):
         """Sets set_user_jvm_args for FORGE server. ONLY FORGE SERVERS"""
         if self.jar_type == 2:
             logger.info(f"Setting user jvm args for {self.uuid}")
             user_jvm_args_path = os.path.join(self.server_path, "user_jvm_args.txt")
-            args = f"-Xmx{self.settings['dedicated_ram']}G -Xms{self.settings['dedicated_ram']}G"
-
-            # Wait for server folder to be created
-            exists = bool(os.path.exists(self.server_path))
-            while not exists:
-                exists = bool(os.path.exists(self.server_path))
 
             if os.path.exists(user_jvm_args_path):
+                # one option per line, also read by run.bat/run.sh
                 with open(user_jvm_args_path, "w", encoding="utf-8") as file:
-                    file.write(args)
+                    file.write(
+                        "\n".join([*jvm_args(self.settings, self.java_major), *extra_args])
+                        + "\n"
+                    )
                     file.flush()
 
             else:
@@ -80,96 +217,79 @@ class ForgeServer(MinecraftServer):
         else:
             raise ValueError("This is not a Forge server")
 
-    async def start(self):
-        """Starts the forge server"""
-        self.starting = True
-        logger.info(f"Starting server {self.uuid}")
-        try:
-            if not os.path.exists(os.path.join(self.server_path, "run.bat")):
-                raise ValueError(_("Unsupported Forge Version. THIS IS NOT A BUG!"))
-
-            cmd = ["cmd.exe", "/c", "run.bat"]
-
-            # Start the subprocess
-            self.process = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=self.server_path,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
-            )
-
-            # Start monitoring the process
-            self.monitor.process = self.process
-            monitor_task = asyncio.create_task(self.monitor.run())
-
-            # Start tasks for reading output and taking input
-            output_task = asyncio.create_task(self._console_reader())
-            # input_task = asyncio.create_task(self.console_writer())
-
-            telemetry_client.send_event("server_start", details=self.settings)
-            # Wait for the server process to finish
-            await self.process.wait()
-
-            self.running = False
-
-            # Cancel input and output tasks once the server stops
-            await asyncio.gather(output_task, return_exceptions=True)
-            await asyncio.gather(monitor_task, return_exceptions=True)
-
-        except FileNotFoundError as e:
-            logger.error(f"Error: {e}")
-
-        except Exception as e:
-            logger.error(f"An error occurred: {e}")
+    @property
+    def args_file_path(self) -> str | None:
+        """unix_args.txt/win_args.txt of the installed Forge build"""
+        candidates = glob.glob(
+            os.path.join(self.server_path, "libraries", "net", "*", "*", "*", ARGS_FILENAME)
+        )
+        if not candidates:
+            return None
+        # prefer the build of this server if several were installed
+        for path in candidates:
+            if os.path.basename(os.path.dirname(path)) == self.version:
+                return path
+        return sorted(candidates)[-1]
 
-        finally:
-            self.starting = False
-            self.running = False
+    @property
+    def class_data_jar(self) -> str:
+        """The installer jar identifies the Forge build"""
+        return os.path.join(self.settings["folder_path"], "server.jar")
 
-    async def stop(self):
+    def _launch_command(self, extra_args: list[str] = ()) -> list[str]:
         """
-        Stops the server. Same as regular stop but
-        without waiting for the process to finish.
+        Same command as run.bat/run.sh, without the shell:
+        java @user_jvm_args.txt @libraries/.../unix_args.txt nogui
+        The JVM is the server process, so it is monitored and stopped directly.
         """
-        if self.process and self.running:
-            logger.info(f"Stopping server {self.uuid}...")
-            self.running = False
-            self.stopping = True
-            try:
-                # Send the 'stop' command to the server
-                if self.process.stdin:
-                    self.process.stdin.write(b"stop\n")
-                    telemetry_client.send_event("server_stop", details=self.settings)
-                    await asyncio.sleep(2)
-                    self.process.stdin.write(b"\n")
-                    await self.process.stdin.drain()
-
-                logger.info(f"Server {self.uuid} stopped.")
-            except Exception as e:
-                logger.error(f"Error while stopping the server: {e}")
-            finally:
-                # Ensure process cleanup
-                self.process = None
-                self.running = False
-                self.stopping = False
-                self.monitor.stop()
-        else:
-            logger.error("Server is not running.")
+        args_file_path = self.args_file_path
+        if not args_file_path:
+            raise ValueError(_("Unsupported Forge Version. THIS IS NOT A BUG!"))
+
+        # settings may have changed since the last start
+        self._set_user_jvm_args(extra_args)
+        cmd = [
+            self.java,
+            *read_args_file(os.path.join(self.server_path, "user_jvm_args.txt")),
+            *read_args_file(args_file_path),
+        ]
+        if mcssettings.NOGUI:
+            cmd.append("nogui")
+        return cmd
 
-    def _create_server(self):
+    async def _create_server(self):
         """
         Creates the server
         """
+        if self.settings.get("template"):
+            # Template servers are already installed
+            await super()._create_server()
+            self._set_stage(_("Setting JVM arguments"))
+            self._set_user_jvm_args()
+            return
+
         logger.info("Initializing server creation...")
         # Create folder and download jar
-        self._create_server_folder()
-        self._download_jar()
+        self._set_stage(_("Creating server folder"))
+        await asyncio.to_thread(self._create_server_folder)
+        self._set_stage(_("Downloading server jar"))
+        await asyncio.to_thread(self._download_jar)
 
         # Additional setup for Forge servers
-        self._init_forge_server()
+        self._set_stage(_("Linking shared libraries"))
+        await asyncio.to_thread(
+            forge_library_cache.seed, self.version, self.server_path
+        )
+        self._set_stage(_("Installing Forge"))
+        await self._init_forge_server()
+        self._set_stage(_("Sharing libraries"))
+        await asyncio.to_thread(
+            forge_library_cache.populate, self.version, self.server_path
+        )
+        self._set_stage(_("Setting JVM arguments"))
         self._set_user_jvm_args()
 
         # Complete by accepting EULA and saving
+        self._set_stage(_("Accepting EULA"))
         self.accept_eula()
         self.save()
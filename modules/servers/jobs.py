@@ -0,0 +1,250 @@
+"""
+Server provisioning jobs
+"""
+
+import asyncio
+import shutil
+import threading
+import time
+from collections import deque
+from uuid import uuid4
+
+from config import settings as mcssettings
+from modules.translations import translate as _
+from modules.logger import RotatingLogger
+from modules.telemetry import TelemetryClient
+
+telemetry_client = TelemetryClient()
+logger = RotatingLogger()
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled"""
+
+
+class ProvisioningJob:
+    """
+    A server creation request.
+    Stages report their progress here so the UI can watch it.
+    """
+
+    def __init__(self, settings: dict, factory):
+        self.id = str(uuid4())
+        self.settings = settings
+        self.factory = factory
+        self.state = QUEUED
+        self.stage = _("Queued")
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.error = ""
+        self.server = None
+        self.task = None
+        self.log = deque(maxlen=mcssettings.PROVISIONING_LOG_LINES)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+
+    def __repr__(self):
+        return f"ProvisioningJob(id={self.id}, name={self.name!r}, state={self.state})"
+
+    @property
+    def name(self) -> str:
+        """Name of the server being created"""
+        return self.settings.get("name", "")
+
+    @property
+    def done(self) -> bool:
+        """True once the job is not going to make any more progress"""
+        return self.state in (COMPLETED, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self) -> bool:
+        """True if cancellation has been requested"""
+        return self._cancel_event.is_set()
+
+    @property
+    def duration(self) -> float:
+        """Seconds spent running"""
+        if not self.started_at:
+            return 0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def check_cancelled(self):
+        """Raises JobCancelled if cancellation has been requested"""
+        if self.cancelled:
+            raise JobCancelled(_("Cancelled"))
+
+    def set_stage(self, stage: str):
+        """Moves the job to a new stage"""
+        self.check_cancelled()
+        self.stage = stage
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.log_line(stage)
+
+    def set_progress(self, done: int, total: int):
+        """
+        Progress callback for downloads.
+        Safe to call from worker threads.
+        """
+        self.check_cancelled()
+        self.bytes_done = done
+        self.bytes_total = total
+
+    def log_line(self, line: str):
+        """Appends a line to the job log"""
+        self.log.append(f"[{time.strftime('%H:%M:%S')}] {line}")
+
+    def cancel(self):
+        """Requests cancellation of the job"""
+        if self.done:
+            return
+        logger.info(f"Cancelling {self}")
+        self._cancel_event.set()
+        if self.state == QUEUED:
+            # not started yet: nothing to clean up
+            self.state = CANCELLED
+            self.stage = _("Cancelled")
+            self.finished_at = time.time()
+            if self.task:
+                self.task.cancel()
+
+    def describe(self) -> str:
+        """Display-friendly progress of the job"""
+        if self.bytes_total:
+            return (
+                f"{self.stage} "
+                f"({self.bytes_done / 1024**2:.1f}/{self.bytes_total / 1024**2:.1f} MB)"
+            )
+        return self.stage
+
+    async def wait(self):
+        """Waits for the job to finish"""
+        if self.task:
+            await asyncio.gather(self.task, return_exceptions=True)
+
+
+class ProvisioningQueue:
+    """
+    Runs provisioning jobs in the background with a bounded
+    number of concurrent workers.
+    Keeps every unfinished job and the latest history_size finished ones.
+    """
+
+    def __init__(
+        self,
+        workers: int = mcssettings.PROVISIONING_WORKERS,
+        history_size: int = mcssettings.PROVISIONING_HISTORY_SIZE,
+    ):
+        self.workers = workers
+        self.history_size = history_size
+        self.jobs = []
+        self._semaphore = None
+
+    def __repr__(self):
+        return f"ProvisioningQueue(workers={self.workers}, jobs={len(self.jobs)})"
+
+    @property
+    def active_jobs(self) -> list[ProvisioningJob]:
+        """Jobs queued or running"""
+        return [job for job in self.jobs if not job.done]
+
+    def get_job(self, job_id: str) -> ProvisioningJob | None:
+        """Returns job by id"""
+        for job in self.jobs:
+            if job.id == job_id:
+                return job
+        return None
+
+    def submit(self, settings: dict, factory) -> ProvisioningJob:
+        """
+        Enqueues the creation of a server.
+        factory is the server class to instantiate.
+        Must be called from the event loop.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        job = ProvisioningJob(settings=settings, factory=factory)
+        self.jobs.append(job)
+        self._trim()
+        job.task = asyncio.create_task(self._run(job))
+        logger.info(f"Submitted {job}")
+        return job
+
+    def _trim(self):
+        """Forgets the oldest finished jobs beyond history_size"""
+        finished = [job for job in self.jobs if job.done]
+        for job in finished[: max(len(finished) - self.history_size, 0)]:
+            self.jobs.remove(job)
+
+    def cancel(self, job_id: str):
+        """Cancels a job by id"""
+        job = self.get_job(job_id)
+        if job:
+            job.cancel()
+
+    async def _run(self, job: ProvisioningJob):
+        """Runs a job once a worker is free"""
+        server = None
+        try:
+            async with self._semaphore:
+                job.check_cancelled()
+                job.state = RUNNING
+                job.started_at = time.time()
+                logger.info(f"Running {job}")
+
+                server = job.factory(settings=job.settings)
+                await server.provision(job=job)
+                job.server = server
+
+            job.stage = _("Server created!")
+            job.state = COMPLETED
+            logger.info(f"{job} completed in {job.duration:.1f}s")
+            await asyncio.to_thread(
+                telemetry_client.send_event, "server_create", details=job.settings
+            )
+
+        except JobCancelled:
+            job.stage = _("Cancelled")
+            job.state = CANCELLED
+            await self._cleanup(server)
+
+        except asyncio.CancelledError:
+            job.stage = _("Cancelled")
+            job.state = CANCELLED
+            # the cleanup must finish even though the task is being cancelled
+            await asyncio.shield(self._cleanup(server))
+            raise
+
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error(f"{job} failed: {e}")
+            job.error = str(e)
+            job.stage = str(e)
+            job.state = FAILED
+            await self._cleanup(server)
+
+        finally:
+            job.finished_at = time.time()
+            job.log_line(job.stage)
+            self._trim()
+
+    @staticmethod
+    async def _cleanup(server):
+        """Removes what a failed job left on disk, in a worker thread"""
+        if server is None or not server.settings.get("folder_path"):
+            return
+        logger.info(f"Cleaning up {server.settings['folder_path']}")
+        await asyncio.to_thread(
+            shutil.rmtree, server.settings["folder_path"], ignore_errors=True
+        )
+
+
+provisioning_queue = ProvisioningQueue()
@@ -0,0 +1,162 @@
+"""
+JVM launch options module
+"""
+
+import platform
+
+import psutil
+
+from config import settings as mcssettings
+
+
+DEFAULT_PROFILE = "default"
+AIKAR_PROFILE = "aikar"
+G1_PROFILE = "g1"
+ZGC_PROFILE = "zgc"
+
+# profile -> display name
+jvm_profiles = {
+    DEFAULT_PROFILE: "Default",
+    AIKAR_PROFILE: "Aikar (G1)",
+    G1_PROFILE: "G1",
+    ZGC_PROFILE: "ZGC",
+}
+
+# Above this heap size Aikar's flags give G1 a larger young generation
+AIKAR_LARGE_HEAP_MB = 12 * 1024
+
+# jar type -> heap a server of that type runs well with, in MB
+AUTO_HEAP_MB = {
+    0: 2 * 1024,  # Vanilla
+    1: 4 * 1024,  # Paper: plugins
+    2: 6 * 1024,  # Forge: mods
+}
+MIN_HEAP_MB = 1024
+HEAP_STEP_MB = 512
+
+
+def auto_heap_mb(jar_type: int) -> int:
+    """
+    Heap size in MB for a server type, shrunk to what the host can give a
+    single server once its reserve and the JVM's native memory are taken off.
+    """
+    total_mb = psutil.virtual_memory().total / (1024 * 1024)
+    overhead_mb = mcssettings.JVM_OVERHEAD_MB
+    if jar_type == 2:
+        overhead_mb += mcssettings.MODDED_OVERHEAD_MB
+    fits_mb = (total_mb - mcssettings.HOST_RESERVED_RAM_MB - overhead_mb) / (
+        1 + mcssettings.JVM_OVERHEAD_RATIO
+    )
+    heap_mb = min(AUTO_HEAP_MB.get(jar_type, MIN_HEAP_MB), fits_mb)
+    return max(MIN_HEAP_MB, int(heap_mb // HEAP_STEP_MB * HEAP_STEP_MB))
+
+
+def heap_size_mb(settings: dict) -> int:
+    """
+    Heap size in MB, from the RAM dedicated to the server,
+    or from its type and the host RAM when auto_heap is set
+    """
+    if settings.get("auto_heap"):
+        return auto_heap_mb(settings.get("jar_type", 0))
+    return int(float(settings.get("dedicated_ram") or 1) * 1024)
+
+
+def _aikar_flags(heap_mb: int, jar_type: int, _java_major: int | None) -> list[str]:
+    """https://docs.papermc.io/paper/aikars-flags"""
+    large = heap_mb > AIKAR_LARGE_HEAP_MB
+    flags = [
+        "-XX:+UseG1GC",
+        "-XX:+ParallelRefProcEnabled",
+        "-XX:MaxGCPauseMillis=200",
+        "-XX:+UnlockExperimentalVMOptions",
+        "-XX:+DisableExplicitGC",
+        f"-XX:G1NewSizePercent={40 if large else 30}",
+        f"-XX:G1MaxNewSizePercent={50 if large else 40}",
+        f"-XX:G1HeapRegionSize={16 if large else 8}M",
+        f"-XX:G1ReservePercent={15 if large else 20}",
+        "-XX:G1HeapWastePercent=5",
+        "-XX:G1MixedGCCountTarget=4",
+        f"-XX:InitiatingHeapOccupancyPercent={20 if large else 15}",
+        "-XX:G1MixedGCLiveThresholdPercent=90",
+        "-XX:G1RSetUpdatingPauseTimePercent=5",
+        "-XX:SurvivorRatio=32",
+        "-XX:+PerfDisableSharedMem",
+        "-XX:MaxTenuringThreshold=1",
+    ]
+    if jar_type == 1:
+        # lets Paper know the flags are in use
+        flags += ["-Dusing.aikars.flags=https://mcflags.emc.gs", "-Daikars.new.flags=true"]
+    return flags
+
+
+def _g1_flags(_heap_mb: int, _jar_type: int, _java_major: int | None) -> list[str]:
+    return ["-XX:+UseG1GC", "-XX:MaxGCPauseMillis=100", "-XX:+DisableExplicitGC"]
+
+
+def _zgc_flags(heap_mb: int, jar_type: int, java_major: int | None) -> list[str]:
+    """
+    ZGC: sub-millisecond pauses, needs heap headroom.
+    Generational mode is opt-in on Java 21 and 22 and the only mode from 23
+    (-XX:+ZGenerational is deprecated there). ZGC is not production ready
+    before Java 15: G1 is used instead. With an unknown Java version plain
+    -XX:+UseZGC is used, which every supported version accepts.
+    """
+    if java_major is not None and java_major < 15:
+        return _g1_flags(heap_mb, jar_type, java_major)
+    flags = ["-XX:+UseZGC"]
+    if java_major in (21, 22):
+        flags.append("-XX:+ZGenerational")
+    return [
+        *flags,
+        # collect early so the heap rarely grows to its maximum
+        f"-XX:SoftMaxHeapSize={int(heap_mb * 0.85)}M",
+        "-XX:+DisableExplicitGC",
+    ]
+
+
+PROFILE_FLAGS = {
+    AIKAR_PROFILE: _aikar_flags,
+    G1_PROFILE: _g1_flags,
+    ZGC_PROFILE: _zgc_flags,
+}
+
+
+def jvm_args(settings: dict, java_major: int | None = None) -> list[str]:
+    """
+    JVM options of a server: heap size, GC profile flags,
+    large pages and pre-touch, from the server settings.
+    java_major is the major version of the runtime, when known.
+    """
+    heap_mb = heap_size_mb(settings)
+    args = [f"-Xms{heap_mb}M", f"-Xmx{heap_mb}M"]
+
+    profile = settings.get("jvm_profile") or DEFAULT_PROFILE
+    if profile in PROFILE_FLAGS:
+        args += PROFILE_FLAGS[profile](heap_mb, settings.get("jar_type", 0), java_major)
+
+    if settings.get("jvm_large_pages"):
+        # Linux can back the heap with transparent huge pages without any setup
+        if platform.system() == "Linux":
+            args.append("-XX:+UseTransparentHugePages")
+        else:
+            args.append("-XX:+UseLargePages")
+
+    if settings.get("jvm_pretouch"):
+        # commit the whole heap at startup instead of during gameplay
+        args.append("-XX:+AlwaysPreTouch")
+
+    return args
+
+
+def launch_command(
+    settings: dict,
+    jar_path: str,
+    java: str = "java",
+    extra_args: list[str] = (),
+    java_major: int | None = None,
+) -> list[str]:
+    """Command line that starts a server jar"""
+    cmd = [java, *jvm_args(settings, java_major), *extra_args, "-jar", jar_path]
+    if mcssettings.NOGUI:
+        cmd.append("nogui")
+    return cmd
@@ -0,0 +1,173 @@
+"""
+Minecraft log parser module
+"""
+
+import re
+from typing import NamedTuple
+
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+# [12:34:56] [Server thread/INFO]: message
+# [12:34:56] [Server thread/INFO] [minecraft/DedicatedServer]: message (Forge)
+# [18Oct2024 12:34:56.789] [Server thread/INFO] [net.minecraft.../]: message (Forge)
+THREAD_LINE_RE = re.compile(r"\[([^\]]+)\] \[([^\]]+)/([A-Z]+)\](?: \[[^\]]*\])?: ?(.*)")
+# [12:34:56 INFO]: message (Paper, Spigot)
+LEVEL_LINE_RE = re.compile(r"\[(\d\d:\d\d:\d\d) ([A-Z]+)\]: ?(.*)")
+
+DONE_RE = re.compile(r"Done \((\d+(?:[.,]\d+)?)s\)!")
+LAG_RE = re.compile(r"Running (\d+)ms or (\d+) ticks behind")
+PLAYER_RE = re.compile(r"[A-Za-z0-9_.]{1,16}")
+# TPS from last 1m, 5m, 15m: 20.0, 19.98, 19.99 (Paper, Spigot /tps)
+TPS_RE = re.compile(r"TPS from last [^:]*: \D*(\d+(?:\.\d+)?)")
+# There are 1 of a max of 20 players online: Steve (vanilla, Forge)
+# There are 1 out of maximum 20 players online. (Paper, Spigot)
+PLAYER_LIST_RE = re.compile(r"There are (\d+) (?:of a max of|out of maximum) (\d+) players online")
+EXCEPTION_RE = re.compile(r"^(?:Caused by: )?([\w$]+\.)+[\w$]*(?:Exception|Error)\b")
+# CRaC could not checkpoint the JVM, which keeps running (JVM console and jcmd output)
+CHECKPOINT_FAILED_RE = re.compile(
+    r"An exception during a checkpoint operation|CheckpointException|Error \(criu"
+)
+
+LINE = "line"
+READY = "ready"
+PLAYER_JOIN = "player_join"
+PLAYER_LEAVE = "player_leave"
+LAG = "lag"
+EXCEPTION = "exception"
+STOPPING = "stopping"
+SAVED = "saved"
+OUT_OF_MEMORY = "out_of_memory"
+CRASH = "crash"
+TPS = "tps"
+PLAYER_LIST = "player_list"
+CHECKPOINT_FAILED = "checkpoint_failed"
+
+
+class LogEvent(NamedTuple):
+    """A parsed console line"""
+
+    kind: str
+    time: str
+    thread: str
+    level: str
+    message: str
+    data: dict | None = None
+
+
+class LogParser:
+    """
+    Turns console lines into LogEvents and dispatches them to subscribers.
+    Every line produces a LINE event, well-known lines an additional one.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.last_event = None
+
+    def __repr__(self):
+        return f"LogParser(subscribers={sum(len(s) for s in self.subscribers.values())})"
+
+    def subscribe(self, kind: str, callback):
+        """Registers callback(event) for events of kind"""
+        self.subscribers.setdefault(kind, []).append(callback)
+
+    def unsubscribe(self, kind: str, callback):
+        """Removes a subscriber"""
+        if callback in self.subscribers.get(kind, []):
+            self.subscribers[kind].remove(callback)
+
+    @staticmethod
+    def parse(line: str) -> LogEvent:
+        """Splits a line into time, thread, level and message"""
+        if line.startswith("["):
+            match = THREAD_LINE_RE.match(line)
+            if match:
+                return LogEvent(LINE, *match.groups())
+            match = LEVEL_LINE_RE.match(line)
+            if match:
+                time, level, message = match.groups()
+                return LogEvent(LINE, time, "", level, message)
+        # continuation lines (stack traces, plain output)
+        return LogEvent(LINE, "", "", "", line)
+
+    @staticmethod
+    def classify(event: LogEvent) -> LogEvent | None:
+        """Returns the well-known event a line represents, if any"""
+        message = event.message
+        if message.startswith("Done ("):
+            match = DONE_RE.match(message)
+            if match:
+                seconds = float(match.group(1).replace(",", "."))
+                return event._replace(kind=READY, data={"seconds": seconds})
+
+        elif message.endswith(" joined the game"):
+            player = message[: -len(" joined the game")]
+            if PLAYER_RE.fullmatch(player):
+                return event._replace(kind=PLAYER_JOIN, data={"player": player})
+
+        elif message.endswith(" left the game"):
+            player = message[: -len(" left the game")]
+            if PLAYER_RE.fullmatch(player):
+                return event._replace(kind=PLAYER_LEAVE, data={"player": player})
+
+        elif message.startswith("Can't keep up!"):
+            match = LAG_RE.search(message)
+            data = {"ms": int(match.group(1)), "ticks": int(match.group(2))} if match else {}
+            return event._replace(kind=LAG, data=data)
+
+        elif message.startswith("TPS from last"):
+            match = TPS_RE.match(message)
+            if match:
+                return event._replace(kind=TPS, data={"tps": float(match.group(1))})
+
+        elif message.startswith("There are "):
+            match = PLAYER_LIST_RE.match(message)
+            if match:
+                data = {"online": int(match.group(1)), "max": int(match.group(2))}
+                return event._replace(kind=PLAYER_LIST, data=data)
+
+        elif message.startswith("Stopping the server") or message == "Stopping server":
+            return event._replace(kind=STOPPING)
+
+        elif message.startswith("Saved the game"):
+            return event._replace(kind=SAVED)
+
+        elif CHECKPOINT_FAILED_RE.search(message):
+            return event._replace(kind=CHECKPOINT_FAILED)
+
+        elif "java.lang.OutOfMemoryError" in message:
+            return event._replace(kind=OUT_OF_MEMORY)
+
+        elif message.startswith(
+            ("Encountered an unexpected exception", "This crash report has been saved to")
+        ):
+            return event._replace(kind=CRASH)
+
+        elif ("Exception" in message or "Error" in message) and (
+            event.level == "ERROR" or EXCEPTION_RE.match(message)
+        ):
+            return event._replace(kind=EXCEPTION)
+
+        return None
+
+    def _dispatch(self, event: LogEvent):
+        for callback in self.subscribers.get(event.kind, ()):
+            try:
+                callback(event)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Log event subscriber error: {e}")
+
+    def feed(self, lines: list[str]):
+        """Parses lines and dispatches their events"""
+        wants_lines = bool(self.subscribers.get(LINE))
+        for line in lines:
+            event = self.parse(line)
+            self.last_event = event
+            if wants_lines:
+                self._dispatch(event)
+            special = self.classify(event)
+            if special:
+                self._dispatch(special)
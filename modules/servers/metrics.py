@@ -0,0 +1,146 @@
+"""
+Server metrics time series module
+"""
+
+import time
+
+import numpy as np
+
+from config import settings as mcssettings
+
+
+# ProcessMonitor values that are recorded
+METRICS = (
+    "ram_usage",
+    "cpu_usage",
+    "disk_read",
+    "disk_write",
+    "threads",
+    "open_files",
+    "players",
+    "tps",
+)
+
+
+class RingSeries:
+    """
+    Fixed size ring of time buckets of one resolution.
+    Each bucket keeps the min, max, sum and count of the samples that
+    fell into it, so any window can be rolled up without the raw samples.
+    """
+
+    def __init__(self, step: int, size: int):
+        self.step = step
+        self.size = size
+        # bucket number (time // step) held by each slot, -1 when empty
+        self.buckets = np.full(size, -1, dtype=np.int64)
+        self.min = np.zeros(size, dtype=np.float32)
+        self.max = np.zeros(size, dtype=np.float32)
+        self.sum = np.zeros(size, dtype=np.float64)
+        self.count = np.zeros(size, dtype=np.int32)
+
+    def __repr__(self):
+        return f"RingSeries(step={self.step}, size={self.size})"
+
+    @property
+    def span(self) -> int:
+        """Seconds of history kept"""
+        return self.step * self.size
+
+    def add(self, value: float, timestamp: float):
+        """Adds a sample to the bucket of timestamp"""
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.size
+        if self.buckets[slot] != bucket:
+            # the slot held a bucket that is out of the ring now
+            self.buckets[slot] = bucket
+            self.min[slot] = self.max[slot] = self.sum[slot] = value
+            self.count[slot] = 1
+            return
+        self.min[slot] = min(self.min[slot], value)
+        self.max[slot] = max(self.max[slot], value)
+        self.sum[slot] += value
+        self.count[slot] += 1
+
+    def query(self, start: float, end: float) -> tuple[np.ndarray, ...]:
+        """Buckets after start up to end, oldest first: times, min, max, sum, count"""
+        mask = (
+            (self.buckets > start // self.step)
+            & (self.buckets <= end // self.step)
+            & (self.count > 0)
+        )
+        order = np.argsort(self.buckets[mask])
+        return (
+            self.buckets[mask][order] * self.step,
+            self.min[mask][order],
+            self.max[mask][order],
+            self.sum[mask][order],
+            self.count[mask][order],
+        )
+
+
+class ServerMetrics:
+    """
+    Resource usage history of a server, fed by its ProcessMonitor.
+    Every metric is kept at each of METRICS_RESOLUTIONS, so memory use
+    is constant however long the server runs.
+    """
+
+    def __init__(self, resolutions: list[tuple[int, int]] = mcssettings.METRICS_RESOLUTIONS):
+        self.resolutions = resolutions
+        # allocated on the first sample: servers that never run cost nothing
+        self.series = {}
+
+    def __repr__(self):
+        return f"ServerMetrics(metrics={len(self.series)})"
+
+    def record(self, snapshot: dict, timestamp: float | None = None):
+        """Adds a monitor sample to every resolution"""
+        timestamp = time.time() if timestamp is None else timestamp
+        for metric in METRICS:
+            if snapshot.get(metric) is None:
+                continue
+            if metric not in self.series:
+                self.series[metric] = [RingSeries(step, size) for step, size in self.resolutions]
+            for series in self.series[metric]:
+                series.add(float(snapshot[metric]), timestamp)
+
+    def query(
+        self,
+        metric: str,
+        window: int,
+        points: int = mcssettings.METRICS_CHART_POINTS,
+        now: float | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Min, max and average of a metric over the last window seconds,
+        rolled up to at most points values from the finest resolution
+        that covers the window.
+        """
+        end = time.time() if now is None else now
+        start = end - window
+        empty = np.array([], dtype=np.float64)
+        if metric not in self.series:
+            return {"time": empty, "min": empty, "max": empty, "avg": empty}
+
+        tiers = self.series[metric]
+        series = next((tier for tier in tiers if tier.span >= window), tiers[-1])
+        times, mins, maxs, sums, counts = series.query(start, end)
+
+        width = window / points
+        if len(times) > points and width > series.step:
+            # consecutive buckets that fall into the same point are merged
+            bins = np.minimum((times - start) // width, points - 1).astype(np.int64)
+            first = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+            times = (start + bins[first] * width).astype(np.int64)
+            mins = np.minimum.reduceat(mins, first)
+            maxs = np.maximum.reduceat(maxs, first)
+            sums = np.add.reduceat(sums, first)
+            counts = np.add.reduceat(counts, first)
+
+        return {
+            "time": times,
+            "min": mins.astype(np.float64),
+            "max": maxs.astype(np.float64),
+            "avg": sums / np.maximum(counts, 1),
+        }
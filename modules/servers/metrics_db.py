@@ -0,0 +1,284 @@
+"""
+Persistent server metrics module
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+
+class MetricsDatabase:
+    """
+    Resource usage history of all servers (SQLite, WAL mode).
+    Samples are aggregated in memory and written in batches to the finest
+    tier of METRICS_DB_TIERS; complete buckets are compacted into the
+    coarser tiers and every tier is trimmed to its retention.
+    Writes happen on a background thread; queries open their own connection.
+    """
+
+    def __init__(
+        self,
+        path: str = mcssettings.METRICS_DB_PATH,
+        tiers: list[tuple[int, int]] = mcssettings.METRICS_DB_TIERS,
+    ):
+        self.path = path
+        self.tiers = sorted(tiers)
+        self.raw_step = self.tiers[0][0]
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def __repr__(self):
+        return f"MetricsDatabase(path={self.path!r})"
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _create_schema(self):
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS series ("
+                "id INTEGER PRIMARY KEY, uuid TEXT, metric TEXT, UNIQUE (uuid, metric))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS samples ("
+                "series INTEGER, step INTEGER, ts INTEGER, "
+                "min REAL, max REAL, sum REAL, count INTEGER, "
+                "PRIMARY KEY (series, step, ts)) WITHOUT ROWID"
+            )
+            # end of the buckets of each tier already compacted
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS compaction (step INTEGER PRIMARY KEY, done INTEGER)"
+            )
+        connection.close()
+
+    # Writer side
+
+    def start(self):
+        """Creates the database if needed and starts the background writer"""
+        if self._thread:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._create_schema()
+        self._thread = threading.Thread(target=self._worker, name="metrics-db", daemon=True)
+        self._thread.start()
+        logger.info(f"{self} started")
+
+    def add(self, uuid: str, snapshot: dict, timestamp: float | None = None):
+        """Queues a sample of a server. Cheap enough to call from the event loop"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._queue.put(("sample", uuid, int(timestamp), snapshot))
+
+    def forget(self, uuid: str):
+        """Queues the removal of the history of a server"""
+        self._queue.put(("forget", uuid))
+
+    def _worker(self):
+        connection = self._connect()
+        series_ids = {}
+        pending = {}
+        next_flush = time.monotonic() + mcssettings.METRICS_DB_FLUSH_INTERVAL
+        next_compaction = time.monotonic()
+        while True:
+            timeout = max(min(next_flush, next_compaction) - time.monotonic(), 0)
+            try:
+                task = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                task = None
+
+            try:
+                if task and task[0] == "sample":
+                    self._aggregate(pending, *task[1:])
+                elif task and task[0] == "forget":
+                    self._flush(connection, series_ids, pending)
+                    self._forget(connection, series_ids, task[1])
+
+                if time.monotonic() >= next_flush:
+                    self._flush(connection, series_ids, pending)
+                    next_flush = time.monotonic() + mcssettings.METRICS_DB_FLUSH_INTERVAL
+                if time.monotonic() >= next_compaction:
+                    self._compact(connection)
+                    next_compaction = time.monotonic() + mcssettings.METRICS_DB_COMPACT_INTERVAL
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Metrics database error: {e}")
+
+    def _aggregate(self, pending: dict, uuid: str, timestamp: int, snapshot: dict):
+        """Merges a sample into the raw bucket it falls into"""
+        ts = timestamp - timestamp % self.raw_step
+        for metric, value in snapshot.items():
+            if value is None:
+                continue
+            key = (uuid, metric, ts)
+            value = float(value)
+            if key in pending:
+                low, high, total, count = pending[key]
+                pending[key] = (min(low, value), max(high, value), total + value, count + 1)
+            else:
+                pending[key] = (value, value, value, 1)
+
+    def _series_id(self, connection, series_ids: dict, uuid: str, metric: str) -> int:
+        if (uuid, metric) not in series_ids:
+            connection.execute(
+                "INSERT OR IGNORE INTO series (uuid, metric) VALUES (?, ?)", (uuid, metric)
+            )
+            series_ids[(uuid, metric)] = connection.execute(
+                "SELECT id FROM series WHERE uuid = ? AND metric = ?", (uuid, metric)
+            ).fetchone()[0]
+        return series_ids[(uuid, metric)]
+
+    def _flush(self, connection, series_ids: dict, pending: dict):
+        """Writes the aggregated samples in one transaction"""
+        if not pending:
+            return
+        with connection:
+            rows = [
+                (self._series_id(connection, series_ids, uuid, metric), self.raw_step, ts, *values)
+                for (uuid, metric, ts), values in pending.items()
+            ]
+            # a bucket may have been partly written by the previous flush
+            connection.executemany(
+                "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (series, step, ts) DO UPDATE SET "
+                "min = MIN(min, excluded.min), max = MAX(max, excluded.max), "
+                "sum = sum + excluded.sum, count = count + excluded.count",
+                rows,
+            )
+        pending.clear()
+
+    def _forget(self, connection, series_ids: dict, uuid: str):
+        with connection:
+            connection.execute(
+                "DELETE FROM samples WHERE series IN (SELECT id FROM series WHERE uuid = ?)",
+                (uuid,),
+            )
+            connection.execute("DELETE FROM series WHERE uuid = ?", (uuid,))
+        for key in [key for key in series_ids if key[0] == uuid]:
+            del series_ids[key]
+
+    def _compaction_marks(self, connection) -> dict[int, int]:
+        return dict(connection.execute("SELECT step, done FROM compaction").fetchall())
+
+    def _compact(self, connection):
+        """Rolls complete raw buckets up into the coarser tiers, then applies retention"""
+        started = time.perf_counter()
+        now = int(time.time())
+        # raw buckets younger than this may still get samples
+        settled = now - mcssettings.METRICS_DB_FLUSH_INTERVAL - self.raw_step
+        marks = self._compaction_marks(connection)
+        series = [row[0] for row in connection.execute("SELECT id FROM series").fetchall()]
+        rows = 0
+        for step, _keep in self.tiers[1:]:
+            end = settled - settled % step
+            begin = marks.get(step)
+            if begin is None:
+                first = connection.execute(
+                    "SELECT MIN(ts) FROM samples WHERE step = ?", (self.raw_step,)
+                ).fetchone()[0]
+                if first is None:
+                    continue
+                begin = first - first % step
+            if begin >= end:
+                continue
+            with connection:
+                for series_id in series:
+                    rows += connection.execute(
+                        "INSERT OR REPLACE INTO samples "
+                        "SELECT series, ?, ts - ts % ?, MIN(min), MAX(max), SUM(sum), SUM(count) "
+                        "FROM samples WHERE series = ? AND step = ? AND ts >= ? AND ts < ? "
+                        "GROUP BY ts - ts % ?",
+                        (step, step, series_id, self.raw_step, begin, end, step),
+                    ).rowcount
+                connection.execute(
+                    "INSERT OR REPLACE INTO compaction VALUES (?, ?)", (step, end)
+                )
+
+        deleted = 0
+        with connection:
+            for step, keep in self.tiers:
+                for series_id in series:
+                    deleted += connection.execute(
+                        "DELETE FROM samples WHERE series = ? AND step = ? AND ts < ?",
+                        (series_id, step, now - keep),
+                    ).rowcount
+        logger.info(
+            f"Metrics compaction: {rows} rows rolled up, {deleted} expired, "
+            f"{(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+    # Reader side
+
+    def query(
+        self,
+        uuids: list[str],
+        metric: str,
+        start: float,
+        end: float | None = None,
+        points: int = mcssettings.METRICS_CHART_POINTS,
+    ) -> dict[str, dict[str, list]]:
+        """
+        Min, max and average of a metric of servers between start and end,
+        rolled up to at most about points values per server.
+        By uuid: {"time", "min", "max", "avg"}.
+        Blocking: call it from a worker thread.
+        """
+        started = time.perf_counter()
+        end = time.time() if end is None else end
+        # among the tiers that go back to start, the coarsest one that still
+        # gives a quarter of the points: reading fewer rows keeps queries fast
+        covering = [step for step, keep in self.tiers if time.time() - keep <= start]
+        covering = covering or [self.tiers[-1][0]]
+        step = max(
+            (step for step in covering if (end - start) / step >= points / 4),
+            default=covering[0],
+        )
+        # a whole number of tier buckets per point
+        width = max(int((end - start) / points) // step * step, step)
+
+        connection = self._connect()
+        try:
+            # the tier only holds compacted buckets: raw rows cover the rest
+            if step == self.raw_step:
+                mark = int(end) + 1
+            else:
+                mark = self._compaction_marks(connection).get(step, 0)
+            results = {}
+            for uuid in uuids:
+                rows = connection.execute(
+                    "SELECT samples.ts - samples.ts % ? AS bucket, MIN(min), MAX(max), "
+                    "SUM(sum) / SUM(count) FROM samples "
+                    "JOIN series ON series.id = samples.series "
+                    "WHERE series.uuid = ? AND series.metric = ? "
+                    "AND ((samples.step = ? AND samples.ts < ?) "
+                    "OR (samples.step = ? AND samples.ts >= ?)) "
+                    "AND samples.ts >= ? AND samples.ts <= ? "
+                    "GROUP BY bucket ORDER BY bucket",
+                    (width, uuid, metric, step, mark, self.raw_step, mark, int(start), int(end)),
+                ).fetchall()
+                results[uuid] = {
+                    "time": [row[0] for row in rows],
+                    "min": [row[1] for row in rows],
+                    "max": [row[2] for row in rows],
+                    "avg": [row[3] for row in rows],
+                }
+        finally:
+            connection.close()
+
+        logger.info(
+            f"Metrics query {metric!r} of {len(uuids)} servers ({step}s tier): "
+            f"{(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return results
+
+
+metrics_db = MetricsDatabase()
@@ -3,10 +3,13 @@ Minecraft Server Module
 """
 
 import asyncio
+import hashlib
 import json
 import os
 import shutil
+import time
 from uuid import uuid4
+import mcstatus
 import numpy as np
 import requests
 from nicegui import binding, ui
@@ -14,7 +17,22 @@ from nicegui import binding, ui
 from config import settings as mcssettings
 from modules.translations import translate as _
 from modules.classes import ProcessMonitor
+from modules.servers.cache import jar_cache
+from modules.servers.cds import ClassDataArchive, jar_hash
+from modules.servers.checkpoint import Checkpoint, fingerprint, supports_crac
+from modules.servers import log_parser
+from modules.servers.console import Console
+from modules.servers.detached import RunnerProcess, spawn_runner
+from modules.servers.jvm import jvm_args, launch_command
+from modules.servers.log_parser import LogEvent, LogParser
+from modules.servers.metrics import ServerMetrics
+from modules.servers.metrics_db import metrics_db
+from modules.servers.runtimes import JavaRuntime, runtime_registry
+from modules.servers.scrollback import Scrollback
+from modules.servers.startup import StartupHistory, StartupTimer
+from modules.servers.templates import claim_port, get_template, world_dirs
 from modules.logger import RotatingLogger
+from modules.search import search_index
 from modules.telemetry import TelemetryClient
 
 telemetry_client = TelemetryClient()
@@ -22,6 +40,21 @@ server_list = []
 global_settings = {}
 logger = RotatingLogger()
 
+# Lifecycle states
+STOPPED = "stopped"
+STARTING = "starting"
+READY = "ready"
+STOPPING = "stopping"
+RESTARTING = "restarting"  # waiting to be restarted after a crash
+
+# Stop escalation
+STOP = "stop"
+TERMINATE = "SIGTERM"
+KILL = "SIGKILL"
+
+# server.properties default
+DEFAULT_PORT = 25565
+
 
 class MinecraftServer:
     """
@@ -31,26 +64,59 @@ class MinecraftServer:
 
     name = binding.BindableProperty()
     settings = binding.BindableProperty()
+    state = binding.BindableProperty()
 
     def __init__(self, settings: dict, uuid: str = ""):
         # Setup attributes
         logger.info("Initializing Minecraft Server...")
         self.name = settings.get("name")
         self.settings = settings.copy() or {}
-        self.running = False
-        self.starting = False
-        self.stopping = False
+        self.state = STOPPED
+        self.players = set()
         self.process = None
-        self.log = None
+        self.console = Console()
+        self.console.subscribe(self._on_console_output)
+        self.log_parser = LogParser()
+        self.log_parser.subscribe(log_parser.READY, self._on_ready)
+        self.log_parser.subscribe(log_parser.STOPPING, self._on_stopping)
+        self.log_parser.subscribe(log_parser.PLAYER_JOIN, self._on_player_join)
+        self.log_parser.subscribe(log_parser.PLAYER_LEAVE, self._on_player_leave)
+        self.log_parser.subscribe(log_parser.OUT_OF_MEMORY, self._on_out_of_memory)
+        self.log_parser.subscribe(log_parser.CRASH, self._on_crash)
+        self.log_parser.subscribe(log_parser.TPS, self._on_tps)
+        self.scrollback = None
+        self.startup_timer = None
+        self.startup_history = None
+        self.class_data = None
+        self.checkpoint = None
+        self.runtime = None
+        self._restore_waiter = None
+        # how the last run ended, read by the supervisor
+        self.started_at = None
+        self.returncode = None
+        self.stop_requested = False
+        self.stop_phase = None
+        self.out_of_memory = False
+        self.crash_reported = False
+        # liveness, watched by the watchdog
+        self.last_output = None
+        self.unresponsive = False
+        self.hung = False
+        # last TPS the server reported (Paper/Spigot /tps)
+        self.tps = None
+        # read by the metrics exporter
+        self.startup_seconds = None
+        self.console_lines = 0
         self.server_properties = {}
         self.monitor = ProcessMonitor()
+        self.metrics = ServerMetrics()
+        self.monitor.subscribe(self._on_sample)
+        self.job = None
 
-        if not uuid:
-            self._create_server()
-
-        # Add to server list
-        server_list.append(self)
-        logger.info(f"Server {self.uuid} initialized")
+        # New servers are added to the server list by provision()
+        if uuid:
+            server_list.append(self)
+        logger.info(f"Server {self.settings.get('uuid', self.name)} initialized")
 
     def __repr__(self):
         if self.jar_type == 0:
@@ -67,14 +133,38 @@ class MinecraftServer:
     @property
     def status(self):
         """Display-friendly status of the server"""
-        if any([self.starting, self.stopping]):
-            if self.starting and self.running is False:
-                return _("Starting")
-            if self.stopping and self.running is True:
-                return _("Stopping")
+        if self.state == STARTING:
+            return _("Starting")
+        if self.state == STOPPING:
+            return _("Stopping")
+        if self.state == RESTARTING:
+            return _("Restarting")
+        if self.running and self.unresponsive:
+            return _("Not responding")
 
         return _("Running") if self.running else _("Stopped")
 
+    @property
+    def running(self) -> bool:
+        """True once the server finished loading and accepts players"""
+        return self.state == READY
+
+    @property
+    def starting(self) -> bool:
+        """True while the server is booting"""
+        return self.state == STARTING
+
+    @property
+    def stopping(self) -> bool:
+        """True while the server is shutting down"""
+        return self.state == STOPPING
+
+    def _set_state(self, state: str):
+        """Moves the server to a new lifecycle state"""
+        if state != self.state:
+            logger.info(f"Server {self.uuid}: {self.state} -> {state}")
+            self.state = state
+
     @property
     def address(self) -> str:
         """ip address"""
@@ -85,6 +175,16 @@ class MinecraftServer:
         """port number"""
         return self.settings.get("port", np.nan)
 
+    @property
+    def detached(self) -> bool:
+        """True if the server runs under a runner and survives MCSC restarts"""
+        return bool(self.settings.get("detached"))
+
+    @property
+    def group(self) -> str:
+        """Group the server is started with"""
+        return self.settings.get("group") or ""
+
     @property
     def socket_address(self) -> str:
         """display friendly socked addres"""
@@ -140,7 +240,13 @@ class MinecraftServer:
         assert os.path.exists(self.settings["folder_path"])
         logger.info(f"Created folder for server {self.uuid}")
 
-    def _create_server(self):
+    def _set_stage(self, stage: str):
+        """Reports the current creation stage to the provisioning job"""
+        logger.info(stage)
+        if self.job:
+            self.job.set_stage(stage)
+
+    async def _create_server(self):
         """
         Actually creates the server on the device
         Order of actions:
@@ -148,30 +254,69 @@ class MinecraftServer:
         - download jar and place it inside folder
         - eula
         - create start.bat (maybe not?)
+        If settings has a "template", its files are cloned instead of
+        downloading the jar. Blocking steps run in worker threads.
         """
         logger.info("Initializing server creation...")
-        self._create_server_folder()
-        # download jar
-        self._download_jar()
+        self._set_stage(_("Creating server folder"))
+        await asyncio.to_thread(self._create_server_folder)
+        if self.settings.get("template"):
+            # clone instead of downloading and installing
+            self._set_stage(_("Cloning template"))
+            await asyncio.to_thread(self._clone_template)
+        else:
+            # download jar
+            self._set_stage(_("Downloading server jar"))
+            await asyncio.to_thread(self._download_jar)
         # accept eula
+        self._set_stage(_("Accepting EULA"))
         self.accept_eula()
         # save into server.json
         self.save()
 
+    async def provision(self, job=None):
+        """
+        Creates the server and adds it to the server list.
+        job receives progress updates and can cancel the creation.
+        """
+        self.job = job
+        try:
+            await self._create_server()
+            add_server_to_list(self)
+        finally:
+            self.job = None
+
+    def _clone_template(self):
+        """Clones the template files into the server folder"""
+        template = get_template(self.settings["template"])
+        if not template:
+            raise ValueError(_("Template not found"))
+        # every clone needs its own port or only the first one starts
+        used = {server._status_address()[1] for server in server_list if server is not self}
+        port = claim_port(self.settings.get("port") or DEFAULT_PORT, used)
+        self.settings["port"] = port
+        template.clone_into(self.settings["folder_path"], port=port)
+
     def _download_jar(self):
         """downloads jar"""
         # get jar link
         from modules.utils import urls  # pylint: disable=import-outside-toplevel
 
         url = urls.get_url(self.version, self.jar_type)
+        checksums = urls.get_checksums(self.version, self.jar_type)
         file_path = os.path.join(self.settings["folder_path"], "server.jar")
         try:
-            response = requests.get(url, stream=True)  # pylint: disable=missing-timeout
-            response.raise_for_status()
-            with open(file_path, "wb") as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    file.write(chunk)
-            logger.info(f"Downloaded {url} for server {self.uuid}")
+            # jars are shared through the local cache
+            jar_cache.install(
+                url=url,
+                jar_type=self.jar_type,
+                version=self.version,
+                dest=file_path,
+                expected_sha256=checksums["sha256"],
+                expected_sha1=checksums["sha1"],
+                progress=self.job.set_progress if self.job else None,
+            )
+            logger.info(f"Installed {url} for server {self.uuid}")
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error downloading the file: {e}")
@@ -204,47 +349,325 @@ class MinecraftServer:
 
         logger.info(f"Server {self.uuid} saved!")
 
+    def get_runtime(self) -> JavaRuntime | None:
+        """
+        Java runtime the server runs on: the one set in its settings,
+        otherwise the best one for its Minecraft version.
+        Blocking the first time runtimes are discovered.
+        """
+        return runtime_registry.runtime_for(
+            self.settings.get("java_runtime"), self.version, self.jar_type
+        )
+
+    @property
+    def java(self) -> str:
+        """java executable of the server ("java" from PATH if no runtime is known)"""
+        return self.runtime.java_path if self.runtime else "java"
+
+    @property
+    def java_major(self) -> int | None:
+        """Major version of the server runtime, None if no runtime is known"""
+        return self.runtime.major if self.runtime else None
+
+    def _launch_command(self, extra_args: list[str] = ()) -> list[str]:
+        """Command line that starts the server"""
+        return launch_command(
+            self.settings,
+            self.jar_path,
+            java=self.java,
+            extra_args=extra_args,
+            java_major=self.java_major,
+        )
+
+    @property
+    def class_data_jar(self) -> str:
+        """Jar identifying the classes the server loads"""
+        return self.jar_path
+
+    def get_class_data(self) -> ClassDataArchive:
+        """Class data sharing archive of the server"""
+        if not self.class_data:
+            self.class_data = ClassDataArchive(self.uuid)
+        return self.class_data
+
+    def get_scrollback(self) -> Scrollback:
+        """Console history of the server"""
+        if not self.scrollback:
+            self.scrollback = Scrollback(self.uuid)
+        return self.scrollback
+
+    def get_startup_history(self) -> StartupHistory:
+        """Startup times of the server"""
+        if not self.startup_history:
+            self.startup_history = StartupHistory(self.uuid)
+        return self.startup_history
+
+    def _addons(self) -> tuple[int, str]:
+        """Number of plugins/mods and a hash of their names and sizes"""
+        digest = hashlib.sha1()
+        count = 0
+        for folder in ("plugins", "mods"):
+            folder_path = os.path.join(self.server_path, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for entry in sorted(os.scandir(folder_path), key=lambda e: e.name):
+                if entry.is_file() and entry.name.endswith(".jar"):
+                    count += 1
+                    digest.update(f"{folder}/{entry.name}:{entry.stat().st_size};".encode())
+        return count, digest.hexdigest()
+
+    def _startup_details(self) -> dict:
+        """What a start depends on, stored along with its timings"""
+        addons, addons_hash = self._addons()
+        return {
+            "version": self.version,
+            "jar_type": self.jar_type,
+            "jvm_args": jvm_args(self.settings, self.java_major),
+            "ram": self.settings.get("dedicated_ram"),
+            "addons": addons,
+            "addons_hash": addons_hash,
+            "java": self.runtime.version if self.runtime else None,
+        }
+
+    def _start_scrollback_session(self):
+        """Starts capturing the console of a new run"""
+        self.get_scrollback().start_session()
+
+    @property
+    def checkpoint_supported(self) -> bool:
+        """True if the server JVM is started directly and can be checkpointed"""
+        return True
+
+    def get_checkpoint(self) -> Checkpoint:
+        """Checkpoint image of the server"""
+        if not self.checkpoint:
+            self.checkpoint = Checkpoint(self.settings["folder_path"])
+        return self.checkpoint
+
+    def _instant_start(self) -> bool:
+        """True if the server is hibernated and restored instead of cold-booted"""
+        return bool(
+            self.settings.get("instant_start")
+            and self.checkpoint_supported
+            and supports_crac(self.java)
+        )
+
+    def _checkpoint_fingerprint(self) -> str:
+        """Hash of the files a checkpoint depends on, in the folder the server runs in"""
+        folder_path = self.settings["folder_path"]
+        return fingerprint(
+            self.server_path,
+            [
+                os.path.relpath(os.path.join(folder_path, world_dir), self.server_path)
+                for world_dir in world_dirs(self)
+            ],
+            jar_hash(self.class_data_jar),
+        )
+
+    def _restore_command(self) -> list[str] | None:
+        """Command that restores the checkpoint, None if there is no valid one"""
+        if not self._instant_start():
+            return None
+        checkpoint = self.get_checkpoint()
+        if checkpoint.metadata is None:
+            return None
+        if not checkpoint.is_valid(self._checkpoint_fingerprint()):
+            logger.info(f"Files of server {self.uuid} changed since its checkpoint")
+            checkpoint.invalidate()
+            return None
+        return checkpoint.restore_command(self.java)
+
+    async def _spawn(self, cmd: list[str]):
+        """Starts the server process"""
+        if self.detached:
+            self.process = await spawn_runner(
+                self.uuid,
+                cmd,
+                cwd=self.server_path,
+                env=self.runtime.env() if self.runtime else None,
+            )
+            return
+
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=self.server_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=self.runtime.env() if self.runtime else None,
+        )
+
+    async def _restore(self, cmd: list[str]) -> asyncio.Task | None:
+        """
+        Restores the checkpoint. The restored server is ready as soon
+        as it answers a command. Returns the console reader task,
+        None if the restore failed and the server must be cold-booted.
+        """
+        logger.info(f"Restoring server {self.uuid} from its checkpoint")
+        self.startup_timer.details["restored"] = True
+        self._restore_waiter = asyncio.Event()
+        await self._spawn(cmd)
+        output_task = asyncio.create_task(self._console_reader())
+        answered = asyncio.create_task(self._restore_waiter.wait())
+        exited = asyncio.create_task(self.process.wait())
+        try:
+            self.process.stdin.write(b"list\n")
+            await self.process.stdin.drain()
+            await asyncio.wait(
+                [answered, exited],
+                timeout=mcssettings.CHECKPOINT_RESTORE_TIMEOUT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        except OSError as e:
+            logger.error(f"Restored server {self.uuid} is not responding: {e}")
+        finally:
+            answered.cancel()
+            exited.cancel()
+        restored = self._restore_waiter.is_set() and self.process.returncode is None
+        self._restore_waiter = None
+
+        # The world changes from now on: the image can't be reused
+        await asyncio.to_thread(self.get_checkpoint().consume)
+        if restored:
+            self._set_state(READY)
+            self.get_startup_history().add(self.startup_timer.done())
+            self.startup_timer = None
+            return output_task
+
+        logger.warning(f"Restore of server {self.uuid} failed, starting it normally")
+        if self.process.returncode is None:
+            self.process.kill()
+        await self.process.wait()
+        await asyncio.gather(output_task, return_exceptions=True)
+        await asyncio.to_thread(self.get_checkpoint().invalidate)
+        self.startup_timer.details["restored"] = False
+        return None
+
+    async def _checkpoint_failed(self):
+        """
+        The JVM can't be checkpointed (CRaC refused it): the server is stopped
+        normally and instant start is turned off so it isn't tried again.
+        """
+        logger.warning(
+            f"Checkpoint of server {self.uuid} failed, the JVM kept running. "
+            "Instant start disabled"
+        )
+        self.settings["instant_start"] = False
+        await asyncio.to_thread(self.get_checkpoint().invalidate)
+        await asyncio.to_thread(self.save)
+
+    async def _hibernate(self) -> bool:
+        """
+        Saves the world and checkpoints the JVM instead of stopping it.
+        Returns False if no checkpoint was taken (the server is still running).
+        """
+        if not await asyncio.to_thread(self._instant_start):
+            return False
+
+        saved = asyncio.Event()
+
+        def _on_saved(_event: LogEvent):
+            saved.set()
+
+        self.log_parser.subscribe(log_parser.SAVED, _on_saved)
+        try:
+            self.process.stdin.write(b"save-all flush\n")
+            await self.process.stdin.drain()
+            await asyncio.wait_for(saved.wait(), timeout=mcssettings.CHECKPOINT_SAVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Server {self.uuid} didn't save the world, not checkpointing it")
+            return False
+        finally:
+            self.log_parser.unsubscribe(log_parser.SAVED, _on_saved)
+
+        failed = asyncio.Event()
+
+        def _on_failed(_event: LogEvent):
+            failed.set()
+
+        checkpoint = self.get_checkpoint()
+        await asyncio.to_thread(checkpoint.prepare)
+        self.log_parser.subscribe(log_parser.CHECKPOINT_FAILED, _on_failed)
+        try:
+            if not await checkpoint.take(self.process.pid, self.java):
+                await self._checkpoint_failed()
+                return False
+            # the JVM exits once the image is written, or says why it can't
+            exited = asyncio.ensure_future(self.process.wait())
+            reported = asyncio.ensure_future(failed.wait())
+            await asyncio.wait(
+                (exited, reported),
+                timeout=mcssettings.CHECKPOINT_TIMEOUT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            exited.cancel()
+            reported.cancel()
+            if failed.is_set() or not exited.done():
+                await self._checkpoint_failed()
+                return False
+        finally:
+            self.log_parser.unsubscribe(log_parser.CHECKPOINT_FAILED, _on_failed)
+
+        current_fingerprint = await asyncio.to_thread(self._checkpoint_fingerprint)
+        return await asyncio.to_thread(checkpoint.commit, current_fingerprint)
+
     async def start(self):
         """Starts the server"""
-        self.starting = True
+        self._set_state(STARTING)
         logger.info(f"Starting server {self.uuid}...")
+        self.started_at = time.time()
+        self.returncode = None
+        self.stop_requested = False
+        self.out_of_memory = False
+        self.crash_reported = False
+        self.unresponsive = False
+        self.hung = False
+        self.tps = None
         try:
-            cmd = [
-                "java",
-                # f"-d{mcssettings.JAVA_BIT_MODEL}",
-                f"-Xmx{self.settings['dedicated_ram']}G",
-                f"-Xms{self.settings['dedicated_ram']}G",
-                "-jar",
-                self.jar_path,
-                "nogui" if mcssettings.NOGUI else "",
-            ]
-
-            # Start the subprocess
-            self.process = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=self.server_path,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
-            )
+            await asyncio.to_thread(self._start_scrollback_session)
+            self.runtime = await asyncio.to_thread(self.get_runtime)
+            details = await asyncio.to_thread(self._startup_details)
+
+            output_task = None
+            restore_cmd = await asyncio.to_thread(self._restore_command)
+            if restore_cmd:
+                self.startup_timer = StartupTimer(details)
+                output_task = await self._restore(restore_cmd)
+
+            if output_task is None:
+                extra_args = await asyncio.to_thread(
+                    self.get_class_data().launch_args,
+                    self.class_data_jar,
+                    details["addons_hash"],
+                    self.java,
+                )
+                details["cds"] = self.class_data.mode
+                if await asyncio.to_thread(self._instant_start):
+                    # allow hibernating it when it is stopped
+                    extra_args += self.get_checkpoint().launch_args()
+                cmd = self._launch_command(extra_args=extra_args)
+                self.startup_timer = StartupTimer(details)
+
+                # Start the subprocess
+                await self._spawn(cmd)
+                output_task = asyncio.create_task(self._console_reader())
 
             # Start monitoring the process
-            self.monitor.process = self.process
-            monitor_task = asyncio.create_task(self.monitor.run())
-
-            # Start tasks for reading output and taking input
-            output_task = asyncio.create_task(self._console_reader())
-            # input_task = asyncio.create_task(self.console_writer())
+            self.monitor.start(self.process)
 
             telemetry_client.send_event("server_start", details=self.settings)
             # Wait for the server process to finish
-            await self.process.wait()
-
-            self.running = False
+            returncode = await self.process.wait()
+            self.returncode = returncode
 
             # Cancel input and output tasks once the server stops
             await asyncio.gather(output_task, return_exceptions=True)
-            await asyncio.gather(monitor_task, return_exceptions=True)
+
+            # The timer is consumed when the server gets ready
+            await asyncio.to_thread(
+                self.get_class_data().finish,
+                self.startup_timer is None and returncode == 0,
+            )
 
         except FileNotFoundError as e:
             logger.error(f"Error: {e}")
@@ -253,23 +676,105 @@ class MinecraftServer:
             logger.error(f"An error occurred: {e}")
 
         finally:
-            self.starting = False
-            self.running = False
+            await self._end_run()
+
+    async def attach(self, process: RunnerProcess, ready: bool = False):
+        """
+        Takes over a detached server left running by a previous MCSC.
+        The runner replays the latest console output.
+        """
+        self._set_state(STARTING)
+        logger.info(f"Attaching to server {self.uuid} (pid {process.pid})...")
+        self.started_at = process.started_at
+        self.returncode = None
+        self.stop_requested = False
+        self.out_of_memory = False
+        self.crash_reported = False
+        self.unresponsive = False
+        self.hung = False
+        self.tps = None
+        try:
+            await asyncio.to_thread(self._start_scrollback_session)
+            self.runtime = await asyncio.to_thread(self.get_runtime)
+            self.process = process
+            output_task = asyncio.create_task(self._console_reader())
+            if ready:
+                self._set_state(READY)
+
+            self.monitor.start(self.process)
+            self.returncode = await self.process.wait()
+            await asyncio.gather(output_task, return_exceptions=True)
+
+        except Exception as e:
+            logger.error(f"An error occurred: {e}")
 
-    async def stop(self):
-        """Stops the server"""
-        if self.process and self.running:
+        finally:
+            await self._end_run()
+
+    async def _end_run(self):
+        """Resets the run state once the server process is gone"""
+        self._set_state(STOPPED)
+        self.monitor.stop()
+        self.players.clear()
+        self.startup_timer = None
+        if self.scrollback:
+            await asyncio.to_thread(self.scrollback.end_session)
+
+    async def _wait_for_exit(self, timeout: float):
+        """
+        Waits for the process to exit. Past the deadline it is terminated,
+        then killed if it ignores that too.
+        """
+        process = self.process
+        for phase, deadline in (
+            (TERMINATE, timeout),
+            (KILL, mcssettings.STOP_TERMINATE_TIMEOUT),
+        ):
+            try:
+                await asyncio.wait_for(asyncio.shield(process.wait()), timeout=deadline)
+                return
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Server {self.uuid} still running after {deadline}s, sending {phase}"
+                )
+                self.stop_phase = phase
+                if phase == TERMINATE:
+                    process.terminate()
+                else:
+                    process.kill()
+        await process.wait()
+
+    async def stop(self, timeout: float = mcssettings.STOP_TIMEOUT):
+        """
+        Stops the server, waiting up to timeout seconds for it to shut down
+        before terminating it
+        """
+        self.stop_requested = True
+        if self.state == RESTARTING:
+            # cancels the pending restart
+            self._set_state(STOPPED)
+        elif self.process and self.state in (STARTING, READY, STOPPING):
             logger.info(f"Stopping server {self.uuid}...")
-            self.running = False
-            self.stopping = True
+            # already shutting down (stop from the game): just wait for it
+            stopping = self.state == STOPPING
+            # idle servers in instant start mode are hibernated, hung ones can't be
+            hibernate = self.state == READY and not self.players and not self.hung
+            self._set_state(STOPPING)
+            self.stop_phase = STOP
             try:
+                if stopping:
+                    pass
+
+                elif hibernate and await self._hibernate():
+                    logger.info(f"Server {self.uuid} hibernated")
+
                 # Send the 'stop' command to the server
-                if self.process.stdin:
+                elif self.process.stdin:
                     self.process.stdin.write(b"stop\n")
                     await self.process.stdin.drain()
 
                 # Wait for the process to terminate gracefully
-                await self.process.wait()
+                await self._wait_for_exit(timeout)
                 telemetry_client.send_event("server_stop", details=self.settings)
                 logger.info(f"Server {self.uuid} stopped.")
             except Exception as e:
@@ -277,16 +782,76 @@ class MinecraftServer:
             finally:
                 # Ensure process cleanup
                 self.process = None
-                self.running = False
-                self.stopping = False
+                self.stop_phase = None
+                self._set_state(STOPPED)
                 self.monitor.stop()
         else:
             logger.warning("Server is not running.")
 
+    def _status_address(self) -> tuple[str, int]:
+        """Host and port the server answers status pings on, from server.properties"""
+        properties = {}
+        path = os.path.join(self.server_path, "server.properties")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if "=" in line and not line.startswith("#"):
+                        key, value = line.strip().split("=", 1)
+                        properties[key] = value
+        try:
+            port = int(properties.get("server-port") or DEFAULT_PORT)
+        except ValueError:
+            port = DEFAULT_PORT
+        return properties.get("server-ip") or "127.0.0.1", port
+
+    async def ping(self, timeout: float) -> bool:
+        """
+        Server List Ping on the game port, True if the server answers within timeout.
+        Nothing is written to the console, so players and logs don't see it.
+        """
+        if not self.process:
+            return False
+        host, port = await asyncio.to_thread(self._status_address)
+        try:
+            await asyncio.wait_for(
+                mcstatus.JavaServer(host, port, timeout=timeout).async_status(tries=1),
+                timeout=timeout,
+            )
+            return True
+        except Exception as e:
+            logger.info(f"Server {self.uuid} didn't answer a status ping on {host}:{port}: {e}")
+            return False
+
+    async def probe(self, timeout: float) -> bool:
+        """
+        Runs list on the console, True if its answer is logged within timeout.
+        Commands run on the server thread: unlike a status ping, which the
+        network threads answer, this fails when the server thread is stuck.
+        """
+        if not self.process or not self.process.stdin:
+            return False
+
+        answered = asyncio.Event()
+
+        def _on_player_list(_event: LogEvent):
+            answered.set()
+
+        self.log_parser.subscribe(log_parser.PLAYER_LIST, _on_player_list)
+        try:
+            self.process.stdin.write(b"list\n")
+            await self.process.stdin.drain()
+            await asyncio.wait_for(answered.wait(), timeout=timeout)
+            return True
+        except (asyncio.TimeoutError, OSError) as e:
+            logger.info(f"Server {self.uuid} didn't answer a console probe: {e!r}")
+            return False
+        finally:
+            self.log_parser.unsubscribe(log_parser.PLAYER_LIST, _on_player_list)
+
     async def console_writer(self, command: str):
         """Reads user input and sends it to the server."""
         try:
-            if self.running:
+            if self.state in (STARTING, READY):
                 # command = await asyncio.to_thread(input)
                 if self.process and self.process.stdin and command == "stop":
                     await self.stop()
@@ -297,25 +862,83 @@ class MinecraftServer:
         except Exception as e:
             logger.error(f"Writer error: {e}")
 
-    async def _console_reader(self) -> str:
-        """reads and prints console output"""
+    def _on_console_output(self, lines: list[str]):
+        """Called with every batch of console lines"""
+        self.last_output = time.monotonic()
+        self.unresponsive = False
+        self.console_lines += len(lines)
+        if self.startup_timer:
+            self.startup_timer.output()
+        if self._restore_waiter:
+            self._restore_waiter.set()
+        self.log_parser.feed(lines)
+        if self.scrollback:
+            session = self.scrollback.session
+            first_line = self.scrollback.append(lines)
+            if first_line is not None:
+                search_index.add_console_lines(self.uuid, session, first_line, lines)
+
+    def _on_ready(self, event: LogEvent):
+        """The server printed its "Done" line"""
+        if self.state == STARTING:
+            logger.info(f"Server {self.uuid} ready in {event.data['seconds']}s")
+            self._set_state(READY)
+            self.startup_seconds = event.data["seconds"]
+            if self.startup_timer:
+                record = self.startup_timer.done(event.data["seconds"])
+                self.startup_seconds = record["ready"]
+                self.get_startup_history().add(record)
+                self.startup_timer = None
+
+    def _on_stopping(self, _event: LogEvent):
+        """The server is shutting down (stop command or in-game /stop)"""
+        if self.state in (STARTING, READY):
+            self._set_state(STOPPING)
+
+    def _on_out_of_memory(self, _event: LogEvent):
+        """The JVM ran out of heap"""
+        if not self.out_of_memory:
+            logger.warning(f"Server {self.uuid} ran out of memory")
+        self.out_of_memory = True
+
+    def _on_crash(self, _event: LogEvent):
+        """The server crashed and wrote a crash report"""
+        self.crash_reported = True
+
+    def _on_tps(self, event: LogEvent):
+        """Keeps the TPS reported by the server"""
+        self.tps = event.data["tps"]
+
+    def _on_sample(self, snapshot: dict):
+        """Records a resource usage sample with the game metrics"""
+        snapshot = {**snapshot, "players": len(self.players), "tps": self.tps}
+        self.metrics.record(snapshot)
+        metrics_db.add(self.uuid, snapshot)
+
+    def _on_player_join(self, event: LogEvent):
+        """Tracks online players"""
+        self.players.add(event.data["player"])
+
+    def _on_player_leave(self, event: LogEvent):
+        """Tracks online players"""
+        self.players.discard(event.data["player"])
+
+    async def _console_reader(self):
+        """reads console output until the process closes it"""
         try:
-            line = await self.process.stdout.readline()
-            self.starting = False
-            self.running = True
-            while self.running or self.stopping:
-                line = await self.process.stdout.readline()
-                if self.log and line:
-                    self.log.push(line.decode().strip())
-                elif not line:
-                    break
+            await self.console.read(self.process.stdout)
         except Exception as e:
             logger.error(f"Reader error: {e}")
 
     def delete(self, delete_dir: bool = False):
         """Deletes the server from servers.json"""
         # Don't use self.server_path here
-        if not self.running and not self.process:
+        if self.state == RESTARTING:
+            # cancels the pending restart, the supervisor lets the server go
+            self.stop_requested = True
+            self._set_state(STOPPED)
+        exited = not self.process or self.process.returncode is not None
+        if self.state == STOPPED and exited:
             logger.info(f"Deleting server {self.uuid}... delete_dir: {delete_dir}")
             if delete_dir:
                 for item in os.listdir(self.settings["folder_path"]):
@@ -337,6 +960,11 @@ class MinecraftServer:
             # remove from global_settings
             assert global_settings[self.uuid], _("Invalid server")
             del global_settings[self.uuid]
+            search_index.forget(self.uuid)
+            metrics_db.forget(self.uuid)
+            self.get_startup_history().delete()
+            self.get_class_data().invalidate()
+            self.get_checkpoint().invalidate()
 
             # update settings
             try:
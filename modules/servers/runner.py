@@ -0,0 +1,242 @@
+"""
+Detached server runner.
+
+A small process that owns a server JVM so the server survives MCSC
+restarts. It keeps the JVM console pipes, remembers the latest output
+and serves them on a local socket:
+    python -m modules.servers.runner <state file>
+
+The state file is written by MCSC (command, token, backlog size, stop
+timeout) and completed by the runner (pids with their start times, port,
+ready, returncode).
+Clients send the token on the first line, then get the backlog and the
+live output; whatever they send is written to the JVM stdin.
+Each client is fed by its own thread: a client that falls behind is
+dropped, the JVM output is never held up by a socket.
+Only uses the standard library: it must not depend on the app.
+"""
+
+import json
+import os
+import queue
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+
+READY_RE = re.compile(rb"Done \(\d+(?:[.,]\d+)?s\)!")
+READ_SIZE = 64 * 1024
+# chunks of output waiting for a client before it is dropped
+CLIENT_QUEUE_SIZE = 256
+# longest partial line kept to look for the ready line
+LINE_LIMIT = 64 * 1024
+
+
+class Client:
+    """A connected client and the output waiting to be sent to it"""
+
+    def __init__(self, sock: socket.socket):
+        self.socket = sock
+        self.queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+    def send(self, data: bytes) -> bool:
+        """Queues data without blocking. False if the client fell behind"""
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self):
+        """Closes the socket and wakes up the sender thread"""
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+
+
+class Runner:
+    """Runs one server JVM"""
+
+    def __init__(self, state_path: str):
+        # close to the creation time of the runner process, checked with its pid
+        self.created_at = time.time()
+        self.state_path = state_path
+        with open(state_path, "r", encoding="utf-8") as file:
+            self.state = json.load(file)
+        self.process = None
+        self.clients = []
+        self.backlog = deque()
+        self.backlog_bytes = 0
+        # output after the last newline, to match the ready line on whole lines
+        self._partial_line = b""
+        self._lock = threading.Lock()
+        self._server_socket = None
+
+    def _save_state(self):
+        partial = self.state_path + ".part"
+        with open(partial, "w", encoding="utf-8") as file:
+            json.dump(self.state, file, indent=4)
+        os.replace(partial, self.state_path)
+
+    def _remember(self, data: bytes):
+        """Keeps the latest output for clients that connect later"""
+        self.backlog.append(data)
+        self.backlog_bytes += len(data)
+        while self.backlog_bytes > self.state["backlog_size"] and len(self.backlog) > 1:
+            self.backlog_bytes -= len(self.backlog.popleft())
+
+    def _check_ready(self, data: bytes):
+        """Marks the server ready once the ready line is complete"""
+        lines = (self._partial_line + data).split(b"\n")
+        self._partial_line = lines.pop()[-LINE_LIMIT:]
+        if any(READY_RE.search(line) for line in lines):
+            self.state["ready"] = True
+            self._partial_line = b""
+            self._save_state()
+
+    def _read_output(self):
+        """Forwards the JVM output to the clients, never blocking on them"""
+        while True:
+            data = self.process.stdout.read1(READ_SIZE)
+            if not data:
+                break
+            if not self.state.get("ready"):
+                self._check_ready(data)
+            with self._lock:
+                self._remember(data)
+                for client in list(self.clients):
+                    if not client.send(data):
+                        # fell behind: it reconnects and gets the backlog
+                        self._drop(client)
+
+    def _drop(self, client: Client):
+        if client in self.clients:
+            self.clients.remove(client)
+        client.close()
+
+    def _send_output(self, client: Client):
+        """Sends the queued output to a client, from its own thread"""
+        while True:
+            data = client.queue.get()
+            if data is None:
+                break
+            try:
+                client.socket.sendall(data)
+            except OSError:
+                break
+        with self._lock:
+            self._drop(client)
+
+    def _serve_client(self, sock: socket.socket):
+        """Authenticates a client, then forwards its input to the JVM"""
+        client = None
+        try:
+            sock.settimeout(5)
+            stream = sock.makefile("rb")
+            token = stream.readline().strip().decode(errors="replace")
+            if token != self.state["token"]:
+                return
+            sock.settimeout(None)
+            client = Client(sock)
+            with self._lock:
+                # queued before any live output, the queue is empty
+                client.send(b"".join(self.backlog))
+                self.clients.append(client)
+            threading.Thread(target=self._send_output, args=(client,), daemon=True).start()
+
+            for line in stream:
+                self.process.stdin.write(line)
+                self.process.stdin.flush()
+        except (OSError, ValueError):
+            pass
+        finally:
+            if client:
+                with self._lock:
+                    self._drop(client)
+            else:
+                sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _address = self._server_socket.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve_client, args=(client,), daemon=True).start()
+
+    def _stop(self, *_args):
+        """Stops the server gracefully (host shutdown), then kills it past the timeout"""
+        try:
+            self.process.stdin.write(b"stop\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            pass
+
+        def _kill():
+            try:
+                self.process.wait(timeout=self.state["stop_timeout"])
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+        threading.Thread(target=_kill, daemon=True).start()
+
+    def run(self) -> int:
+        """Starts the JVM and serves it until it exits"""
+        try:
+            self.process = subprocess.Popen(  # pylint: disable=consider-using-with
+                self.state["cmd"],
+                cwd=self.state["cwd"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+        except OSError as e:
+            self.state["error"] = str(e)
+            self._save_state()
+            return 1
+
+        self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server_socket.bind(("127.0.0.1", 0))
+        self._server_socket.listen()
+
+        self.state.update(
+            {
+                "runner_pid": os.getpid(),
+                "runner_started_at": self.created_at,
+                "pid": self.process.pid,
+                "port": self._server_socket.getsockname()[1],
+                "started_at": time.time(),
+            }
+        )
+        self._save_state()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        threading.Thread(target=self._accept, daemon=True).start()
+        self._read_output()
+
+        returncode = self.process.wait()
+        self.state["returncode"] = returncode
+        self._save_state()
+        self._server_socket.close()
+        with self._lock:
+            for client in list(self.clients):
+                self._drop(client)
+        return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(0 if Runner(sys.argv[1]).run() == 0 else 1)
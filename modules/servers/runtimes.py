@@ -0,0 +1,331 @@
+"""
+Java runtimes module
+"""
+
+import glob
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import tarfile
+import threading
+import zipfile
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+JAVA_EXECUTABLE = "java.exe" if platform.system() == "Windows" else "java"
+JAVA_VERSION_RE = re.compile(r'version "([^"]+)"')
+PROPERTY_RE = re.compile(r"^\s*([\w.]+) = (.*)$", re.MULTILINE)
+ARCHIVE_EXTENSIONS = (".zip", ".tar.gz", ".tgz")
+
+# Where JDKs are usually installed
+SEARCH_PATTERNS = {
+    "Linux": [
+        "/usr/lib/jvm/*",
+        "/usr/java/*",
+        "/opt/java/*",
+        "/opt/*jdk*",
+        "~/.sdkman/candidates/java/*",
+    ],
+    "Darwin": [
+        "/Library/Java/JavaVirtualMachines/*/Contents/Home",
+        "~/Library/Java/JavaVirtualMachines/*/Contents/Home",
+    ],
+    "Windows": [
+        "C:/Program Files/Java/*",
+        "C:/Program Files/Eclipse Adoptium/*",
+        "C:/Program Files/Microsoft/*",
+        "C:/Program Files/Zulu/*",
+        "C:/Program Files/Amazon Corretto/*",
+    ],
+}
+
+# (first Minecraft version, minimum Java major), newest first
+MINECRAFT_JAVA = [
+    ((1, 20, 5), 21),
+    ((1, 18), 17),
+    ((1, 17), 16),
+    ((0,), 8),
+]
+# Forge (and its mods) before 1.17 only run on Java 8
+LEGACY_FORGE_MAX_JAVA = 8
+
+
+def java_major(version: str) -> int:
+    """Major version of a java version string: "1.8.0_392" -> 8, "21.0.2" -> 21"""
+    parts = re.split(r"[._+-]", version)
+    if parts[0] == "1" and len(parts) > 1:
+        return int(parts[1])
+    return int(parts[0])
+
+
+def _version_tuple(version: str) -> tuple:
+    return tuple(int(part) for part in re.findall(r"\d+", version))
+
+
+def required_java(mc_version: str, jar_type: int = 0) -> tuple[int, int | None]:
+    """(minimum, maximum) Java major version a Minecraft version runs on"""
+    version = _version_tuple((mc_version or "").split("-")[0])
+    for first_version, minimum in MINECRAFT_JAVA:
+        if version >= first_version:
+            maximum = LEGACY_FORGE_MAX_JAVA if jar_type == 2 and minimum == 8 else None
+            return minimum, maximum
+    return 8, None
+
+
+class JavaRuntime:
+    """An installed JDK/JRE"""
+
+    def __init__(self, java_path: str, version: str, vendor: str = "", arch: str = ""):
+        self.java_path = java_path
+        self.version = version
+        self.vendor = vendor
+        self.arch = arch
+
+    def __repr__(self):
+        return f"JavaRuntime(version={self.version!r}, path={self.java_path!r})"
+
+    def __str__(self):
+        return f"Java {self.version} ({self.vendor})" if self.vendor else f"Java {self.version}"
+
+    @property
+    def major(self) -> int:
+        """Major version"""
+        return java_major(self.version)
+
+    @property
+    def bin_path(self) -> str:
+        """Folder of the java executable"""
+        return os.path.dirname(self.java_path)
+
+    @property
+    def home(self) -> str:
+        """JAVA_HOME of the runtime"""
+        return os.path.dirname(self.bin_path)
+
+    def env(self) -> dict:
+        """Environment that makes child processes and scripts use this runtime"""
+        env = os.environ.copy()
+        env["JAVA_HOME"] = self.home
+        env["PATH"] = self.bin_path + os.pathsep + env.get("PATH", "")
+        return env
+
+
+class RuntimeRegistry:
+    """
+    Java runtimes installed on the device.
+    Probing a runtime means running it, so results are cached on disk
+    and only refreshed when the executable changes.
+    """
+
+    def __init__(self, cache_path: str = mcssettings.RUNTIMES_CACHE_PATH):
+        self.cache_path = cache_path
+        self.runtimes = {}
+        self.discovered = False
+        self._lock = threading.RLock()
+        self._cache = self._load_cache()
+
+    def __repr__(self):
+        return f"RuntimeRegistry(runtimes={len(self.runtimes)})"
+
+    def _load_cache(self) -> dict:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Can't load runtime cache: {e}")
+            return {}
+
+    def _save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path, "w", encoding="utf-8") as file:
+            json.dump(self._cache, file, indent=4)
+
+    def _run_probe(self, java_path: str) -> dict | None:
+        """Runs java and reads its properties"""
+        try:
+            result = subprocess.run(
+                [java_path, "-XshowSettings:properties", "-version"],
+                capture_output=True,
+                text=True,
+                timeout=30,
+                check=False,
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"Can't run {java_path}: {e}")
+            return None
+
+        output = result.stderr + result.stdout
+        properties = dict(PROPERTY_RE.findall(output))
+        version = properties.get("java.version")
+        if not version:
+            match = JAVA_VERSION_RE.search(output)
+            version = match.group(1) if match else None
+        if not version:
+            return None
+        return {
+            "version": version.strip(),
+            "vendor": properties.get("java.vendor", "").strip(),
+            "arch": properties.get("os.arch", "").strip(),
+        }
+
+    def probe(self, java: str) -> JavaRuntime | None:
+        """Runtime of a java executable (name on PATH or path), cached"""
+        path = shutil.which(java)
+        if not path:
+            return None
+        path = os.path.realpath(path)
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if not cached or cached.get("mtime") != mtime:
+                details = self._run_probe(path)
+                if not details:
+                    return None
+                cached = {**details, "mtime": mtime}
+                self._cache[path] = cached
+                try:
+                    self._save_cache()
+                except OSError as e:
+                    logger.error(f"Can't save runtime cache: {e}")
+                logger.info(f"Probed {path}: Java {details['version']}")
+
+        return JavaRuntime(
+            path, cached["version"], cached.get("vendor", ""), cached.get("arch", "")
+        )
+
+    def _candidates(self) -> set[str]:
+        """java executables that may exist on this device"""
+        homes = []
+        if os.environ.get("JAVA_HOME"):
+            homes.append(os.environ["JAVA_HOME"])
+        for pattern in SEARCH_PATTERNS.get(platform.system(), []):
+            homes += glob.glob(os.path.expanduser(pattern))
+        # runtimes installed by MCSC (archives usually have a top folder)
+        for pattern in ("*", "*/*", "*/*/Contents/Home"):
+            homes += glob.glob(os.path.join(mcssettings.RUNTIMES_DIR, pattern))
+
+        candidates = {
+            os.path.realpath(os.path.join(home, "bin", JAVA_EXECUTABLE))
+            for home in homes
+            if os.path.isfile(os.path.join(home, "bin", JAVA_EXECUTABLE))
+        }
+        on_path = shutil.which("java")
+        if on_path:
+            candidates.add(os.path.realpath(on_path))
+        return candidates
+
+    def discover(self) -> list[JavaRuntime]:
+        """
+        Finds the installed runtimes.
+        Blocking (probes new runtimes): call it from a worker thread.
+        """
+        with self._lock:
+            runtimes = {}
+            for java_path in self._candidates():
+                runtime = self.probe(java_path)
+                if runtime:
+                    runtimes[runtime.java_path] = runtime
+            self.runtimes = runtimes
+            self.discovered = True
+        logger.info(f"Java runtimes: {', '.join(str(r) for r in self.sorted()) or 'none'}")
+        return self.sorted()
+
+    def sorted(self) -> list[JavaRuntime]:
+        """Known runtimes, newest first"""
+        return sorted(
+            self.runtimes.values(), key=lambda r: _version_tuple(r.version), reverse=True
+        )
+
+    def best(self, mc_version: str, jar_type: int = 0) -> JavaRuntime | None:
+        """
+        Runtime a Minecraft version should run on: the oldest major version
+        it supports (what it was built for), newest build of it.
+        """
+        if not self.discovered:
+            self.discover()
+        minimum, maximum = required_java(mc_version, jar_type)
+        compatible = [r for r in self.runtimes.values() if r.major >= minimum]
+        in_range = [r for r in compatible if maximum is None or r.major <= maximum]
+        pool = in_range or compatible
+        if not pool:
+            return None
+        major = min(r.major for r in pool)
+        return max(
+            (r for r in pool if r.major == major), key=lambda r: _version_tuple(r.version)
+        )
+
+    def runtime_for(self, java_path: str | None, mc_version: str, jar_type: int = 0):
+        """Runtime chosen for a server, or the best one if it has none"""
+        if java_path:
+            runtime = self.probe(java_path)
+            if runtime:
+                return runtime
+            logger.warning(f"Java runtime {java_path} not found, using the best available")
+        return self.best(mc_version, jar_type)
+
+    def install_archive(self, archive_path: str) -> JavaRuntime | None:
+        """Extracts a JDK archive (zip, tar.gz) into the runtimes folder"""
+        name = os.path.basename(archive_path)
+        for extension in ARCHIVE_EXTENSIONS:
+            if name.endswith(extension):
+                name = name[: -len(extension)]
+        target = os.path.join(mcssettings.RUNTIMES_DIR, name)
+        if not os.path.exists(target):
+            logger.info(f"Installing Java runtime {archive_path}")
+            partial = target + ".part"
+            shutil.rmtree(partial, ignore_errors=True)
+            if archive_path.endswith(".zip"):
+                with zipfile.ZipFile(archive_path) as archive:
+                    archive.extractall(partial)
+            else:
+                with tarfile.open(archive_path) as archive:
+                    if hasattr(tarfile, "data_filter"):
+                        archive.extractall(partial, filter="data")
+                    else:
+                        archive.extractall(partial)  # nosec: local archives only
+            os.replace(partial, target)
+
+        for dirpath, _dirnames, filenames in os.walk(target):
+            if JAVA_EXECUTABLE in filenames and os.path.basename(dirpath) == "bin":
+                if platform.system() != "Windows":
+                    # zip archives don't keep the executable bit
+                    for filename in filenames:
+                        path = os.path.join(dirpath, filename)
+                        os.chmod(path, os.stat(path).st_mode | 0o111)
+                runtime = self.probe(os.path.join(dirpath, JAVA_EXECUTABLE))
+                if runtime:
+                    with self._lock:
+                        self.runtimes[runtime.java_path] = runtime
+                return runtime
+
+        logger.error(f"{archive_path} doesn't contain a Java runtime")
+        return None
+
+    def install_archives(self) -> list[JavaRuntime]:
+        """Installs every archive found in the runtime archives folder"""
+        installed = []
+        for extension in ARCHIVE_EXTENSIONS:
+            for archive_path in glob.glob(
+                os.path.join(mcssettings.RUNTIME_ARCHIVES_DIR, f"*{extension}")
+            ):
+                try:
+                    runtime = self.install_archive(archive_path)
+                except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    logger.error(f"Can't install {archive_path}: {e}")
+                    continue
+                if runtime:
+                    installed.append(runtime)
+        return installed
+
+
+runtime_registry = RuntimeRegistry()
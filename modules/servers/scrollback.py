@@ -0,0 +1,325 @@
+"""
+Console scrollback module
+"""
+
+import glob
+import gzip
+import json
+import mmap
+import os
+import struct
+import time
+from collections import deque
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+MAGIC = b"MCRB"
+FORMAT_VERSION = 1
+# magic, version, capacity, write position, oldest record position, oldest line number
+HEADER = struct.Struct("<4sIQQQQ")
+RECORD = struct.Struct("<I")
+ARCHIVE_SUFFIX = ".log.gz"
+RING_SUFFIX = ".ring"
+SESSION_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+def _meta_path(archive_path: str) -> str:
+    """Metadata file stored beside an archived session"""
+    return archive_path[: -len(ARCHIVE_SUFFIX)] + ".json"
+
+
+def archive_first_line(archive_path: str) -> int:
+    """
+    Line number of the first line of an archived session.
+    Archives keep the numbering of the ring, whose oldest lines may
+    have been dropped, so line numbers stay valid once a session ends.
+    """
+    return int(_archive_meta(archive_path).get("first_line", 0))
+
+
+def _archive_meta(archive_path: str) -> dict:
+    try:
+        with open(_meta_path(archive_path), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        return meta if isinstance(meta, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def archive_line_count(archive_path: str) -> int:
+    """Number of lines of an archived session"""
+    meta = _archive_meta(archive_path)
+    if isinstance(meta.get("lines"), int):
+        return meta["lines"]
+    # archived before the count was stored
+    with gzip.open(archive_path, "rt", encoding="utf-8", errors="replace") as archive:
+        return sum(1 for _line in archive)
+
+
+def read_archive(archive_path: str, start: int, count: int) -> list[str]:
+    """
+    Up to count lines of an archived session from its start-th line.
+    Streams the archive: only the requested lines are kept in memory.
+    Blocking: call it from a worker thread.
+    """
+    lines = []
+    with gzip.open(archive_path, "rt", encoding="utf-8", errors="replace") as archive:
+        for index, line in enumerate(archive):
+            if index >= start + count:
+                break
+            if index >= start:
+                lines.append(line.rstrip("\n"))
+    return lines
+
+
+class ConsoleRing:
+    """
+    Fixed-size, memory-mapped ring buffer of console lines.
+    Positions are absolute byte offsets (they never wrap),
+    the physical offset is position % capacity.
+    """
+
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        exists = os.path.exists(path)
+        self._file = open(path, "r+b" if exists else "w+b")  # pylint: disable=consider-using-with
+
+        if exists:
+            header = HEADER.unpack(self._file.read(HEADER.size))
+            if header[0] != MAGIC or header[1] != FORMAT_VERSION:
+                self._file.close()
+                raise ValueError(f"{path} is not a console ring")
+            _magic, _version, capacity, write_pos, tail_pos, first_seq = header
+        else:
+            self._file.truncate(HEADER.size + capacity)
+            write_pos, tail_pos, first_seq = 0, 0, 0
+
+        self.capacity = capacity
+        self.write_pos = write_pos
+        self.first_seq = first_seq
+        self._map = mmap.mmap(self._file.fileno(), HEADER.size + capacity)
+        self._offsets = deque()
+
+        # Rebuild the line index (only needed for recovered rings)
+        position = tail_pos
+        while position < write_pos:
+            self._offsets.append(position)
+            position += RECORD.size + RECORD.unpack(self._read(position, RECORD.size))[0]
+        self._write_header()
+
+    def __repr__(self):
+        return f"ConsoleRing(path={self.path!r}, lines={len(self)})"
+
+    def __len__(self):
+        return len(self._offsets)
+
+    @property
+    def next_seq(self) -> int:
+        """Number of the next line to be written"""
+        return self.first_seq + len(self._offsets)
+
+    def _write_header(self):
+        tail_pos = self._offsets[0] if self._offsets else self.write_pos
+        HEADER.pack_into(
+            self._map,
+            0,
+            MAGIC,
+            FORMAT_VERSION,
+            self.capacity,
+            self.write_pos,
+            tail_pos,
+            self.first_seq,
+        )
+
+    def _write(self, position: int, data: bytes):
+        physical = position % self.capacity
+        first = min(len(data), self.capacity - physical)
+        start = HEADER.size + physical
+        self._map[start : start + first] = data[:first]
+        if first < len(data):
+            self._map[HEADER.size : HEADER.size + len(data) - first] = data[first:]
+
+    def _read(self, position: int, size: int) -> bytes:
+        physical = position % self.capacity
+        first = min(size, self.capacity - physical)
+        start = HEADER.size + physical
+        data = self._map[start : start + first]
+        if first < size:
+            data += self._map[HEADER.size : HEADER.size + size - first]
+        return data
+
+    def extend(self, lines: list[str]):
+        """Appends lines, dropping the oldest ones when the ring is full"""
+        for line in lines:
+            data = line.encode("utf-8", errors="replace")[: self.capacity // 2]
+            record = RECORD.pack(len(data)) + data
+            end = self.write_pos + len(record)
+
+            # drop lines the new record overwrites
+            while self._offsets and self._offsets[0] < end - self.capacity:
+                self._offsets.popleft()
+                self.first_seq += 1
+
+            self._write(self.write_pos, record)
+            self._offsets.append(self.write_pos)
+            self.write_pos = end
+
+        self._write_header()
+
+    def _line_at(self, index: int) -> str:
+        position = self._offsets[index]
+        size = RECORD.unpack(self._read(position, RECORD.size))[0]
+        return self._read(position + RECORD.size, size).decode("utf-8", errors="replace")
+
+    def read(self, start: int, count: int) -> list[str]:
+        """Returns up to count lines starting from line number start"""
+        first = max(start - self.first_seq, 0)
+        last = min(first + count, len(self._offsets))
+        return [self._line_at(index) for index in range(first, last)]
+
+    def archive(self, archive_path: str):
+        """Compresses the ring content into archive_path and deletes the ring"""
+        with gzip.open(archive_path, "wt", encoding="utf-8") as archive:
+            for index in range(len(self._offsets)):
+                archive.write(self._line_at(index) + "\n")
+        with open(_meta_path(archive_path), "w", encoding="utf-8") as file:
+            json.dump({"first_line": self.first_seq, "lines": len(self._offsets)}, file)
+        self.close()
+        os.remove(self.path)
+
+    def close(self):
+        """Unmaps the ring"""
+        if not self._map.closed:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+
+
+class Scrollback:
+    """
+    Console history of a server: one ring per running session,
+    compressed when the session ends.
+    """
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+        self.path = os.path.join(mcssettings.CONSOLE_DIR, uuid)
+        self.ring = None
+        self.session = None
+        os.makedirs(self.path, exist_ok=True)
+        self._recover()
+
+    def __repr__(self):
+        return f"Scrollback(uuid={self.uuid}, session={self.session})"
+
+    def _recover(self):
+        """Archives rings left behind by a crash"""
+        for ring_path in glob.glob(os.path.join(self.path, "*" + RING_SUFFIX)):
+            try:
+                ConsoleRing(ring_path, mcssettings.CONSOLE_RING_SIZE).archive(
+                    ring_path[: -len(RING_SUFFIX)] + ARCHIVE_SUFFIX
+                )
+                logger.info(f"Recovered console session {ring_path}")
+            except (OSError, ValueError, struct.error) as e:
+                logger.error(f"Can't recover console session {ring_path}: {e}")
+
+    def _new_session_name(self) -> str:
+        """
+        Name of a new session: its start time, with a counter when a
+        session already started within the same second (quick restarts).
+        """
+        base = time.strftime(SESSION_FORMAT)
+        name = base
+        number = 1
+        while any(
+            os.path.exists(os.path.join(self.path, name + suffix))
+            for suffix in (RING_SUFFIX, ARCHIVE_SUFFIX)
+        ):
+            number += 1
+            name = f"{base}_{number}"
+        return name
+
+    def start_session(self):
+        """Starts capturing a new session"""
+        self.end_session()
+        self.session = self._new_session_name()
+        self.ring = ConsoleRing(
+            os.path.join(self.path, self.session + RING_SUFFIX),
+            mcssettings.CONSOLE_RING_SIZE,
+        )
+
+    def end_session(self):
+        """Compresses the current session and drops old ones"""
+        if self.ring is None:
+            return
+        ring = self.ring
+        self.ring = None
+        self.session = None
+        ring.archive(ring.path[: -len(RING_SUFFIX)] + ARCHIVE_SUFFIX)
+
+        archives = sorted(glob.glob(os.path.join(self.path, "*" + ARCHIVE_SUFFIX)))
+        for archive_path in archives[: -mcssettings.CONSOLE_SESSIONS_KEPT]:
+            os.remove(archive_path)
+            if os.path.exists(_meta_path(archive_path)):
+                os.remove(_meta_path(archive_path))
+
+    def append(self, lines: list[str]) -> int | None:
+        """
+        Adds lines to the current session.
+        Returns the line number of the first one (None if no session).
+        """
+        if self.ring is None:
+            return None
+        first_line = self.ring.next_seq
+        self.ring.extend(lines)
+        return first_line
+
+    def sessions(self) -> list[str]:
+        """Session names, newest first"""
+        names = [
+            os.path.basename(path)[: -len(ARCHIVE_SUFFIX)]
+            for path in glob.glob(os.path.join(self.path, "*" + ARCHIVE_SUFFIX))
+        ]
+        if self.session:
+            names.append(self.session)
+        return sorted(names, reverse=True)
+
+    def archive_path(self, session: str) -> str:
+        """Path of an archived session"""
+        return os.path.join(self.path, session + ARCHIVE_SUFFIX)
+
+    def is_live(self, session: str) -> bool:
+        """
+        True for the session being captured: it is read from the ring, on the
+        event loop. Archived sessions are read from disk, in a worker thread.
+        """
+        return session == self.session and self.ring is not None
+
+    def line_range(self, session: str) -> tuple[int, int]:
+        """Returns (first, next) line numbers available for a session"""
+        if self.is_live(session):
+            return self.ring.first_seq, self.ring.next_seq
+        path = self.archive_path(session)
+        if not os.path.exists(path):
+            return 0, 0
+        first = archive_first_line(path)
+        return first, first + archive_line_count(path)
+
+    def read(self, session: str, start: int, count: int) -> list[str]:
+        """Returns up to count lines of a session starting from line start"""
+        if self.is_live(session):
+            return self.ring.read(start, count)
+        path = self.archive_path(session)
+        if not os.path.exists(path):
+            return []
+        return read_archive(path, max(start - archive_first_line(path), 0), count)
+
+    def tail(self, count: int) -> list[str]:
+        """Last count lines of the current session"""
+        if self.ring is None:
+            return []
+        return self.ring.read(self.ring.next_seq - count, count)
@@ -0,0 +1,145 @@
+"""
+Server startup history module
+"""
+
+import json
+import os
+import statistics
+import time
+
+from config import settings as mcssettings
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+
+class StartupTimer:
+    """
+    Measures one start of a server:
+    spawn -> first console output -> "Done" line
+    """
+
+    def __init__(self, details: dict):
+        self.details = details
+        self.started_at = time.time()
+        self._spawned = time.monotonic()
+        self.first_output = None
+        self.ready = None
+
+    def __repr__(self):
+        return f"StartupTimer(first_output={self.first_output}, ready={self.ready})"
+
+    def output(self):
+        """Called on every console batch, keeps the first one"""
+        if self.first_output is None:
+            self.first_output = round(time.monotonic() - self._spawned, 3)
+
+    def done(self, reported: float | None = None) -> dict:
+        """Marks the server ready and returns the startup record"""
+        self.output()
+        self.ready = round(time.monotonic() - self._spawned, 3)
+        return {
+            "started_at": self.started_at,
+            "first_output": self.first_output,
+            "ready": self.ready,
+            "reported": reported,
+            **self.details,
+        }
+
+
+class StartupHistory:
+    """
+    Persistent list of the startup records of a server,
+    used to spot boots that got slower than usual.
+    """
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+        self.path = os.path.join(mcssettings.STARTUP_HISTORY_DIR, f"{uuid}.json")
+        self.records = self._load()
+
+    def __repr__(self):
+        return f"StartupHistory(uuid={self.uuid}, records={len(self.records)})"
+
+    def _load(self) -> list[dict]:
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Can't load startup history {self.path}: {e}")
+            return []
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(self.records, file, indent=4)
+
+    def baseline(self) -> float | None:
+        """Median ready time of the last cold boots"""
+        times = [
+            record["ready"] for record in self.records if not record.get("restored")
+        ][-mcssettings.STARTUP_BASELINE_RUNS :]
+        if not times:
+            return None
+        return statistics.median(times)
+
+    def _changes(self, record: dict) -> list[str]:
+        """What changed since the previous start"""
+        if not self.records:
+            return []
+        previous = self.records[-1]
+        return [
+            key
+            for key in ("version", "jvm_args", "ram", "addons", "addons_hash")
+            if previous.get(key) != record.get(key)
+        ]
+
+    def add(self, record: dict) -> dict:
+        """Stores a startup record, flagging it if it is a regression"""
+        baseline = self.baseline()
+        record["baseline"] = baseline
+        record["changes"] = self._changes(record)
+        record["regression"] = bool(
+            baseline
+            and record["ready"] > baseline * (1 + mcssettings.STARTUP_REGRESSION_THRESHOLD)
+            and record["ready"] - baseline >= mcssettings.STARTUP_REGRESSION_MIN_SECONDS
+        )
+        if record["regression"]:
+            logger.warning(
+                f"Server {self.uuid} started in {record['ready']}s, "
+                f"usually {baseline}s. Changed: {', '.join(record['changes']) or 'nothing'}"
+            )
+
+        self.records.append(record)
+        self.records = self.records[-mcssettings.STARTUP_HISTORY_SIZE :]
+        try:
+            self._save()
+        except OSError as e:
+            logger.error(f"Can't save startup history {self.path}: {e}")
+        return record
+
+    def cds_gain(self) -> float | None:
+        """
+        Seconds saved per start by class data sharing: median ready time
+        of the last starts without an archive minus the ones with it.
+        """
+        runs = mcssettings.STARTUP_BASELINE_RUNS
+        records = [record for record in self.records if not record.get("restored")]
+        with_cds = [r["ready"] for r in records if r.get("cds") == "on"][-runs:]
+        without_cds = [r["ready"] for r in records if r.get("cds") != "on"][-runs:]
+        if not with_cds or not without_cds:
+            return None
+        return round(statistics.median(without_cds) - statistics.median(with_cds), 2)
+
+    @property
+    def last(self) -> dict | None:
+        """Most recent startup record"""
+        return self.records[-1] if self.records else None
+
+    def delete(self):
+        """Removes the history file"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,247 @@
+"""
+Server process supervisor module
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+from config import settings as mcssettings
+from modules.servers.models import RESTARTING, MinecraftServer, get_server_list
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+# How a server process ended
+CLEAN = "clean"
+CRASH = "crash"
+OUT_OF_MEMORY = "out_of_memory"  # java.lang.OutOfMemoryError
+OOM_KILLED = "oom_killed"  # killed by the kernel OOM killer
+KILLED = "killed"  # SIGKILL from someone else
+FAILED = "failed"  # the process could not be started
+HUNG = "hung"  # killed by the watchdog
+
+# What the supervisor did about it
+NONE = "none"
+RESTART = "restart"
+GAVE_UP = "gave_up"
+
+# SIGKILL, as seen by Popen and by shells
+KILL_RETURNCODES = (-9, 137)
+
+
+def _oom_kill_count() -> int | None:
+    """Processes killed by the kernel OOM killer since boot (Linux only)"""
+    try:
+        with open("/proc/vmstat", "r", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("oom_kill "):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def classify_exit(server: MinecraftServer, oom_kills_before: int | None = None) -> str:
+    """Tells why the last run of a server ended"""
+    returncode = server.returncode
+    if server.hung:
+        return HUNG
+    if server.stop_requested:
+        return CLEAN
+    if returncode is None:
+        return FAILED
+    if server.out_of_memory:
+        return OUT_OF_MEMORY
+    if returncode in KILL_RETURNCODES:
+        oom_kills = _oom_kill_count()
+        if oom_kills is not None and oom_kills_before is not None and oom_kills > oom_kills_before:
+            return OOM_KILLED
+        return KILLED
+    if returncode != 0 or server.crash_reported:
+        return CRASH
+    # stopped from the game or by a plugin
+    return CLEAN
+
+
+class RestartHistory:
+    """Persistent list of how the runs of a server ended"""
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+        self.path = os.path.join(mcssettings.RESTART_HISTORY_DIR, f"{uuid}.json")
+        self.records = self._load()
+
+    def __repr__(self):
+        return f"RestartHistory(uuid={self.uuid}, records={len(self.records)})"
+
+    def _load(self) -> list[dict]:
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Can't load restart history {self.path}: {e}")
+            return []
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(self.records, file, indent=4)
+
+    def add(self, record: dict):
+        """Stores a record"""
+        self.records.append(record)
+        self.records = self.records[-mcssettings.RESTART_HISTORY_SIZE :]
+        try:
+            self._save()
+        except OSError as e:
+            logger.error(f"Can't save restart history {self.path}: {e}")
+
+    @property
+    def last(self) -> dict | None:
+        """Latest record"""
+        return self.records[-1] if self.records else None
+
+    def delete(self):
+        """Deletes the history file"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Supervisor:
+    """
+    Owns the lifecycle of running servers, independently of the UI.
+    A server that crashes is restarted with exponential backoff;
+    too many crashes in a short time mean a crash loop and it is left stopped.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._crashes = {}
+        self._histories = {}
+        # since MCSC started, by server uuid
+        self.exits = {}
+        self.restarts = {}
+
+    def __repr__(self):
+        return f"Supervisor(servers={len(self._tasks)})"
+
+    def supervised(self, server: MinecraftServer) -> bool:
+        """True while the supervisor runs the server"""
+        return server in self._tasks
+
+    def get_history(self, server: MinecraftServer) -> RestartHistory:
+        """Restart history of a server"""
+        if server.uuid not in self._histories:
+            self._histories[server.uuid] = RestartHistory(server.uuid)
+        return self._histories[server.uuid]
+
+    def delete_history(self, server: MinecraftServer):
+        """Deletes the restart history of a server"""
+        self.get_history(server).delete()
+        self._histories.pop(server.uuid, None)
+        self._crashes.pop(server.uuid, None)
+        self.exits.pop(server.uuid, None)
+        self.restarts.pop(server.uuid, None)
+
+    def run(self, server: MinecraftServer, process=None, ready: bool = False) -> asyncio.Task:
+        """
+        Starts a server and keeps it running.
+        With process, takes over a detached server that is already running.
+        Must be called from the event loop.
+        """
+        if server not in self._tasks:
+            task = asyncio.create_task(self._supervise(server, process, ready))
+            self._tasks[server] = task
+            task.add_done_callback(lambda _task: self._tasks.pop(server, None))
+        return self._tasks[server]
+
+    def _backoff(self, server: MinecraftServer, uptime: float) -> float | None:
+        """Seconds to wait before restarting, None in a crash loop"""
+        now = time.time()
+        crashes = self._crashes.setdefault(server.uuid, deque())
+        if uptime >= mcssettings.RESTART_STABLE_UPTIME:
+            # it ran fine for a while: start over
+            crashes.clear()
+        crashes.append(now)
+        while crashes and now - crashes[0] > mcssettings.CRASH_LOOP_WINDOW:
+            crashes.popleft()
+
+        if len(crashes) >= mcssettings.CRASH_LOOP_COUNT:
+            crashes.clear()
+            return None
+        return min(
+            mcssettings.RESTART_BACKOFF_BASE * 2 ** (len(crashes) - 1),
+            mcssettings.RESTART_BACKOFF_MAX,
+        )
+
+    async def _supervise(self, server: MinecraftServer, process=None, ready: bool = False):
+        """Runs a server until it stops cleanly or crash loops"""
+        while True:
+            oom_kills = await asyncio.to_thread(_oom_kill_count)
+            if process:
+                await server.attach(process, ready)
+                process = None
+            else:
+                await server.start()
+
+            reason = classify_exit(server, oom_kills)
+            uptime = time.time() - (server.started_at or time.time())
+            record = {
+                "time": time.time(),
+                "exit": reason,
+                "returncode": server.returncode,
+                "uptime": round(uptime, 1),
+                "action": NONE,
+                "delay": None,
+            }
+
+            restart = (
+                reason != CLEAN
+                and server.settings.get("auto_restart", True)
+                and server in get_server_list()
+            )
+            if restart:
+                delay = self._backoff(server, uptime)
+                if delay is None:
+                    record["action"] = GAVE_UP
+                    logger.error(
+                        f"Server {server.uuid} is crash looping "
+                        f"({mcssettings.CRASH_LOOP_COUNT} crashes in "
+                        f"{mcssettings.CRASH_LOOP_WINDOW}s), not restarting it"
+                    )
+                else:
+                    record["action"] = RESTART
+                    record["delay"] = delay
+                    # keeps the RAM of the server reserved and lets the user cancel
+                    server._set_state(RESTARTING)  # pylint: disable=protected-access
+                    logger.warning(
+                        f"Server {server.uuid} exited ({reason}, code {server.returncode}), "
+                        f"restarting in {delay}s"
+                    )
+            else:
+                logger.info(f"Server {server.uuid} exited ({reason})")
+
+            exits = self.exits.setdefault(server.uuid, {})
+            exits[reason] = exits.get(reason, 0) + 1
+            if record["action"] == RESTART:
+                self.restarts[server.uuid] = self.restarts.get(server.uuid, 0) + 1
+            await asyncio.to_thread(self.get_history(server).add, record)
+            if record["action"] != RESTART:
+                return
+
+            deadline = time.monotonic() + record["delay"]
+            while server.state == RESTARTING and time.monotonic() < deadline:
+                await asyncio.sleep(min(1, deadline - time.monotonic()))
+            # stopped or deleted while waiting
+            if server.state != RESTARTING or server not in get_server_list():
+                logger.info(f"Restart of server {server.uuid} cancelled")
+                return
+
+
+supervisor = Supervisor()
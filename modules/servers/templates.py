@@ -0,0 +1,260 @@
+"""
+Server templates module
+"""
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from uuid import uuid4
+
+from config import settings as mcssettings
+from modules.translations import translate as _
+from modules.servers.cache import clone_file, is_immutable
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+TEMPLATE_FILE = "template.json"
+CONTENT_DIR = "files"
+
+# Never part of a template
+EXCLUDED_NAMES = ("logs", "crash-reports", "debug", "session.lock")
+
+PROPERTIES_FILE = "server.properties"
+PORT_KEY = "server-port"
+MAX_PORT = 65535
+
+# Ports handed to clones by this process, so concurrent clones don't share one
+_claimed_ports = set()
+_port_lock = threading.Lock()
+
+
+def clone_tree(src: str, dst: str, excluded: tuple = ()) -> dict:
+    """
+    Clones src into dst: reflink when available, otherwise hardlinks
+    for immutable library jars and copies for everything else (mods included).
+    excluded are paths relative to src to skip.
+    Returns how many files were cloned with each method.
+    """
+    excluded = {os.path.normpath(path) for path in excluded}
+    methods = {}
+    for root, dirs, files in os.walk(src):
+        relative_root = os.path.relpath(root, src)
+        dirs[:] = [
+            directory
+            for directory in dirs
+            if directory not in EXCLUDED_NAMES
+            and os.path.normpath(os.path.join(relative_root, directory)) not in excluded
+        ]
+        os.makedirs(os.path.join(dst, relative_root), exist_ok=True)
+
+        for filename in files:
+            relative_path = os.path.normpath(os.path.join(relative_root, filename))
+            if filename in EXCLUDED_NAMES or relative_path in excluded:
+                continue
+            method = clone_file(
+                os.path.join(src, relative_path),
+                os.path.join(dst, relative_path),
+                allow_hardlink=is_immutable(relative_path),
+            )
+            methods[method] = methods.get(method, 0) + 1
+
+    return methods
+
+
+def _port_bindable(port: int) -> bool:
+    """True if nothing on this host listens on port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("", port))
+        except OSError:
+            return False
+    return True
+
+
+def claim_port(preferred: int, used: set) -> int:
+    """
+    First port from preferred up that no other server is configured with
+    (used), that wasn't claimed before and that nothing listens on.
+    """
+    with _port_lock:
+        port = preferred
+        while port in used or port in _claimed_ports or not _port_bindable(port):
+            port += 1
+            if port > MAX_PORT:
+                raise ValueError(_("No free port left"))
+        _claimed_ports.add(port)
+        return port
+
+
+def set_port(folder_path: str, port: int):
+    """
+    Sets server-port in the server.properties of a server folder.
+    The file is created when missing, the server fills in the other keys.
+    """
+    path = os.path.join(folder_path, PROPERTIES_FILE)
+    lines = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as properties:
+            lines = [line for line in properties if not line.startswith(f"{PORT_KEY}=")]
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    lines.append(f"{PORT_KEY}={port}\n")
+
+    # the file may be a reflink of the template's, never write through it
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as properties:
+        properties.writelines(lines)
+    os.replace(temp_path, path)
+
+
+class ServerTemplate:
+    """
+    A fully provisioned server folder that new servers are cloned from
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, TEMPLATE_FILE), "r", encoding="utf-8") as file:
+            self.metadata = json.load(file)
+
+    def __repr__(self):
+        return f"<ServerTemplate: {self.name!r} version={self.version}>"
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def id(self) -> str:  # pylint: disable=invalid-name
+        """template id"""
+        return self.metadata["id"]
+
+    @property
+    def name(self) -> str:
+        """template name"""
+        return self.metadata["name"]
+
+    @property
+    def jar_type(self) -> int:
+        """jar type of the template server"""
+        return self.metadata["jar_type"]
+
+    @property
+    def version(self) -> str:
+        """version of the template server"""
+        return self.metadata["version"]
+
+    @property
+    def content_path(self) -> str:
+        """folder holding the server files"""
+        return os.path.join(self.path, CONTENT_DIR)
+
+    def clone_into(self, folder_path: str, port: int | None = None) -> dict:
+        """
+        Clones the template into a server folder.
+        The template keeps the port of the server it was saved from,
+        so the clone gets port instead when given.
+        Returns how many files were cloned with each method.
+        """
+        started = time.monotonic()
+        methods = clone_tree(self.content_path, folder_path)
+        if port is not None:
+            set_port(folder_path, port)
+        logger.info(
+            f"Cloned template {self.id} into {folder_path} in "
+            f"{time.monotonic() - started:.2f}s: {methods}"
+        )
+        return methods
+
+
+def world_dirs(server) -> list[str]:
+    """World folders of a server, relative to its folder"""
+    level_name = "world"
+    properties_path = os.path.join(server.server_path, "server.properties")
+    if os.path.exists(properties_path):
+        with open(properties_path, "r", encoding="utf-8") as properties:
+            for line in properties:
+                if line.startswith("level-name="):
+                    level_name = line.strip().split("=", 1)[1] or level_name
+
+    relative_server_path = os.path.relpath(server.server_path, server.settings["folder_path"])
+    return [
+        os.path.join(relative_server_path, f"{level_name}{suffix}")
+        for suffix in ("", "_nether", "_the_end")
+    ]
+
+
+def create_template(server, name: str, include_world: bool = False) -> ServerTemplate:
+    """
+    Saves a server as a template.
+    The server must be stopped so its files are consistent.
+    """
+    if server.running or server.process:
+        raise ValueError(_("Stop the server before saving it as a template"))
+
+    template_id = str(uuid4())
+    path = os.path.join(mcssettings.TEMPLATES_DIR, template_id)
+    logger.info(f"Creating template {template_id} from server {server.uuid}")
+
+    try:
+        clone_tree(
+            server.settings["folder_path"],
+            os.path.join(path, CONTENT_DIR),
+            excluded=() if include_world else tuple(world_dirs(server)),
+        )
+        with open(os.path.join(path, TEMPLATE_FILE), "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "id": template_id,
+                    "name": name,
+                    "jar_type": server.jar_type,
+                    "version": server.version,
+                    "source": server.uuid,
+                    "include_world": include_world,
+                    "created_at": time.time(),
+                },
+                file,
+                indent=4,
+            )
+    except Exception:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+
+    return ServerTemplate(path)
+
+
+def get_templates() -> list[ServerTemplate]:
+    """Returns all saved templates"""
+    if not os.path.exists(mcssettings.TEMPLATES_DIR):
+        return []
+
+    templates = []
+    for template_id in os.listdir(mcssettings.TEMPLATES_DIR):
+        path = os.path.join(mcssettings.TEMPLATES_DIR, template_id)
+        if not os.path.exists(os.path.join(path, TEMPLATE_FILE)):
+            continue
+        try:
+            templates.append(ServerTemplate(path))
+        except (OSError, ValueError) as e:
+            logger.error(f"Can't load template {template_id}: {e}")
+    return templates
+
+
+def get_template(template_id: str) -> ServerTemplate | None:
+    """Returns template by id"""
+    path = os.path.join(mcssettings.TEMPLATES_DIR, template_id)
+    if not os.path.exists(os.path.join(path, TEMPLATE_FILE)):
+        return None
+    return ServerTemplate(path)
+
+
+def delete_template(template_id: str):
+    """Deletes a template. Servers cloned from it are not affected"""
+    template = get_template(template_id)
+    if template:
+        shutil.rmtree(template.path)
+        logger.info(f"Deleted template {template_id}")
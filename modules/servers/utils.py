@@ -2,6 +2,7 @@
 Server related utility functions and classes
 """
 
+import asyncio
 import json
 import os
 import requests
@@ -9,17 +10,26 @@ import requests
 from config import settings as mcssettings
 from modules.translations import translate as _
 from modules.servers.models import (
+    RESTARTING,
     MinecraftServer,
     get_server_list,
     set_global_settings,
 )
+from modules.servers.admission import admission_controller
+from modules.servers.cache import jar_cache, forge_library_cache
+from modules.servers import detached
 from modules.servers.forge import ForgeServer
 from modules.servers.java import JavaServer
+from modules.servers.jobs import ProvisioningJob, provisioning_queue
+from modules.servers.metrics_db import metrics_db
 from modules.servers.paper import PaperServer
+from modules.servers.runtimes import runtime_registry
+from modules.servers.supervisor import supervisor
+from modules.servers.templates import get_template
+from modules.servers.watchdog import watchdog
 from modules.logger import RotatingLogger
-from modules.telemetry import TelemetryClient
+from modules.search import search_index
 
-telemetry_client = TelemetryClient()
 logger = RotatingLogger()
 
 TYPE_TO_CLASS = {
@@ -28,6 +38,9 @@ TYPE_TO_CLASS = {
     2: ForgeServer,
 }
 
+# runners of detached servers found by load_servers, attached at startup
+running_detached = {}
+
 FILE_TO_ATTR = {
     "server.properties": "server_properties",
     "spigot.yml": "spigot_properties",
@@ -35,16 +48,25 @@ FILE_TO_ATTR = {
 }
 
 
-def create_server(settings: dict):
+def create_server(settings: dict) -> ProvisioningJob:
     """
     Use this function to successfully create a server on MCSC.
     This function handles all the necessary steps to create a server.
     Its higly recommended to use this function to create a server.
+    The server is created in the background: watch the returned job.
+    If settings has a "template" id, the server is cloned from it.
     """
     logger.info("Creating server...")
-    instance = TYPE_TO_CLASS[settings["jar_type"]](settings=settings)
-    logger.info(f"Created server with uuid {instance.uuid}")
-    telemetry_client.send_event(event_name="server_create",details=settings)
+    if settings.get("template"):
+        template = get_template(settings["template"])
+        if not template:
+            raise ValueError(_("Template not found"))
+        settings["jar_type"] = template.jar_type
+        settings["version"] = template.version
+
+    return provisioning_queue.submit(
+        settings=settings, factory=TYPE_TO_CLASS[settings["jar_type"]]
+    )
 
 
 def load_servers():
@@ -70,6 +92,28 @@ def load_servers():
         logger.info(f"Loading {server_uuid}...")
         TYPE_TO_CLASS[settings["jar_type"]](settings=settings, uuid=server_uuid)
 
+    # Detached servers that kept running while MCSC was closed
+    running_detached.update(detached.collect_runners())
+
+
+async def attach_detached_servers():
+    """
+    Re-attaches to the detached servers found by load_servers:
+    their console and lifecycle are taken over by the supervisor.
+    """
+    for server_uuid, state in list(running_detached.items()):
+        del running_detached[server_uuid]
+        server = get_server_by_uuid(server_uuid)
+        if not server:
+            logger.warning(f"Detached server {server_uuid} is unknown, leaving it running")
+            continue
+        try:
+            process = await detached.connect_runner(server_uuid, state)
+        except OSError as e:
+            logger.error(f"Can't attach to server {server_uuid}: {e}")
+            continue
+        supervisor.run(server, process=process, ready=state.get("ready", False))
+
 
 def get_server_by_name(server_name: str) -> MinecraftServer | None:
     """
@@ -94,12 +138,104 @@ def get_server_by_uuid(
     return None
 
 
-async def full_stop():
-    """Ensures all servers are stopped"""
-    logger.info("Stopping all servers...")
-    for server in get_server_list():
-        if server.running and server.process:
-            await server.stop()
+async def dedupe_server_jars():
+    """
+    Shares identical server.jar files with the jar cache.
+    Servers that are running (detached ones included) are skipped.
+    Runs in a worker thread since it hashes every jar.
+    """
+    servers_dir = os.path.join(os.getcwd(), "servers")
+    running = {
+        server.server_path
+        for server in get_server_list()
+        if server.uuid in running_detached
+        or (server.process and server.process.returncode is None)
+    }
+    if os.path.exists(servers_dir):
+        await asyncio.to_thread(jar_cache.dedupe, servers_dir, running)
+
+
+async def collect_forge_libraries():
+    """
+    Removes shared Forge libraries of versions no server uses,
+    servers being provisioned included.
+    Runs in a worker thread since it walks the whole cache.
+    """
+    versions_in_use = {
+        server.version
+        for server in get_server_list()
+        if isinstance(server, ForgeServer)
+    } | {
+        job.settings.get("version")
+        for job in provisioning_queue.active_jobs
+        if issubclass(job.factory, ForgeServer)
+    }
+    await asyncio.to_thread(forge_library_cache.collect_garbage, versions_in_use)
+
+
+async def discover_java_runtimes():
+    """
+    Installs the JDK archives dropped in the runtime archives folder
+    and finds the installed runtimes. Runs in a worker thread since
+    new runtimes are probed by running them.
+    """
+
+    def _discover():
+        runtime_registry.install_archives()
+        runtime_registry.discover()
+
+    await asyncio.to_thread(_discover)
+
+
+def start_search_indexer():
+    """Starts indexing the logs of every server in the background"""
+    search_index.start(
+        lambda: [(server.uuid, server.server_path) for server in get_server_list()]
+    )
+
+
+def start_metrics_db():
+    """Starts persisting the resource usage of the servers"""
+    metrics_db.start()
+
+
+def start_watchdog():
+    """Starts looking for servers that stopped responding"""
+    watchdog.start()
+
+
+async def full_stop(
+    progress=None, timeout: float = mcssettings.STOP_TIMEOUT, include_detached: bool = False
+):
+    """
+    Ensures all servers are stopped.
+    Servers are stopped concurrently, each one is terminated if it
+    doesn't shut down within timeout seconds.
+    Detached servers are left running unless include_detached.
+    progress(stopped, total) is called every time a server stops.
+    """
+    admission_controller.clear()
+    servers = [
+        server
+        for server in get_server_list()
+        if (server.process or server.state == RESTARTING)
+        and (include_detached or not server.detached)
+    ]
+    logger.info(f"Stopping all servers ({len(servers)} running)...")
+    stopped = 0
+
+    async def _stop(server: MinecraftServer):
+        nonlocal stopped
+        try:
+            await server.stop(timeout=timeout)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error(f"Can't stop server {server.uuid}: {e}")
+        stopped += 1
+        if progress:
+            progress(stopped, len(servers))
+
+    await asyncio.gather(*(_stop(server) for server in servers))
+    logger.info("All servers stopped")
 
 
 def load_vanilla_versions() -> dict:
@@ -0,0 +1,234 @@
+"""
+Hang watchdog module
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+
+from config import settings as mcssettings
+from modules.servers.checkpoint import jcmd_path
+from modules.servers.models import READY, MinecraftServer, get_server_list
+from modules.logger import RotatingLogger
+
+
+logger = RotatingLogger()
+
+SERVER_THREAD = "Server thread"
+# "Server thread" #42 prio=5 os_prio=0 ... up to the blank line ending the stack
+THREAD_RE = re.compile(rf'^"{SERVER_THREAD}".*?(?=\n\s*\n|\Z)', re.MULTILINE | re.DOTALL)
+THREAD_STATE_RE = re.compile(r"java\.lang\.Thread\.State: (\w+)")
+# frames compared between samples
+STACK_DEPTH = 10
+
+
+def server_thread_stack(dump: str) -> tuple[str | None, list[str]]:
+    """State and frames of the main server thread in a thread dump"""
+    match = THREAD_RE.search(dump)
+    if not match:
+        return None, []
+    block = match.group(0)
+    state = THREAD_STATE_RE.search(block)
+    frames = [
+        line.strip()[len("at ") :]
+        for line in block.splitlines()
+        if line.strip().startswith("at ")
+    ]
+    return (state.group(1) if state else None), frames
+
+
+def is_stuck(stacks: list[list[str]]) -> bool:
+    """True if the server thread didn't move between the samples"""
+    if len(stacks) < 2 or not stacks[0]:
+        return False
+    top = stacks[0][:STACK_DEPTH]
+    return all(stack[:STACK_DEPTH] == top for stack in stacks[1:])
+
+
+class HangReports:
+    """Thread dumps taken when a server stopped responding, per server"""
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+        self.path = os.path.join(mcssettings.HANG_DUMPS_DIR, uuid)
+        self.index_path = os.path.join(self.path, "index.json")
+        self.records = self._load()
+
+    def __repr__(self):
+        return f"HangReports(uuid={self.uuid}, records={len(self.records)})"
+
+    def _load(self) -> list[dict]:
+        if not os.path.exists(self.index_path):
+            return []
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Can't load hang reports {self.index_path}: {e}")
+            return []
+
+    def add(self, record: dict, dumps: list[str]) -> dict:
+        """Stores the dumps of an incident and indexes it"""
+        os.makedirs(self.path, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(record["time"]))
+        record["dumps"] = []
+        for number, dump in enumerate(dumps, start=1):
+            filename = f"{stamp}-{number}.txt"
+            with open(os.path.join(self.path, filename), "w", encoding="utf-8") as file:
+                file.write(dump)
+            record["dumps"].append(filename)
+
+        self.records.append(record)
+        for old in self.records[: -mcssettings.HANG_REPORTS_SIZE]:
+            for filename in old.get("dumps", []):
+                if os.path.exists(os.path.join(self.path, filename)):
+                    os.remove(os.path.join(self.path, filename))
+        self.records = self.records[-mcssettings.HANG_REPORTS_SIZE :]
+        with open(self.index_path, "w", encoding="utf-8") as file:
+            json.dump(self.records, file, indent=4)
+        return record
+
+    def read_dump(self, filename: str) -> str:
+        """Content of a dump of this server"""
+        with open(os.path.join(self.path, os.path.basename(filename)), "r", encoding="utf-8") as file:
+            return file.read()
+
+    def delete(self):
+        """Deletes the dumps of the server"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class Watchdog:
+    """
+    Looks for servers that are running but stopped making progress:
+    no console output for a while, and no answer to a Server List Ping
+    or to a console command (only the server thread runs commands, the
+    network threads answer pings even when it is deadlocked).
+    Thread dumps of a silent server are sampled to tell a stuck server
+    thread from an idle one; a stuck server can be killed so the
+    supervisor restarts it.
+    """
+
+    def __init__(self, interval: float = mcssettings.WATCHDOG_INTERVAL):
+        self.interval = interval
+        self._task = None
+        self._failed_pings = {}
+        self._checking = set()
+        self._reports = {}
+
+    def __repr__(self):
+        return f"Watchdog(active={self._task is not None and not self._task.done()})"
+
+    def get_reports(self, server: MinecraftServer) -> HangReports:
+        """Hang reports of a server"""
+        if server.uuid not in self._reports:
+            self._reports[server.uuid] = HangReports(server.uuid)
+        return self._reports[server.uuid]
+
+    def delete_reports(self, server: MinecraftServer):
+        """Deletes the hang reports of a server"""
+        self.get_reports(server).delete()
+        self._reports.pop(server.uuid, None)
+
+    def start(self):
+        """Starts watching. Must be called from the event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            for server in get_server_list():
+                if server.state == READY and server not in self._checking:
+                    self._checking.add(server)
+                    task = asyncio.create_task(self.check(server))
+                    task.add_done_callback(lambda _task, s=server: self._checking.discard(s))
+            await asyncio.sleep(self.interval)
+
+    async def check(self, server: MinecraftServer):
+        """Probes a silent server and investigates it if it doesn't answer"""
+        try:
+            silence = time.monotonic() - (server.last_output or time.monotonic())
+            if silence < mcssettings.WATCHDOG_SILENCE or server.unresponsive:
+                # making progress, or already reported
+                if not server.unresponsive:
+                    self._failed_pings[server.uuid] = 0
+                return
+
+            timeout = mcssettings.WATCHDOG_PING_TIMEOUT
+            if await server.ping(timeout) and await server.probe(timeout):
+                self._failed_pings[server.uuid] = 0
+                return
+
+            failed = self._failed_pings.get(server.uuid, 0) + 1
+            self._failed_pings[server.uuid] = failed
+            if failed < mcssettings.WATCHDOG_FAILED_PINGS or server.state != READY:
+                return
+
+            server.unresponsive = True
+            logger.warning(
+                f"Server {server.uuid} is not responding "
+                f"(no output for {silence:.0f}s, {failed} probes unanswered)"
+            )
+            record = await self.investigate(server)
+            if record["stuck"] and server.settings.get("watchdog_restart"):
+                logger.warning(f"Killing hung server {server.uuid}")
+                server.hung = True
+                await server.stop(timeout=mcssettings.WATCHDOG_STOP_TIMEOUT)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error(f"Watchdog error on server {server.uuid}: {e}")
+
+    async def _thread_dump(self, server: MinecraftServer) -> str | None:
+        jcmd = jcmd_path(server.java)
+        if not jcmd or not server.process:
+            return None
+        process = await asyncio.create_subprocess_exec(
+            jcmd,
+            str(server.process.pid),
+            "Thread.print",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            output, _ = await asyncio.wait_for(
+                process.communicate(), timeout=mcssettings.WATCHDOG_DUMP_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            return None
+        return output.decode(errors="replace") if process.returncode == 0 else None
+
+    async def investigate(self, server: MinecraftServer) -> dict:
+        """Samples thread dumps of a server and records the incident"""
+        dumps = []
+        for sample in range(mcssettings.WATCHDOG_SAMPLES):
+            if sample:
+                await asyncio.sleep(mcssettings.WATCHDOG_SAMPLE_INTERVAL)
+            dump = await self._thread_dump(server)
+            if dump is None:
+                break
+            dumps.append(dump)
+
+        stacks = [server_thread_stack(dump) for dump in dumps]
+        stuck = is_stuck([frames for _state, frames in stacks])
+        thread_state, frames = stacks[-1] if stacks else (None, [])
+        record = {
+            "time": time.time(),
+            "stuck": stuck,
+            "thread_state": thread_state,
+            "top_frame": frames[0] if frames else None,
+            "samples": len(dumps),
+        }
+        if not dumps:
+            logger.warning(f"Can't take thread dumps of server {server.uuid} (jcmd not found?)")
+        elif stuck:
+            logger.warning(
+                f"Server {server.uuid}: {SERVER_THREAD} stuck ({thread_state}) at {record['top_frame']}"
+            )
+        await asyncio.to_thread(self.get_reports(server).add, record, dumps)
+        return record
+
+
+watchdog = Watchdog()
@@ -5,10 +5,11 @@ Utils
 import os
 import asyncio
 import platform
+import re
 import psutil
 from nicegui import ui, app
 
-from modules.servers.models import MinecraftServer, get_server_list
+from modules.servers.models import MinecraftServer, STOPPED, get_server_list
 from modules.servers.utils import (
     full_stop,
     create_server,
@@ -16,6 +17,13 @@ from modules.servers.utils import (
     load_forge_versions,
     load_paper_versions,
 )
+from modules.servers.admission import REJECTED, admission_controller
+from modules.servers.jobs import provisioning_queue
+from modules.servers.supervisor import supervisor
+from modules.servers.watchdog import watchdog
+from modules.servers.jvm import jvm_profiles, AIKAR_PROFILE, DEFAULT_PROFILE
+from modules.servers.runtimes import runtime_registry
+from modules.servers.templates import create_template, get_templates
 from modules.translations import translate as _
 from modules.user_settings import update_settings
 from modules.logger import RotatingLogger
@@ -67,14 +75,14 @@ async def send_notification(
     ui.notification(message=msg, timeout=timeout, spinner=spinner, type=severity)
 
 
-async def stop_processes():
+async def stop_processes(progress=None):
     """
     Shuts down the app.
     This is a ugly way to close the app but it prevents processes from
     still running in the background (a problem i was having).
     """
     logger.info("Shutting down the app...")
-    await full_stop()
+    await full_stop(progress=progress)
     telemetry_client.send_event("app_close")
 
     tasks = {t for t in asyncio.all_tasks() if t is not asyncio.current_task()}
@@ -94,6 +102,16 @@ async def stop_processes():
 def shutdown():
     """Shuts down the app, stopping all servers and processes"""
 
+    def _stop():
+        n = ui.notification(
+            message=_("Stopping servers..."), timeout=None, spinner=True, type="info"
+        )
+
+        def _progress(stopped: int, total: int):
+            n.message = _("Stopping servers ({stopped}/{total})", stopped=stopped, total=total)
+
+        asyncio.create_task(stop_processes(progress=_progress))
+
     def _popup_confirm():
         with ui.dialog() as popup, ui.card().classes("create-server-popup").style(
             "width: 35%"
@@ -113,14 +131,15 @@ def shutdown():
             with ui.row().style("width: 100%"):
                 ui.button(
                     _("Yes, quit"),
-                    on_click=lambda: asyncio.create_task(stop_processes()),
+                    on_click=_stop,
                     icon="check",
                 ).classes("normal-primary-button").style(
                     "width: 100%; background-color: rgb(216, 68, 68) !important;"
                 )
             return popup
 
-    if any([s.running for s in get_server_list()]):
+    # detached servers keep running
+    if any([s.state != STOPPED and not s.detached for s in get_server_list()]):
         _popup_confirm().open()
     else:
         asyncio.create_task(stop_processes())
@@ -155,6 +174,14 @@ def popup_create_server():
         "jar_type": 0,
         "address": "default",
         "port": 25565,
+        "template": None,
+        "group": "",
+        "auto_restart": True,
+        "detached": False,
+        "watchdog_restart": False,
+        "jvm_profile": AIKAR_PROFILE,
+        "jvm_large_pages": False,
+        "jvm_pretouch": False,
     }
 
     async def _create_server(caller: ui.button, settings: dict):
@@ -168,10 +195,18 @@ def popup_create_server():
         await asyncio.sleep(1)
         try:
             assert settings.get("name", "") != "", _("Server name can't be empty")
-            assert settings.get("version", None), _("Server version can't be empty")
+            assert settings.get("version", None) or settings.get("template"), _(
+                "Server version can't be empty"
+            )
+
+            # Enqueue server creation and watch it
+            job = create_server(settings=settings.copy())
+            while not job.done:
+                n.message = job.describe()
+                await asyncio.sleep(0.5)
 
-            # Initialize server
-            create_server(settings=settings.copy())
+            if job.state != "completed":
+                raise RuntimeError(job.stage)
 
             # Reset settings and name
             settings = {
@@ -181,6 +216,9 @@ def popup_create_server():
                 "jar_type": 0,
                 "address": "default",
                 "port": 25565,
+                "jvm_profile": AIKAR_PROFILE,
+                "jvm_large_pages": False,
+                "jvm_pretouch": False,
             }
 
             # Notify user
@@ -270,6 +308,51 @@ def popup_create_server():
                 ),
             )
 
+        with ui.row().style("width: 100%;"):
+            ui.input(_("Group")).classes("create-server-input").bind_value(
+                server_settings, "group"
+            )
+            with ui.checkbox(_("Restart on crash")).style(
+                "margin-top: 15px !important"
+            ).bind_value(server_settings, "auto_restart"):
+                ui.tooltip(_("Restarts the server if it crashes or runs out of memory")).style(
+                    "font-size: 15px;"
+                )
+            with ui.checkbox(_("Restart when hung")).style(
+                "margin-top: 15px !important"
+            ).bind_value(server_settings, "watchdog_restart"):
+                ui.tooltip(
+                    _("Kills the server if it stops responding, so that it is restarted")
+                ).style("font-size: 15px;")
+            with ui.checkbox(_("Detached")).style(
+                "margin-top: 15px !important"
+            ).bind_value(server_settings, "detached"):
+                ui.tooltip(
+                    _("Keeps the server running when MCSC is closed or updated")
+                ).style("font-size: 15px;")
+            template_select = (
+                ui.select(
+                    _template_options(),
+                    label=_("Template"),
+                    clearable=True,
+                )
+                .classes("create-server-input")
+                .bind_value(server_settings, "template")
+            )
+            # Type and version come from the template
+            type_select.bind_enabled_from(
+                template_select, "value", backward=lambda value: not value
+            )
+            version_select.bind_enabled_from(
+                template_select, "value", backward=lambda value: not value
+            )
+
+        popup.on_value_change(
+            lambda x: template_select.set_options(_template_options()) if x.value else None
+        )
+
+        ui.separator()
+        _jvm_settings(server_settings)
         ui.separator()
 
         with ui.row().style("width: 100%;").style("flex-grow: 1;"):
@@ -288,6 +371,334 @@ def popup_create_server():
         return popup
 
 
+def _jvm_settings(settings: dict):
+    """JVM tuning inputs, bound to the server settings"""
+    settings.setdefault("jvm_profile", DEFAULT_PROFILE)
+    settings.setdefault("jvm_large_pages", False)
+    settings.setdefault("jvm_pretouch", False)
+    settings.setdefault("auto_heap", False)
+    settings.setdefault("instant_start", False)
+    settings.setdefault("java_runtime", None)
+    ui.label(_("JVM settings")).style("font-size: 30px;")
+    ui.label(
+        _("Garbage collector flags. Applied the next time the server starts.")
+    ).style("opacity: 0.6")
+    with ui.row().style("width: 100%;"):
+        ui.select(jvm_profiles, label=_("JVM profile")).classes(
+            "create-server-input"
+        ).bind_value(settings, "jvm_profile")
+        with ui.checkbox(_("Large pages")).style(
+            "margin-top: 15px !important"
+        ).bind_value(settings, "jvm_large_pages"):
+            ui.tooltip(_("Backs the heap with huge pages")).style("font-size: 15px;")
+        with ui.checkbox(_("Pre-touch heap")).style(
+            "margin-top: 15px !important"
+        ).bind_value(settings, "jvm_pretouch"):
+            ui.tooltip(
+                _("Commits all the RAM at startup: slower start, steadier ticks")
+            ).style("font-size: 15px;")
+        with ui.checkbox(_("Automatic heap")).style(
+            "margin-top: 15px !important"
+        ).bind_value(settings, "auto_heap"):
+            ui.tooltip(
+                _("Sizes the heap from the server type and the device RAM instead of Dedicated RAM")
+            ).style("font-size: 15px;")
+        runtime_select = ui.select(
+            _runtime_options(settings.get("java_runtime")),
+            label=_("Java runtime"),
+            clearable=True,
+        ).classes("create-server-input").bind_value(settings, "java_runtime")
+        with runtime_select:
+            ui.tooltip(_("Empty: the best installed runtime for the server version")).style(
+                "font-size: 15px;"
+            )
+        with ui.checkbox(_("Instant start")).style(
+            "margin-top: 15px !important"
+        ).bind_value(settings, "instant_start"):
+            ui.tooltip(
+                _(
+                    "Idle servers are hibernated when stopped and restored in about "
+                    "a second. Needs a CRaC JDK on Linux."
+                )
+            ).style("font-size: 15px;")
+
+
+def _runtime_options(current: str | None = None) -> dict:
+    """Java runtime select options"""
+    options = {
+        runtime.java_path: f"{runtime} - {runtime.home}"
+        for runtime in runtime_registry.sorted()
+    }
+    if current and current not in options:
+        options[current] = _("{path} (not found)", path=current)
+    return options
+
+
+def popup_runtimes():
+    """Java runtimes popup window"""
+
+    async def _refresh(caller: ui.button, install: bool = False):
+        caller.disable()
+        try:
+            if install:
+                installed = await asyncio.to_thread(runtime_registry.install_archives)
+                ui.notify(_("{count} runtimes installed", count=len(installed)))
+            await asyncio.to_thread(runtime_registry.discover)
+            _runtime_list.refresh()
+        except Exception as e:
+            logger.error(f"Can't refresh runtimes: {e}")
+            ui.notify(str(e), type="negative")
+        caller.enable()
+
+    @ui.refreshable
+    def _runtime_list():
+        if not runtime_registry.runtimes:
+            ui.label(_("No Java runtime found")).style("opacity: 0.6")
+            return
+
+        for runtime in runtime_registry.sorted():
+            with ui.row().style("width: 100%; align-items: center;"):
+                ui.label(str(runtime)).style("font-size: 20px; width: 35%")
+                ui.label(runtime.home).style("opacity: 0.6; width: 55%")
+
+    with ui.dialog() as popup, ui.card().classes("create-server-popup"):
+        with ui.row():
+            ui.label(_("Java runtimes")).style("font-size: 30px;")
+        ui.label(
+            _(
+                "JDK archives (.zip, .tar.gz) placed in {path} can be installed.",
+                path=mcssettings.RUNTIME_ARCHIVES_DIR,
+            )
+        ).style("opacity: 0.6")
+
+        with ui.column().style("width: 100%;"):
+            _runtime_list()
+
+        with ui.row().style("width: 100%;").style("flex-grow: 1;"):
+            ui.button(_("Close"), on_click=popup.close, icon="close").classes(
+                "normal-secondary-button"
+            )
+            ui.button(
+                _("Rescan"),
+                icon="refresh",
+                on_click=lambda x: _refresh(x.sender),
+            ).classes("normal-secondary-button")
+            ui.button(
+                _("Install from archives"),
+                icon="unarchive",
+                on_click=lambda x: _refresh(x.sender, install=True),
+            ).classes("normal-primary-button")
+
+        popup.on_value_change(lambda x: _runtime_list.refresh() if x.value else None)
+        return popup
+
+
+def _template_options() -> dict:
+    """Template select options"""
+    return {
+        template.id: f"{template.name} ({server_types[template.jar_type]} {template.version})"
+        for template in get_templates()
+    }
+
+
+def popup_save_template(server: MinecraftServer):
+    """Save server as template popup window"""
+    template_settings = {"name": server.name, "include_world": False}
+
+    async def _save_template(caller: ui.button):
+        caller.disable()
+        n = ui.notification(
+            message=_("Saving template {name}", name=template_settings["name"]),
+            timeout=None,
+            spinner=True,
+            type="info",
+        )
+        try:
+            assert template_settings["name"].strip(), _("Template name can't be empty")
+            await asyncio.to_thread(
+                create_template,
+                server,
+                template_settings["name"].strip(),
+                template_settings["include_world"],
+            )
+            n.spinner = False
+            n.type = "positive"
+            n.message = _("Template saved!")
+            popup.close()
+
+        except Exception as e:
+            n.spinner = False
+            n.type = "negative"
+            n.message = str(e)
+
+        caller.enable()
+        await asyncio.sleep(3)
+        n.dismiss()
+
+    with ui.dialog() as popup, ui.card().classes("delete-server-popup"):
+        with ui.row():
+            ui.label(_("Save as template")).style("font-size: 30px;")
+
+        with ui.row().style("width: 100%;"):
+            ui.label(
+                _("New servers can be created from this server's files instantly.")
+            ).style("opacity: 0.6")
+            ui.input(
+                label=_("Template name"),
+                validation={_("Too long!"): lambda value: len(value) < 35},
+            ).classes("create-server-input").style("width: 100% !important;").bind_value(
+                template_settings, "name"
+            )
+            ui.checkbox(_("Include world")).bind_value(template_settings, "include_world")
+
+        with ui.row().style("width: 100%;").style("flex-grow: 1;"):
+            ui.button(_("Cancel"), on_click=popup.close, icon="close").classes(
+                "normal-secondary-button"
+            )
+            ui.button(_("Save"), icon="save").classes("normal-primary-button").on_click(
+                lambda x: _save_template(x.sender)
+            )
+        return popup
+
+
+def popup_jobs():
+    """Provisioning jobs popup window"""
+
+    @ui.refreshable
+    def _job_list():
+        if not provisioning_queue.jobs:
+            ui.label(_("No jobs yet")).style("opacity: 0.6")
+            return
+
+        for job in reversed(provisioning_queue.jobs):
+            with ui.row().style("width: 100%; align-items: center;"):
+                ui.label(job.name).style("font-size: 20px; width: 30%")
+                ui.label(job.describe()).style("opacity: 0.6; width: 40%")
+                ui.label(f"{job.duration:.0f}s").style("opacity: 0.6")
+                if not job.done:
+                    with ui.button(icon="close", on_click=job.cancel).classes(
+                        "circular-button"
+                    ):
+                        ui.tooltip(_("Cancel")).style("font-size: 15px;")
+
+    with ui.dialog() as popup, ui.card().classes("create-server-popup"):
+        with ui.row():
+            ui.label(_("Jobs")).style("font-size: 30px;")
+
+        with ui.column().style("width: 100%;"):
+            _job_list()
+        ui.timer(1, _job_list.refresh).bind_active_from(popup, "value")
+
+        with ui.row().style("width: 100%;").style("flex-grow: 1;"):
+            ui.button(_("Close"), on_click=popup.close, icon="close").classes(
+                "normal-secondary-button"
+            ).style("width: 100% !important;")
+        return popup
+
+
+def start_servers(servers: list[MinecraftServer] = None, group: str = None):
+    """
+    Queues the start of servers (all of them if None, or a group)
+    in the admission controller
+    """
+    if group:
+        requests = admission_controller.start_group(group)
+    elif servers is None:
+        requests = admission_controller.start_all()
+    else:
+        requests = admission_controller.submit(servers)
+
+    for request in requests:
+        if request.state == REJECTED:
+            ui.notify(f"{request.server.name}: {request.reason}", type="negative")
+    queued = [request for request in requests if request.state != REJECTED]
+    if len(queued) > 1:
+        ui.notify(_("{count} servers queued", count=len(queued)))
+
+
+def popup_fleet():
+    """Fleet popup window: start queue, groups and packing report"""
+
+    @ui.refreshable
+    def _fleet_status():
+        committed = admission_controller.committed_mb()
+        report = admission_controller.packing_report()
+        ui.label(
+            _(
+                "{committed} of {budget} MB committed",
+                committed=committed,
+                budget=report["budget_mb"],
+            )
+        ).style("opacity: 0.6")
+
+        ui.label(_("Start queue")).style("font-size: 20px;")
+        if not admission_controller.queue:
+            ui.label(_("No servers waiting")).style("opacity: 0.6")
+        for request in admission_controller.queue:
+            with ui.row().style("width: 100%; align-items: center;"):
+                ui.label(request.server.name).style("font-size: 20px; width: 30%")
+                ui.label(request.reason).style("opacity: 0.6; width: 50%")
+                with ui.button(
+                    icon="close",
+                    on_click=lambda x, s=request.server: admission_controller.cancel(s),
+                ).classes("circular-button"):
+                    ui.tooltip(_("Cancel")).style("font-size: 15px;")
+
+        ui.label(_("Groups")).style("font-size: 20px;")
+        groups = admission_controller.groups()
+        if not groups:
+            ui.label(_("Set a group in the server settings to start servers together")).style(
+                "opacity: 0.6"
+            )
+        with ui.row():
+            for group in groups:
+                ui.button(
+                    group, icon="play_arrow", on_click=lambda x, g=group: start_servers(group=g)
+                ).classes("normal-secondary-button")
+
+        ui.label(_("Servers that can run together")).style("font-size: 20px;")
+        ui.label(
+            _("All servers need {demand} MB", demand=report["demand_mb"])
+        ).style("opacity: 0.6")
+        for index, current in enumerate(report["bins"], start=1):
+            names = ", ".join(
+                f"{server.name} ({size} MB)" for server, size in current["servers"]
+            )
+            ui.label(
+                _(
+                    "Set {index}: {names} - {used} MB",
+                    index=index,
+                    names=names,
+                    used=current["used_mb"],
+                )
+            )
+        for server, size in report["oversized"]:
+            ui.label(
+                _(
+                    "{name} needs {size} MB and can't run on this host",
+                    name=server.name,
+                    size=size,
+                )
+            ).style("color: red")
+
+    with ui.dialog() as popup, ui.card().classes("create-server-popup"):
+        with ui.row():
+            ui.label(_("Fleet")).style("font-size: 30px;")
+
+        with ui.column().style("width: 100%;"):
+            _fleet_status()
+        ui.timer(1, _fleet_status.refresh).bind_active_from(popup, "value")
+
+        with ui.row().style("width: 100%;").style("flex-grow: 1;"):
+            ui.button(_("Close"), on_click=popup.close, icon="close").classes(
+                "normal-secondary-button"
+            )
+            ui.button(
+                _("Start all"), icon="play_arrow", on_click=lambda x: start_servers()
+            ).classes("normal-primary-button")
+        return popup
+
+
 def load_server_versions():
     """Loads server versions"""
     global urls  # pylint:disable=global-statement
@@ -304,6 +715,10 @@ def load_server_versions():
     urls.set_urls(jar_type=2, data_dict=forge_dict)
 
 
+# https://piston-data.mojang.com/v1/objects/<sha1>/server.jar
+MOJANG_OBJECT_RE = re.compile(r"/objects/([0-9a-f]{40})/")
+
+
 class JarUrl:
     """Utility class"""
 
@@ -322,25 +737,30 @@ class JarUrl:
             self.forge_urls = data_dict.copy()
         # self.update_version_list()
 
+    def _entry(self, version: str, jar_type: int) -> str | dict:
+        """Version list entry: the url, or a dict with the url and its checksums"""
+        entries = {0: self.vanilla_urls, 1: self.paper_urls, 2: self.forge_urls}
+        entry = entries.get(jar_type, {}).get(version)
+        if not entry:
+            raise ValueError(_("Version URL not found"))
+        return entry
+
     def get_url(self, version: str, jar_type: int) -> str:
         """returns url of version"""
-        if jar_type == 0:
-            # vanilla url
-            if not self.vanilla_urls.get(version):
-                raise ValueError(_("Version URL not found"))
-            return self.vanilla_urls.get(version)
-
-        if jar_type == 1:
-            # Paper url
-            if not self.paper_urls.get(version):
-                raise ValueError(_("Version URL not found"))
-            return self.paper_urls.get(version)
-
-        if jar_type == 2:
-            # forge url
-            if not self.forge_urls.get(version):
-                raise ValueError(_("Version URL not found"))
-            return self.forge_urls.get(version)
+        entry = self._entry(version, jar_type)
+        return entry["url"] if isinstance(entry, dict) else entry
+
+    def get_checksums(self, version: str, jar_type: int) -> dict:
+        """
+        Checksums of the jar of version published by the manifest:
+        {"sha1": ..., "sha256": ...}, missing ones are None.
+        Mojang download urls carry the sha1 of the object.
+        """
+        entry = self._entry(version, jar_type)
+        if isinstance(entry, dict):
+            return {"sha1": entry.get("sha1"), "sha256": entry.get("sha256")}
+        match = MOJANG_OBJECT_RE.search(entry)
+        return {"sha1": match.group(1) if match else None, "sha256": None}
 
     def update_version_list(self):
         """updates server versions list"""
@@ -512,8 +932,32 @@ def popup_edit_server(server: MinecraftServer):
             ).classes("create-server-input").bind_value_from(
                 server.settings, "version"
             ).disable()
+            ui.input(_("Group")).classes("create-server-input").bind_value(
+                server.settings, "group"
+            )
+            server.settings.setdefault("auto_restart", True)
+            with ui.checkbox(_("Restart on crash")).style(
+                "margin-top: 15px !important"
+            ).bind_value(server.settings, "auto_restart"):
+                ui.tooltip(_("Restarts the server if it crashes or runs out of memory")).style(
+                    "font-size: 15px;"
+                )
+            with ui.checkbox(_("Restart when hung")).style(
+                "margin-top: 15px !important"
+            ).bind_value(server.settings, "watchdog_restart"):
+                ui.tooltip(
+                    _("Kills the server if it stops responding, so that it is restarted")
+                ).style("font-size: 15px;")
+            with ui.checkbox(_("Detached")).style(
+                "margin-top: 15px !important"
+            ).bind_value(server.settings, "detached"):
+                ui.tooltip(
+                    _("Keeps the server running when MCSC is closed or updated")
+                ).style("font-size: 15px;")
 
         ui.separator()
+        _jvm_settings(server.settings)
+        ui.separator()
 
         with ui.row().style("width: 100%;").style("flex-grow: 1;"):
             ui.button(_("Cancel"), on_click=popup.close, icon="close").classes(
@@ -556,6 +1000,8 @@ def popup_delete_server(server: MinecraftServer):
             # delete server
             settings_copy = server.settings.copy()
             server.delete(delete_dir=delete_files)
+            supervisor.delete_history(server)
+            watchdog.delete_reports(server)
             telemetry_client.send_event("server_delete", details=settings_copy)
 
             # notify user
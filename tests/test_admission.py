@@ -0,0 +1,81 @@
+"""
+Tests of the RAM footprint estimate and the fleet packing report
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings as mcssettings
+from modules.servers import admission
+from modules.servers.admission import AdmissionController, footprint_mb
+from modules.servers.jvm import ZGC_PROFILE
+
+
+@pytest.fixture(autouse=True)
+def overheads(monkeypatch):
+    monkeypatch.setattr(mcssettings, "JVM_OVERHEAD_MB", 256)
+    monkeypatch.setattr(mcssettings, "JVM_OVERHEAD_RATIO", 0.1)
+    monkeypatch.setattr(mcssettings, "ZGC_OVERHEAD_RATIO", 0.1)
+    monkeypatch.setattr(mcssettings, "MODDED_OVERHEAD_MB", 512)
+
+
+def make_server(name: str, dedicated_ram: float) -> SimpleNamespace:
+    return SimpleNamespace(uuid=name, settings={"dedicated_ram": dedicated_ram, "jar_type": 0})
+
+
+@pytest.mark.parametrize(
+    "settings, expected",
+    [
+        # 2048 heap + 256 + 10%
+        ({"dedicated_ram": 2, "jar_type": 0}, 2508),
+        ({"dedicated_ram": 2, "jar_type": 0, "jvm_profile": ZGC_PROFILE}, 2713),
+        ({"dedicated_ram": 2, "jar_type": 2}, 3020),
+        ({"dedicated_ram": 2, "jar_type": 2, "jvm_profile": ZGC_PROFILE}, 3225),
+        # unset RAM defaults to 1GB
+        ({"jar_type": 0}, 1382),
+    ],
+)
+def test_footprint_mb(settings, expected):
+    assert footprint_mb(settings) == expected
+
+
+def test_packing_report_first_fit_decreasing(monkeypatch):
+    monkeypatch.setattr(admission, "host_budget_mb", lambda: 6200)
+    small, medium, large = (
+        make_server("small", 1),  # 1382
+        make_server("medium", 2),  # 2508
+        make_server("large", 4),  # 4761
+    )
+
+    report = AdmissionController().packing_report([small, medium, large])
+
+    assert report["budget_mb"] == 6200
+    assert report["demand_mb"] == 1382 + 2508 + 4761
+    assert report["oversized"] == []
+    # largest first, smaller ones fill the gaps
+    names = [[server.uuid for server, _size in current["servers"]] for current in report["bins"]]
+    assert names == [["large", "small"], ["medium"]]
+    assert [current["used_mb"] for current in report["bins"]] == [4761 + 1382, 2508]
+
+
+def test_packing_report_single_set_when_everything_fits(monkeypatch):
+    monkeypatch.setattr(admission, "host_budget_mb", lambda: 10000)
+    servers = [make_server("a", 1), make_server("b", 2), make_server("c", 4)]
+
+    report = AdmissionController().packing_report(servers)
+
+    assert len(report["bins"]) == 1
+    assert report["bins"][0]["used_mb"] == report["demand_mb"]
+
+
+def test_packing_report_oversized(monkeypatch):
+    monkeypatch.setattr(admission, "host_budget_mb", lambda: 2000)
+    small, large = make_server("small", 1), make_server("large", 4)
+
+    report = AdmissionController().packing_report([small, large])
+
+    assert report["oversized"] == [(large, 4761)]
+    assert [[server for server, _size in current["servers"]] for current in report["bins"]] == [
+        [small]
+    ]
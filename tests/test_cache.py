@@ -0,0 +1,319 @@
+"""
+Tests of the jar cache (downloads, installs, eviction, dedupe)
+and of the shared Forge libraries
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+from modules.servers import cache as cache_module
+from modules.servers import utils
+from modules.servers.cache import ForgeLibraryCache, JarCache, hash_file
+from modules.servers.forge import ForgeServer
+from modules.servers.paper import PaperServer
+
+
+MB = 1024 * 1024
+
+
+def sha256_of(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return JarCache(str(tmp_path / "cache"), max_size_mb=100)
+
+
+@pytest.fixture
+def downloads(cache, monkeypatch):
+    """Serves jar contents by url instead of downloading them"""
+    contents = {}
+    requested = []
+
+    def download(url, progress=None):
+        requested.append(url)
+        os.makedirs(cache.downloads_dir, exist_ok=True)
+        part_path = os.path.join(cache.downloads_dir, "jar.part")
+        with open(part_path, "wb") as file:
+            file.write(contents[url])
+        return part_path, hash_file(part_path)
+
+    monkeypatch.setattr(cache, "_download", download)
+    return contents, requested
+
+
+def store(cache, key: str, content: bytes, last_used: float) -> str:
+    """Adds an object and its entry, as fetch does"""
+    sha256 = sha256_of(content)
+    path = cache.object_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(content)
+    cache.index["entries"][key] = {
+        "sha256": sha256,
+        "url": None,
+        "size": len(content),
+        "last_used": last_used,
+    }
+    return path
+
+
+def write_jar(path, content: bytes) -> str:
+    os.makedirs(path, exist_ok=True)
+    jar_path = os.path.join(path, "server.jar")
+    with open(jar_path, "wb") as file:
+        file.write(content)
+    return jar_path
+
+
+def test_no_disk_access_before_use(tmp_path):
+    JarCache(str(tmp_path / "cache"))
+    assert not (tmp_path / "cache").exists()
+
+
+def test_fetch_caches_jar(cache, downloads):
+    contents, requested = downloads
+    contents["https://example.com/1.21.jar"] = b"vanilla 1.21"
+
+    path = cache.fetch("https://example.com/1.21.jar", 0, "1.21")
+    again = cache.fetch("https://example.com/1.21.jar", 0, "1.21")
+
+    assert path == again == cache.object_path(sha256_of(b"vanilla 1.21"))
+    assert requested == ["https://example.com/1.21.jar"]
+    # the index survives a restart
+    assert JarCache(cache.cache_dir).lookup(0, "1.21") == path
+
+
+def test_fetch_checksum_mismatch(cache, downloads):
+    contents, _requested = downloads
+    contents["https://example.com/1.21.jar"] = b"tampered"
+
+    with pytest.raises(ValueError):
+        cache.fetch("https://example.com/1.21.jar", 0, "1.21", expected_sha256="0" * 64)
+    with pytest.raises(ValueError):
+        cache.fetch("https://example.com/1.21.jar", 0, "1.21", expected_sha1="0" * 40)
+
+    assert cache.lookup(0, "1.21") is None
+    assert cache.fetch(
+        "https://example.com/1.21.jar",
+        0,
+        "1.21",
+        expected_sha256=sha256_of(b"tampered").upper(),
+        expected_sha1=hashlib.sha1(b"tampered").hexdigest(),
+    )
+
+
+def test_evict_least_recently_used(cache):
+    oldest = store(cache, "0:1.19", b"a" * MB, last_used=1)
+    store(cache, "0:1.20", b"b" * MB, last_used=2)
+    store(cache, "0:1.21", b"c" * MB, last_used=3)
+
+    cache.evict(max_size=2 * MB)
+
+    assert not os.path.exists(oldest)
+    assert sorted(cache.index["entries"]) == ["0:1.20", "0:1.21"]
+
+
+def test_evict_keeps_jars_in_use(cache, tmp_path):
+    in_use = store(cache, "0:1.19", b"a" * MB, last_used=1)
+    os.link(in_use, tmp_path / "server.jar")
+    newer = store(cache, "0:1.20", b"b" * MB, last_used=2)
+
+    cache.evict(max_size=MB)
+
+    assert os.path.exists(in_use)
+    assert not os.path.exists(newer)
+    assert list(cache.index["entries"]) == ["0:1.19"]
+
+
+def test_evict_removes_every_key_of_an_object(cache):
+    store(cache, "1:1.21-build1", b"same", last_used=1)
+    store(cache, "1:1.21-build2", b"same", last_used=2)
+
+    cache.evict(max_size=0)
+
+    assert cache.index["entries"] == {}
+
+
+@pytest.fixture
+def reflinks(monkeypatch):
+    """Pretends the filesystem supports reflinks, recording them"""
+    made = []
+
+    def reflink(src, dst):
+        shutil.copyfile(src, dst)
+        made.append(dst)
+        return True
+
+    monkeypatch.setattr(cache_module, "_reflink", reflink)
+    return made
+
+
+def test_install_never_hardlinks(cache, downloads, tmp_path):
+    contents, _requested = downloads
+    contents["https://example.com/1.21.jar"] = b"vanilla 1.21"
+    dest = tmp_path / "server" / "server.jar"
+
+    method = cache.install("https://example.com/1.21.jar", 0, "1.21", str(dest))
+
+    assert method in ("reflink", "copy")
+    dest.write_bytes(b"swapped by the user")
+    assert hash_file(cache.lookup(0, "1.21")) == sha256_of(b"vanilla 1.21")
+
+
+def test_install_fetches_again_if_evicted_before_clone(cache, downloads, tmp_path, monkeypatch):
+    contents, requested = downloads
+    contents["https://example.com/1.21.jar"] = b"vanilla 1.21"
+    fetch = cache.fetch
+
+    def fetch_then_evict(**kwargs):
+        path = fetch(**kwargs)
+        if len(requested) == 1:
+            cache.evict(max_size=0)
+        return path
+
+    monkeypatch.setattr(cache, "fetch", fetch_then_evict)
+    dest = tmp_path / "server" / "server.jar"
+
+    cache.install("https://example.com/1.21.jar", 0, "1.21", str(dest))
+
+    assert len(requested) == 2
+    assert dest.read_bytes() == b"vanilla 1.21"
+
+
+def test_dedupe(cache, tmp_path, reflinks):
+    servers = tmp_path / "servers"
+    first = write_jar(servers / "a", b"paper" * 1000)
+    second = write_jar(servers / "b", b"paper" * 1000)
+    other = write_jar(servers / "c", b"forge")
+
+    linked, saved = cache.dedupe(str(servers))
+
+    assert (linked, saved) == (1, 5000)
+    # never hardlinked to the store
+    assert all(os.stat(path).st_nlink == 1 for path in (first, second, other))
+    # objects found by dedupe get an entry, so eviction can see them
+    assert sorted(cache.index["entries"]) == sorted(
+        f"dedupe:{sha256_of(content)}" for content in (b"paper" * 1000, b"forge")
+    )
+    assert sorted(cache.index["files"]) == sorted([first, second, other])
+
+    # unchanged jars are not shared again
+    assert cache.dedupe(str(servers)) == (0, 0)
+
+
+def test_dedupe_without_reflinks(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "_reflink", lambda _src, _dst: False)
+    servers = tmp_path / "servers"
+    first = write_jar(servers / "a", b"paper")
+    second = write_jar(servers / "b", b"paper")
+
+    assert cache.dedupe(str(servers)) == (0, 0)
+    assert not os.path.samefile(first, second)
+    assert os.path.exists(cache.object_path(sha256_of(b"paper")))
+
+
+def test_dedupe_unlinks_hardlinked_jars(cache, tmp_path):
+    object_path = store(cache, "0:1.21", b"vanilla", last_used=1)
+    jar_path = os.path.join(tmp_path, "servers", "a", "server.jar")
+    os.makedirs(os.path.dirname(jar_path))
+    os.link(object_path, jar_path)
+
+    cache.dedupe(str(tmp_path / "servers"))
+
+    assert not os.path.samefile(jar_path, object_path)
+    with open(jar_path, "wb") as file:
+        file.write(b"rewritten in place")
+    assert hash_file(object_path) == sha256_of(b"vanilla")
+
+
+def test_dedupe_skips_running_servers(cache, tmp_path, reflinks):
+    servers = tmp_path / "servers"
+    write_jar(servers / "a", b"paper")
+    running = write_jar(servers / "b", b"paper")
+
+    cache.dedupe(str(servers), skip={str(servers / "b")})
+
+    assert running not in cache.index["files"]
+    assert not any(path.startswith(str(servers / "b")) for path in reflinks)
+
+
+def test_fetch_replaces_dedupe_entry(cache, downloads, tmp_path):
+    contents, requested = downloads
+    write_jar(tmp_path / "servers" / "a", b"vanilla 1.21")
+    cache.dedupe(str(tmp_path / "servers"))
+    contents["https://example.com/1.21.jar"] = b"vanilla 1.21"
+
+    cache.fetch("https://example.com/1.21.jar", 0, "1.21")
+
+    assert requested == ["https://example.com/1.21.jar"]
+    assert list(cache.index["entries"]) == ["0:1.21"]
+
+
+def write_libraries(server_path) -> None:
+    libraries = server_path / "libraries"
+    jar_dir = libraries / "com" / "example" / "lib" / "1.0"
+    jar_dir.mkdir(parents=True)
+    (jar_dir / "lib-1.0.jar").write_bytes(b"library")
+    (libraries / "settings.txt").write_text("generated")
+
+
+def test_forge_libraries_share_jars(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "_reflink", lambda _src, _dst: False)
+    libraries = ForgeLibraryCache(str(tmp_path / "forge"))
+    installed = tmp_path / "installed"
+    write_libraries(installed)
+
+    assert libraries.populate("1.20.1-47.2.0", str(installed)) == 2
+    assert libraries.seed("1.20.1-47.2.0", str(tmp_path / "new")) == 2
+
+    jar = "libraries/com/example/lib/1.0/lib-1.0.jar"
+    # library jars are hardlinked on any filesystem, other files are copied
+    assert os.path.samefile(installed / jar, tmp_path / "new" / jar)
+    assert not os.path.samefile(
+        installed / "libraries" / "settings.txt", tmp_path / "new" / "libraries" / "settings.txt"
+    )
+
+
+def test_forge_libraries_seed_miss(tmp_path):
+    libraries = ForgeLibraryCache(str(tmp_path / "forge"))
+    assert libraries.seed("1.20.1-47.2.0", str(tmp_path / "new")) == 0
+    assert not (tmp_path / "forge").exists()
+
+
+def test_forge_libraries_collect_garbage(tmp_path):
+    libraries = ForgeLibraryCache(str(tmp_path / "forge"))
+    write_libraries(tmp_path / "installed")
+    for version in ("1.19.2-43.3.0", "1.20.1-47.2.0"):
+        libraries.populate(version, str(tmp_path / "installed"))
+
+    libraries.collect_garbage({"1.20.1-47.2.0"})
+
+    assert libraries.versions() == ["1.20.1-47.2.0"]
+
+
+def test_collect_forge_libraries_keeps_versions_being_provisioned(monkeypatch):
+    collected = []
+    monkeypatch.setattr(utils, "get_server_list", lambda: [])
+    monkeypatch.setattr(
+        utils.forge_library_cache, "collect_garbage", lambda versions: collected.append(versions)
+    )
+    monkeypatch.setattr(
+        utils.provisioning_queue,
+        "jobs",
+        [
+            SimpleNamespace(done=False, factory=ForgeServer, settings={"version": "1.20.1-47.2.0"}),
+            SimpleNamespace(done=False, factory=PaperServer, settings={"version": "1.21"}),
+            SimpleNamespace(done=True, factory=ForgeServer, settings={"version": "1.19.2-43.3.0"}),
+        ],
+    )
+
+    asyncio.run(utils.collect_forge_libraries())
+
+    assert collected == [{"1.20.1-47.2.0"}]
@@ -0,0 +1,127 @@
+"""
+Tests of the console line splitting and batched delivery
+"""
+
+import asyncio
+
+import pytest
+
+from modules.servers.console import Console
+
+
+class Viewer:
+    """Stands in for a ui.log"""
+
+    def __init__(self, max_lines: int | None = None):
+        self.max_lines = max_lines
+        self.is_deleted = False
+        self.pushes = []
+
+    def push(self, text: str):
+        self.pushes.append(text)
+
+
+@pytest.fixture
+def console():
+    console = Console(flush_rate=10, max_line_length=10, max_batch_lines=5)
+    received = []
+    console.subscribe(received.extend)
+    console.received = received
+    return console
+
+
+def test_partial_lines_across_chunks(console):
+    console.feed(b"first\nsec")
+    assert console.received == ["first"]
+    console.feed(b"ond\nthi")
+    console.feed(b"rd\n")
+    assert console.received == ["first", "second", "third"]
+    assert console.total_lines == 3
+    assert console.total_bytes == len(b"first\nsecond\nthird\n")
+
+
+def test_crlf(console):
+    console.feed(b"windows\r")
+    console.feed(b"\nline\r\n\r\n")
+    assert console.received == ["windows", "line", ""]
+
+
+def test_long_lines_are_cut(console):
+    console.feed(b"a" * 25 + b"\n")
+    assert console.received == ["a" * 10, "a" * 10, "a" * 5]
+
+    # an endless line without a newline is not kept in memory
+    console.feed(b"b" * 11)
+    assert console.received[3:] == ["b" * 10, "b"]
+
+
+def test_invalid_utf8(console):
+    console.feed(b"caf\xe9\n")
+    assert console.received == ["caf�"]
+
+
+def test_end_of_stream_delivers_last_line(console):
+    console.feed(b"done\nno newline")
+    console.feed(b"")
+    assert console.received == ["done", "no newline"]
+
+
+def test_flush_batches_lines(console):
+    viewer = Viewer()
+    console.add_viewer(viewer)
+    console.feed(b"1\n2\n")
+    console.feed(b"3\n")
+
+    console.flush()
+    console.flush()
+
+    # one push per flush, nothing when there is nothing new
+    assert viewer.pushes == ["1\n2\n3"]
+
+
+def test_flush_size_limit(console):
+    small, large = Viewer(max_lines=2), Viewer()
+    console.add_viewer(small)
+    console.add_viewer(large)
+    console.feed(b"".join(f"{number}\n".encode() for number in range(8)))
+
+    console.flush()
+
+    # a batch keeps the latest lines, and no more than a viewer shows
+    assert large.pushes == ["3\n4\n5\n6\n7"]
+    assert small.pushes == ["6\n7"]
+    # subscribers still get every line
+    assert len(console.received) == 8
+
+
+def test_flush_drops_deleted_viewers(console):
+    viewer = Viewer()
+    console.add_viewer(viewer)
+    viewer.is_deleted = True
+    console.feed(b"line\n")
+    console.flush()
+    assert console.viewers == []
+    assert viewer.pushes == []
+
+
+def test_read_flushes_at_the_flush_rate(console):
+    viewer = Viewer()
+    console.add_viewer(viewer)
+
+    async def run():
+        stream = asyncio.StreamReader()
+
+        async def write():
+            for number in range(6):
+                stream.feed_data(f"{number}\n".encode())
+                await asyncio.sleep(0.025)
+            stream.feed_eof()
+
+        await asyncio.gather(console.read(stream), write())
+
+    asyncio.run(run())
+
+    # 6 lines over ~150ms at 10 flushes per second: a few batches, not one push per line
+    assert 1 <= len(viewer.pushes) < 6
+    assert "\n".join(viewer.pushes).split("\n") == [str(number) for number in range(6)]
+    assert console.lines_per_sec == 0
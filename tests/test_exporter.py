@@ -0,0 +1,94 @@
+"""
+Tests of the Prometheus metrics exporter
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from modules.servers import exporter
+from modules.servers.exporter import MetricFamily, _escape, render_metrics
+from modules.servers.models import READY
+
+
+def test_escape():
+    assert _escape('My "best" server\\1\nline two') == 'My \\"best\\" server\\\\1\\nline two'
+    assert _escape(3) == "3"
+
+
+def test_metric_family_render():
+    family = MetricFamily("mcsc_test", "gauge", "A test metric")
+    family.add({"uuid": "a", "name": 'say "hi"'}, 1)
+    family.add({"uuid": "b"}, None)  # unknown values are left out
+    family.add({}, 2.5)
+
+    assert family.render() == [
+        "# HELP mcsc_test A test metric",
+        "# TYPE mcsc_test gauge",
+        'mcsc_test{uuid="a",name="say \\"hi\\""} 1.0',
+        "mcsc_test 2.5",
+    ]
+
+
+@pytest.fixture
+def server():
+    return SimpleNamespace(
+        uuid="1234",
+        name="Survival",
+        jar_type=1,
+        settings={"version": "1.21.1"},
+        state=READY,
+        unresponsive=False,
+        started_at=1000.0,
+        startup_seconds=12.5,
+        monitor=SimpleNamespace(
+            ram_usage=512,
+            cpu_usage=35.5,
+            disk_read=1,
+            disk_write=0.5,
+            threads=60,
+            open_files=None,
+        ),
+        players=["Steve", "Alex"],
+        tps=19.9,
+        console_lines=420,
+    )
+
+
+def test_render_metrics(monkeypatch, server):
+    monkeypatch.setattr(exporter, "get_server_list", lambda: [server])
+    monkeypatch.setattr(
+        exporter,
+        "supervisor",
+        SimpleNamespace(exits={"1234": {"crash": 2}}, restarts={"1234": 2}),
+    )
+    monkeypatch.setattr(exporter, "admission_controller", SimpleNamespace(queue=[object()]))
+    monkeypatch.setattr(exporter.time, "time", lambda: 1100.0)
+
+    lines = render_metrics().splitlines()
+
+    labels = 'uuid="1234",name="Survival",jar_type="paper",version="1.21.1"'
+    assert f'mcsc_server_state{{{labels},state="ready"}} 1.0' in lines
+    assert f'mcsc_server_state{{{labels},state="stopped"}} 0.0' in lines
+    assert f"mcsc_server_up{{{labels}}} 1.0" in lines
+    assert f"mcsc_server_uptime_seconds{{{labels}}} 100.0" in lines
+    assert f"mcsc_server_memory_rss_bytes{{{labels}}} 536870912.0" in lines
+    assert f"mcsc_server_disk_write_bytes_per_second{{{labels}}} 524288.0" in lines
+    assert f"mcsc_server_players{{{labels}}} 2.0" in lines
+    assert f'mcsc_server_exits_total{{{labels},reason="crash"}} 2.0' in lines
+    assert f"mcsc_server_restarts_total{{{labels}}} 2.0" in lines
+    assert "mcsc_fleet_queued_starts 1.0" in lines
+    # unknown values have no sample, but the family is still described
+    assert "# TYPE mcsc_server_open_files gauge" in lines
+    assert not any(line.startswith("mcsc_server_open_files{") for line in lines)
+    assert lines.count("# TYPE mcsc_server_up gauge") == 1
+
+
+def test_render_metrics_without_servers(monkeypatch):
+    monkeypatch.setattr(exporter, "get_server_list", lambda: [])
+    monkeypatch.setattr(exporter, "admission_controller", SimpleNamespace(queue=[]))
+
+    text = render_metrics()
+
+    assert text.endswith("\n")
+    assert "mcsc_fleet_queued_starts 0.0" in text.splitlines()
@@ -0,0 +1,149 @@
+"""
+Tests of the server provisioning queue
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from modules.servers import jobs
+from modules.servers.jobs import CANCELLED, COMPLETED, FAILED, RUNNING, ProvisioningQueue
+
+
+@pytest.fixture(autouse=True)
+def no_telemetry(monkeypatch):
+    monkeypatch.setattr(jobs, "telemetry_client", SimpleNamespace(send_event=lambda *_a, **_k: None))
+
+
+def make_factory(tmp_path, gate: asyncio.Event = None, error: str = None, started: list = None):
+    """Server class whose provisioning writes its folder, waits for gate and may fail"""
+
+    class FakeServer:
+        def __init__(self, settings: dict):
+            self.settings = {**settings, "folder_path": str(tmp_path / settings["name"])}
+
+        async def provision(self, job):
+            if started is not None:
+                started.append(self.settings["name"])
+            (tmp_path / self.settings["name"]).mkdir()
+            job.set_stage("Downloading")
+            if gate:
+                await gate.wait()
+            job.check_cancelled()
+            if error:
+                raise RuntimeError(error)
+
+    return FakeServer
+
+
+def test_jobs_complete_within_the_worker_limit(tmp_path):
+    started = []
+
+    async def run():
+        gate = asyncio.Event()
+        queue = ProvisioningQueue(workers=1)
+        factory = make_factory(tmp_path, gate=gate, started=started)
+        first = queue.submit({"name": "first"}, factory)
+        second = queue.submit({"name": "second"}, factory)
+        await asyncio.sleep(0.05)
+        assert started == ["first"]
+        assert (first.state, second.state) == (RUNNING, "queued")
+        assert queue.active_jobs == [first, second]
+        gate.set()
+        await asyncio.gather(first.wait(), second.wait())
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert started == ["first", "second"]
+    assert (first.state, second.state) == (COMPLETED, COMPLETED)
+    assert first.server is not None and first.finished_at
+
+
+def test_failed_job_cleans_up(tmp_path):
+    async def run():
+        queue = ProvisioningQueue(workers=1)
+        job = queue.submit({"name": "broken"}, make_factory(tmp_path, error="download failed"))
+        await job.wait()
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.state == FAILED
+    assert job.error == "download failed"
+    assert not (tmp_path / "broken").exists()
+
+
+def test_cancel_running_job(tmp_path):
+    async def run():
+        gate = asyncio.Event()
+        queue = ProvisioningQueue(workers=1)
+        job = queue.submit({"name": "cancelled"}, make_factory(tmp_path, gate=gate))
+        await asyncio.sleep(0.05)
+        queue.cancel(job.id)
+        gate.set()
+        await job.wait()
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.state == CANCELLED
+    assert not (tmp_path / "cancelled").exists()
+
+
+def test_cancel_queued_job(tmp_path):
+    started = []
+
+    async def run():
+        gate = asyncio.Event()
+        queue = ProvisioningQueue(workers=1)
+        factory = make_factory(tmp_path, gate=gate, started=started)
+        running = queue.submit({"name": "running"}, factory)
+        queued = queue.submit({"name": "queued"}, factory)
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        gate.set()
+        await asyncio.gather(running.wait(), queued.wait())
+        return queued
+
+    queued = asyncio.run(run())
+
+    assert queued.state == CANCELLED
+    assert queued.task.cancelled()
+    assert started == ["running"]
+
+
+def test_task_cancellation_is_propagated(tmp_path):
+    async def run():
+        queue = ProvisioningQueue(workers=1)
+        job = queue.submit({"name": "shutdown"}, make_factory(tmp_path, gate=asyncio.Event()))
+        await asyncio.sleep(0.05)
+        job.task.cancel()
+        await job.wait()
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.task.cancelled()
+    assert job.state == CANCELLED
+    # cleaned up before the cancellation went on
+    assert not (tmp_path / "shutdown").exists()
+
+
+def test_history_keeps_unfinished_jobs(tmp_path):
+    async def run():
+        gate = asyncio.Event()
+        queue = ProvisioningQueue(workers=1, history_size=2)
+        factory = make_factory(tmp_path, gate=gate)
+        first = queue.submit({"name": "first"}, factory)
+        others = [queue.submit({"name": f"job{number}"}, factory) for number in range(4)]
+        assert len(queue.jobs) == 5
+        gate.set()
+        await asyncio.gather(*(job.wait() for job in [first, *others]))
+        return queue, others
+
+    queue, others = asyncio.run(run())
+
+    # only the latest finished ones are kept
+    assert queue.jobs == others[-2:]
@@ -0,0 +1,95 @@
+"""
+Tests of the JVM options built from the server settings
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings as mcssettings
+from modules.servers import jvm
+from modules.servers.jvm import AIKAR_PROFILE, ZGC_PROFILE, heap_size_mb, jvm_args
+
+
+def test_heap_size_mb():
+    assert heap_size_mb({"dedicated_ram": "2.5"}) == 2560
+    assert heap_size_mb({}) == 1024
+
+
+@pytest.fixture
+def host_ram(monkeypatch):
+    """Sets the host RAM, in GB"""
+    monkeypatch.setattr(mcssettings, "HOST_RESERVED_RAM_MB", 2048)
+    monkeypatch.setattr(mcssettings, "JVM_OVERHEAD_MB", 256)
+    monkeypatch.setattr(mcssettings, "JVM_OVERHEAD_RATIO", 0.1)
+    monkeypatch.setattr(mcssettings, "MODDED_OVERHEAD_MB", 512)
+
+    def set_ram(gb):
+        memory = SimpleNamespace(total=gb * 1024**3)
+        monkeypatch.setattr(jvm.psutil, "virtual_memory", lambda: memory)
+
+    return set_ram
+
+
+@pytest.mark.parametrize(
+    "ram_gb, jar_type, heap_mb",
+    [
+        # enough RAM: the size of the server type
+        (32, 0, 2048),
+        (32, 1, 4096),
+        (32, 2, 6144),
+        # small host: what's left after the reserve and overhead
+        (6, 1, 3072),
+        (6, 2, 2560),
+        # never below the minimum
+        (2, 2, 1024),
+    ],
+)
+def test_auto_heap(host_ram, ram_gb, jar_type, heap_mb):
+    host_ram(ram_gb)
+    settings = {"dedicated_ram": 12, "auto_heap": True, "jar_type": jar_type}
+    assert heap_size_mb(settings) == heap_mb
+    assert jvm_args(settings)[:2] == [f"-Xms{heap_mb}M", f"-Xmx{heap_mb}M"]
+
+
+def test_dedicated_ram_without_auto_heap(host_ram):
+    host_ram(32)
+    assert heap_size_mb({"dedicated_ram": 12, "auto_heap": False, "jar_type": 2}) == 12288
+
+
+def test_default_profile_only_sets_heap():
+    assert jvm_args({"dedicated_ram": 2}) == ["-Xms2048M", "-Xmx2048M"]
+
+
+def test_aikar_profile_large_heap():
+    small = jvm_args({"dedicated_ram": 4, "jvm_profile": AIKAR_PROFILE})
+    large = jvm_args({"dedicated_ram": 16, "jvm_profile": AIKAR_PROFILE})
+    assert "-XX:G1NewSizePercent=30" in small
+    assert "-XX:G1NewSizePercent=40" in large
+
+
+@pytest.mark.parametrize(
+    "java_major, gc, generational",
+    [
+        (11, "-XX:+UseG1GC", False),
+        (17, "-XX:+UseZGC", False),
+        (21, "-XX:+UseZGC", True),
+        (22, "-XX:+UseZGC", True),
+        (23, "-XX:+UseZGC", False),
+        (None, "-XX:+UseZGC", False),
+    ],
+)
+def test_zgc_flags_follow_java_version(java_major, gc, generational):
+    args = jvm_args({"dedicated_ram": 4, "jvm_profile": ZGC_PROFILE}, java_major)
+    assert gc in args
+    assert ("-XX:+ZGenerational" in args) == generational
+
+
+def test_large_pages_and_pretouch(monkeypatch):
+    settings = {"dedicated_ram": 1, "jvm_large_pages": True, "jvm_pretouch": True}
+
+    monkeypatch.setattr(jvm.platform, "system", lambda: "Linux")
+    assert jvm_args(settings)[-2:] == ["-XX:+UseTransparentHugePages", "-XX:+AlwaysPreTouch"]
+
+    monkeypatch.setattr(jvm.platform, "system", lambda: "Windows")
+    assert jvm_args(settings)[-2:] == ["-XX:+UseLargePages", "-XX:+AlwaysPreTouch"]
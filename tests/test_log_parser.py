@@ -0,0 +1,110 @@
+"""
+Tests of the console line parsing and classification
+"""
+
+import pytest
+
+from modules.servers import log_parser
+from modules.servers.log_parser import LogParser
+
+
+INFO = "[12:00:00] [Server thread/INFO]: "
+
+
+@pytest.mark.parametrize(
+    "line, fields",
+    [
+        (
+            "[12:34:56] [Server thread/INFO]: Done (3.2s)!",
+            ("12:34:56", "Server thread", "INFO", "Done (3.2s)!"),
+        ),
+        (
+            "[12:34:56] [Server thread/INFO] [minecraft/DedicatedServer]: Stopping server",
+            ("12:34:56", "Server thread", "INFO", "Stopping server"),
+        ),
+        (
+            "[18Oct2024 12:34:56.789] [Server thread/WARN] [net.minecraft.server.MinecraftServer/]:"
+            " Can't keep up!",
+            ("18Oct2024 12:34:56.789", "Server thread", "WARN", "Can't keep up!"),
+        ),
+        ("[12:34:56 INFO]: Saved the game", ("12:34:56", "", "INFO", "Saved the game")),
+        ("\tat java.lang.Thread.run", ("", "", "", "\tat java.lang.Thread.run")),
+    ],
+)
+def test_parse(line, fields):
+    event = LogParser.parse(line)
+    assert event.kind == log_parser.LINE
+    assert (event.time, event.thread, event.level, event.message) == fields
+
+
+@pytest.mark.parametrize(
+    "line, kind, data",
+    [
+        (INFO + 'Done (12.345s)! For help, type "help"', log_parser.READY, {"seconds": 12.345}),
+        (INFO + "Done (3,5s)!", log_parser.READY, {"seconds": 3.5}),
+        (INFO + "Steve_01 joined the game", log_parser.PLAYER_JOIN, {"player": "Steve_01"}),
+        (INFO + "Steve_01 left the game", log_parser.PLAYER_LEAVE, {"player": "Steve_01"}),
+        (
+            "[12:00:00] [Server thread/WARN]: Can't keep up! Is the server overloaded? "
+            "Running 2500ms or 50 ticks behind",
+            log_parser.LAG,
+            {"ms": 2500, "ticks": 50},
+        ),
+        ("[12:00:00 INFO]: TPS from last 1m, 5m, 15m: *20.0, 19.9", log_parser.TPS, {"tps": 20.0}),
+        ("[12:00:00 INFO]: TPS from last 1m, 5m, 15m: 17.5, 19.0", log_parser.TPS, {"tps": 17.5}),
+        (
+            INFO + "There are 1 of a max of 20 players online: Steve",
+            log_parser.PLAYER_LIST,
+            {"online": 1, "max": 20},
+        ),
+        (
+            "[12:00:00 INFO]: There are 0 out of maximum 20 players online.",
+            log_parser.PLAYER_LIST,
+            {"online": 0, "max": 20},
+        ),
+        (INFO + "Stopping the server", log_parser.STOPPING, None),
+        (INFO + "Saved the game", log_parser.SAVED, None),
+        ("java.lang.OutOfMemoryError: Java heap space", log_parser.OUT_OF_MEMORY, None),
+        (INFO + "This crash report has been saved to: crash.txt", log_parser.CRASH, None),
+        ("java.lang.IllegalStateException: Lock is no longer valid", log_parser.EXCEPTION, None),
+        ("Caused by: java.io.IOException: Broken pipe", log_parser.EXCEPTION, None),
+        ("[12:00:00] [Server thread/ERROR]: Error executing task", log_parser.EXCEPTION, None),
+        (
+            "jdk.internal.crac.mirror.CheckpointException: Failed to checkpoint",
+            log_parser.CHECKPOINT_FAILED,
+            None,
+        ),
+        ("An exception during a checkpoint operation:", log_parser.CHECKPOINT_FAILED, None),
+    ],
+)
+def test_classify(line, kind, data):
+    event = LogParser.classify(LogParser.parse(line))
+    assert event is not None
+    assert (event.kind, event.data) == (kind, data)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        INFO + "Preparing spawn area: 42%",
+        # not a player name: a chat message or a plugin message
+        INFO + "<Steve> I think everyone joined the game",
+        INFO + "No Errors found in config",
+        INFO + "Done preparing level",
+    ],
+)
+def test_classify_plain_lines(line):
+    assert LogParser.classify(LogParser.parse(line)) is None
+
+
+def test_feed_dispatches_events():
+    parser = LogParser()
+    lines, players = [], []
+    parser.subscribe(log_parser.LINE, lines.append)
+    parser.subscribe(log_parser.PLAYER_JOIN, lambda event: players.append(event.data["player"]))
+
+    parser.feed([INFO + "Alex joined the game", "plain output"])
+
+    assert [event.message for event in lines] == ["Alex joined the game", "plain output"]
+    assert players == ["Alex"]
+    assert parser.last_event.message == "plain output"
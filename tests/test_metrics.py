@@ -0,0 +1,88 @@
+"""
+Tests of the in-memory metrics time series
+"""
+
+import numpy as np
+
+from modules.servers.metrics import RingSeries, ServerMetrics
+
+
+def test_ring_series_buckets():
+    series = RingSeries(step=10, size=6)
+    for timestamp, value in ((100, 1), (105, 3), (112, 5)):
+        series.add(value, timestamp)
+
+    times, mins, maxs, sums, counts = series.query(0, 200)
+
+    assert times.tolist() == [100, 110]
+    assert mins.tolist() == [1, 5]
+    assert maxs.tolist() == [3, 5]
+    assert sums.tolist() == [4, 5]
+    assert counts.tolist() == [2, 1]
+
+
+def test_ring_series_wraparound():
+    series = RingSeries(step=10, size=4)
+    for timestamp in range(0, 100, 10):
+        series.add(timestamp, timestamp)
+
+    times, mins, _maxs, _sums, counts = series.query(0, 1000)
+
+    # only the last size buckets are kept, oldest first
+    assert times.tolist() == [60, 70, 80, 90]
+    assert mins.tolist() == [60, 70, 80, 90]
+    assert counts.tolist() == [1, 1, 1, 1]
+    assert series.span == 40
+
+
+def test_ring_series_reused_slot_starts_over():
+    series = RingSeries(step=10, size=2)
+    series.add(100, 0)
+    series.add(1, 20)  # same slot as 0, one lap later
+
+    _times, mins, maxs, sums, counts = series.query(-1, 100)
+
+    assert (mins.tolist(), maxs.tolist(), sums.tolist(), counts.tolist()) == ([1], [1], [1], [1])
+
+
+def test_ring_series_query_window():
+    series = RingSeries(step=10, size=10)
+    for timestamp in range(0, 100, 10):
+        series.add(1, timestamp)
+    # buckets after start up to end
+    assert series.query(20, 50)[0].tolist() == [30, 40, 50]
+
+
+def test_server_metrics_query_downsamples():
+    metrics = ServerMetrics(resolutions=[(1, 600), (10, 600)])
+    now = 100_000
+    for offset in range(600):
+        metrics.record({"cpu_usage": offset % 10, "tps": None}, timestamp=now - 599 + offset)
+
+    result = metrics.query("cpu_usage", window=600, points=60, now=now)
+
+    assert len(result["time"]) == 60
+    assert np.all(np.diff(result["time"]) > 0)
+    # every inner point merges ten seconds: one whole cycle of values
+    assert np.all(result["min"][1:-1] == 0)
+    assert np.all(result["max"][1:-1] == 9)
+    assert np.allclose(result["avg"][1:-1], 4.5)
+    assert "tps" not in metrics.series
+
+
+def test_server_metrics_query_picks_covering_resolution():
+    metrics = ServerMetrics(resolutions=[(1, 60), (60, 60)])
+    now = 100_000
+    for offset in range(0, 3600, 30):
+        metrics.record({"ram_usage": 1024}, timestamp=now - 3599 + offset)
+
+    result = metrics.query("ram_usage", window=3600, points=1000, now=now)
+
+    # the 1s ring only covers the last minute: the 60s one is used
+    assert len(result["time"]) == 60
+    assert np.all(result["avg"] == 1024)
+
+
+def test_server_metrics_query_unknown_metric():
+    result = ServerMetrics().query("players", window=60)
+    assert all(len(values) == 0 for values in result.values())
@@ -0,0 +1,141 @@
+"""
+Tests of the persistent metrics history and its compaction
+"""
+
+import pytest
+
+from config import settings as mcssettings
+from modules.servers import metrics_db as metrics_db_module
+from modules.servers.metrics_db import MetricsDatabase
+
+
+T0 = 1_200_000  # a whole minute
+TIERS = [(10, 3600), (60, 86400)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"value": T0}
+    monkeypatch.setattr(metrics_db_module.time, "time", lambda: now["value"])
+    monkeypatch.setattr(mcssettings, "METRICS_DB_FLUSH_INTERVAL", 30)
+    return now
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = MetricsDatabase(str(tmp_path / "metrics.db"), TIERS)
+    database._create_schema()
+    connection = database._connect()
+    yield database, connection
+    connection.close()
+
+
+def samples(connection, step: int) -> list[tuple]:
+    return connection.execute(
+        "SELECT ts, min, max, sum, count FROM samples WHERE step = ? ORDER BY ts", (step,)
+    ).fetchall()
+
+
+def fill(database, connection, minutes: int = 10):
+    """One sample every 5s, cycling through 0..11 every minute"""
+    pending = {}
+    for number in range(minutes * 12):
+        database._aggregate(pending, "server", T0 + number * 5, {"cpu_usage": number % 12})
+    database._flush(connection, {}, pending)
+
+
+def test_aggregate_merges_samples_of_a_bucket(database):
+    db, _connection = database
+    pending = {}
+    db._aggregate(pending, "server", T0 + 1, {"cpu_usage": 4, "tps": None})
+    db._aggregate(pending, "server", T0 + 9, {"cpu_usage": 2})
+    db._aggregate(pending, "server", T0 + 10, {"cpu_usage": 7})
+
+    assert pending == {
+        ("server", "cpu_usage", T0): (2.0, 4.0, 6.0, 2),
+        ("server", "cpu_usage", T0 + 10): (7.0, 7.0, 7.0, 1),
+    }
+
+
+def test_flush_merges_partly_written_bucket(database):
+    db, connection = database
+    series_ids = {}
+    for value in (5, 1):
+        pending = {}
+        db._aggregate(pending, "server", T0, {"cpu_usage": value})
+        db._flush(connection, series_ids, pending)
+        assert pending == {}
+
+    assert samples(connection, 10) == [(T0, 1.0, 5.0, 6.0, 2)]
+
+
+def test_compact_rolls_up_settled_buckets(database, clock):
+    db, connection = database
+    fill(db, connection)
+    clock["value"] = T0 + 900
+
+    db._compact(connection)
+
+    rollups = samples(connection, 60)
+    assert [row[0] for row in rollups] == [T0 + minute * 60 for minute in range(10)]
+    assert all(row[1:] == (0.0, 11.0, 66.0, 12) for row in rollups)
+    # settled = now - flush interval - raw step, floored to the tier step
+    assert db._compaction_marks(connection) == {60: T0 + 840}
+
+    # nothing new to roll up
+    db._compact(connection)
+    assert samples(connection, 60) == rollups
+
+
+def test_compact_skips_unsettled_buckets(database, clock):
+    db, connection = database
+    fill(db, connection)
+    clock["value"] = T0 + 330
+
+    db._compact(connection)
+
+    # raw buckets after now - 40s may still get samples: minute 4 isn't settled yet
+    assert [row[0] for row in samples(connection, 60)] == [T0 + minute * 60 for minute in range(4)]
+    assert db._compaction_marks(connection) == {60: T0 + 240}
+
+
+def test_compact_applies_retention(database, clock):
+    db, connection = database
+    fill(db, connection)
+    clock["value"] = T0 + 3600 + 300
+
+    db._compact(connection)
+
+    raw = samples(connection, 10)
+    assert raw[0][0] == T0 + 300
+    # the rollups outlive the raw rows
+    assert len(samples(connection, 60)) == 10
+
+
+def test_query_reads_rollups_and_recent_raw_rows(database, clock):
+    db, connection = database
+    fill(db, connection)
+    clock["value"] = T0 + 900
+    db._compact(connection)
+
+    result = db.query(["server", "other"], "cpu_usage", start=T0, end=T0 + 600, points=10)
+
+    assert result["server"]["time"] == [T0 + minute * 60 for minute in range(10)]
+    assert result["server"]["min"] == [0.0] * 10
+    assert result["server"]["max"] == [11.0] * 10
+    assert result["server"]["avg"] == [5.5] * 10
+    assert result["other"] == {"time": [], "min": [], "max": [], "avg": []}
+
+
+def test_forget(database):
+    db, connection = database
+    series_ids = {}
+    pending = {}
+    db._aggregate(pending, "server", T0, {"cpu_usage": 1})
+    db._aggregate(pending, "other", T0, {"cpu_usage": 2})
+    db._flush(connection, series_ids, pending)
+
+    db._forget(connection, series_ids, "server")
+
+    assert list(series_ids) == [("other", "cpu_usage")]
+    assert samples(connection, 10) == [(T0, 2.0, 2.0, 2.0, 1)]
@@ -0,0 +1,86 @@
+"""
+Tests of the detached server runner
+"""
+
+import json
+import socket
+from types import SimpleNamespace
+
+import pytest
+
+from modules.servers import runner as runner_module
+from modules.servers.runner import Client, Runner
+
+
+class Output:
+    """JVM stdout returning the given chunks"""
+
+    def __init__(self, chunks: list[bytes]):
+        self.chunks = list(chunks)
+
+    def read1(self, _size: int) -> bytes:
+        return self.chunks.pop(0) if self.chunks else b""
+
+
+@pytest.fixture
+def runner(tmp_path):
+    state_path = tmp_path / "state.json"
+    state_path.write_text(json.dumps({"token": "secret", "backlog_size": 1024}))
+    return Runner(str(state_path))
+
+
+def run_output(runner: Runner, chunks: list[bytes]):
+    runner.process = SimpleNamespace(stdout=Output(chunks))
+    runner._read_output()
+
+
+def test_ready_line_split_across_chunks(runner):
+    run_output(runner, [b"[12:00:00] [Server thread/INFO]: Do", b"ne (3.5", b"s)! For help\n"])
+    assert runner.state["ready"]
+    with open(runner.state_path, encoding="utf-8") as file:
+        assert json.load(file)["ready"]
+
+
+def test_ready_only_on_complete_line(runner):
+    run_output(runner, [b"[12:00:00] [Server thread/INFO]: Done (3.5s)!"])
+    assert not runner.state.get("ready")
+
+
+def test_backlog_keeps_latest_output(runner):
+    run_output(runner, [b"a" * 600, b"b" * 600, b"c" * 100])
+    assert b"".join(runner.backlog) == b"b" * 600 + b"c" * 100
+
+
+def test_slow_client_is_dropped(runner, monkeypatch):
+    monkeypatch.setattr(runner_module, "CLIENT_QUEUE_SIZE", 2)
+    ours, theirs = socket.socketpair()
+    # no sender thread: the client never catches up
+    slow = Client(ours)
+    runner.clients.append(slow)
+
+    run_output(runner, [b"line 1\n", b"line 2\n", b"line 3\n"])
+
+    assert runner.clients == []
+    assert slow.queue.get_nowait() == b"line 1\n"
+    theirs.close()
+
+
+def test_client_gets_backlog_then_live_output(runner):
+    ours, theirs = socket.socketpair()
+    runner.backlog.append(b"old\n")
+    client = Client(ours)
+    with runner._lock:
+        client.send(b"".join(runner.backlog))
+        runner.clients.append(client)
+
+    run_output(runner, [b"new\n"])
+    client.send(None)
+    runner._send_output(client)
+
+    theirs.settimeout(5)
+    received = b""
+    while chunk := theirs.recv(1024):
+        received += chunk
+    assert received == b"old\nnew\n"
+    assert runner.clients == []
+    theirs.close()
@@ -0,0 +1,139 @@
+"""
+Tests of the console ring buffer and the scrollback sessions
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings as mcssettings
+from modules.servers import scrollback as scrollback_module
+from modules.servers.scrollback import (
+    ConsoleRing,
+    Scrollback,
+    archive_first_line,
+    archive_line_count,
+    read_archive,
+)
+
+
+def test_ring_read(tmp_path):
+    ring = ConsoleRing(str(tmp_path / "session.ring"), capacity=1024)
+    ring.extend(["first", "second", "third"])
+
+    assert len(ring) == 3
+    assert ring.read(0, 10) == ["first", "second", "third"]
+    assert ring.read(1, 1) == ["second"]
+    assert ring.next_seq == 3
+    ring.close()
+
+
+def test_ring_wraparound(tmp_path):
+    # records are 4 bytes of length + 6 bytes of text: 10 fit in 100 bytes
+    ring = ConsoleRing(str(tmp_path / "session.ring"), capacity=100)
+    lines = [f"line{number:02}" for number in range(25)]
+    ring.extend(lines)
+
+    assert ring.first_seq == 15
+    assert ring.next_seq == 25
+    # lines keep their numbers once older ones are dropped
+    assert ring.read(0, 100) == lines[15:]
+    assert ring.read(20, 2) == ["line20", "line21"]
+    ring.close()
+
+
+def test_ring_recovery(tmp_path):
+    path = str(tmp_path / "session.ring")
+    ring = ConsoleRing(path, capacity=100)
+    ring.extend([f"line{number:02}" for number in range(13)])
+    # MCSC crashed: the ring is not archived
+    ring.close()
+
+    recovered = ConsoleRing(path, capacity=100)
+
+    assert (recovered.first_seq, recovered.next_seq) == (3, 13)
+    assert recovered.read(0, 100) == [f"line{number:02}" for number in range(3, 13)]
+    recovered.extend(["line13"])
+    assert recovered.read(12, 2) == ["line12", "line13"]
+    recovered.close()
+
+
+def test_ring_rejects_other_files(tmp_path):
+    path = tmp_path / "session.ring"
+    path.write_bytes(b"not a ring" * 10)
+    with pytest.raises(ValueError):
+        ConsoleRing(str(path), capacity=100)
+
+
+def test_archive_pages(tmp_path):
+    ring = ConsoleRing(str(tmp_path / "session.ring"), capacity=100)
+    ring.extend([f"line{number:02}" for number in range(15)])
+    archive_path = str(tmp_path / "session.log.gz")
+
+    ring.archive(archive_path)
+
+    assert not os.path.exists(tmp_path / "session.ring")
+    assert archive_first_line(archive_path) == 5
+    assert archive_line_count(archive_path) == 10
+    assert read_archive(archive_path, 2, 3) == ["line07", "line08", "line09"]
+    assert read_archive(archive_path, 8, 5) == ["line13", "line14"]
+
+
+@pytest.fixture
+def console_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcssettings, "CONSOLE_DIR", str(tmp_path))
+    monkeypatch.setattr(mcssettings, "CONSOLE_RING_SIZE", 100)
+    monkeypatch.setattr(mcssettings, "CONSOLE_SESSIONS_KEPT", 20)
+    # every session starts within the same second
+    clock = SimpleNamespace(strftime=lambda _format: "2026-03-14_12-00-00")
+    monkeypatch.setattr(scrollback_module, "time", clock)
+    return tmp_path
+
+
+def test_sessions_within_the_same_second(console_dir):
+    scrollback = Scrollback("server")
+    scrollback.start_session()
+    scrollback.append(["crashed"])
+    scrollback.start_session()
+    scrollback.append(["restarted"])
+    scrollback.start_session()
+    scrollback.end_session()
+
+    sessions = scrollback.sessions()
+
+    assert sessions == [
+        "2026-03-14_12-00-00_3",
+        "2026-03-14_12-00-00_2",
+        "2026-03-14_12-00-00",
+    ]
+    assert scrollback.read("2026-03-14_12-00-00", 0, 10) == ["crashed"]
+    assert scrollback.read("2026-03-14_12-00-00_2", 0, 10) == ["restarted"]
+
+
+def test_scrollback_recovers_rings(console_dir):
+    scrollback = Scrollback("server")
+    scrollback.start_session()
+    scrollback.append([f"line{number:02}" for number in range(12)])
+    session = scrollback.session
+    # MCSC crashed: the ring is left behind
+    scrollback.ring.close()
+
+    recovered = Scrollback("server")
+
+    assert recovered.sessions() == [session]
+    assert recovered.line_range(session) == (2, 12)
+    assert recovered.read(session, 10, 5) == ["line10", "line11"]
+
+
+def test_live_session(console_dir):
+    scrollback = Scrollback("server")
+    assert scrollback.append(["ignored"]) is None
+    scrollback.start_session()
+
+    assert scrollback.append(["a", "b"]) == 0
+    assert scrollback.append(["c"]) == 2
+    assert scrollback.is_live(scrollback.session)
+    assert scrollback.line_range(scrollback.session) == (0, 3)
+    assert scrollback.tail(2) == ["b", "c"]
+    scrollback.end_session()
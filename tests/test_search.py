@@ -0,0 +1,128 @@
+"""
+Tests of the log line timestamps of the search index
+"""
+
+import datetime
+import json
+import os
+
+import pytest
+
+from modules.search import DAY_MS, LineClock, SearchIndex
+from modules.servers.scrollback import archive_first_line
+
+
+DATE = datetime.date(2026, 3, 14)
+
+
+def epoch_ms(date: datetime.date, hours: int, minutes: int, seconds: int) -> int:
+    moment = datetime.datetime.combine(date, datetime.time(hours, minutes, seconds))
+    return int(moment.timestamp() * 1000)
+
+
+def test_timestamp():
+    clock = LineClock(DATE)
+    assert clock.timestamp("[12:34:56] [Server thread/INFO]: Done") == epoch_ms(DATE, 12, 34, 56)
+
+
+def test_timestamp_without_time_keeps_the_last_one():
+    clock = LineClock(DATE)
+    assert clock.timestamp("\tat java.lang.Thread.run") is None
+    clock.timestamp("[08:00:00] [Server thread/ERROR]: Exception")
+    assert clock.timestamp("\tat java.lang.Thread.run") == epoch_ms(DATE, 8, 0, 0)
+
+
+def test_timestamp_midnight_rollover():
+    clock = LineClock(DATE)
+    next_day = DATE + datetime.timedelta(days=1)
+    assert clock.timestamp("[23:59:58] a") == epoch_ms(DATE, 23, 59, 58)
+    assert clock.timestamp("[00:00:03] b") == epoch_ms(next_day, 0, 0, 3)
+    # a line slightly out of order is not a rollover
+    assert clock.timestamp("[00:00:01] c") == epoch_ms(next_day, 0, 0, 1)
+
+
+def test_ending_at_counts_midnights():
+    lines = ["[23:59:50] a", "[00:00:10] b", "[00:00:20] c"]
+    next_day = DATE + datetime.timedelta(days=1)
+    mtime = epoch_ms(next_day, 0, 0, 25) / 1000
+
+    clock = LineClock.ending_at(lines, mtime)
+
+    assert clock.day_ms == epoch_ms(DATE, 0, 0, 0)
+    assert [clock.timestamp(line) for line in lines][-1] == epoch_ms(next_day, 0, 0, 20)
+
+
+def test_ending_at_same_day():
+    lines = ["[10:00:00] a", "[11:00:00] b"]
+    clock = LineClock.ending_at(lines, epoch_ms(DATE, 11, 0, 5) / 1000)
+    assert clock.day_ms == epoch_ms(DATE, 0, 0, 0)
+
+
+def test_resume():
+    clock = LineClock(DATE)
+    clock.timestamp("[23:59:00] a")
+
+    resumed = LineClock.resume(clock.day_ms, clock.last_ms)
+
+    assert resumed.timestamp("[00:01:00] b") == epoch_ms(DATE, 23, 59, 0) + 2 * 60 * 1000
+    assert resumed.day_ms == clock.day_ms + DAY_MS
+
+
+def test_archive_first_line(tmp_path):
+    archive = tmp_path / "2026-03-14_12-00-00.log.gz"
+    assert archive_first_line(str(archive)) == 0
+
+    (tmp_path / "2026-03-14_12-00-00.json").write_text(json.dumps({"first_line": 1200}))
+    assert archive_first_line(str(archive)) == 1200
+
+
+def latest_log(tmp_path, lines: list[str]) -> str:
+    path = tmp_path / "latest.log"
+    path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+    return str(path)
+
+
+def indexed(connection) -> list[tuple]:
+    return connection.execute(
+        "SELECT line_no, text FROM lines WHERE source = 'logs/latest.log' ORDER BY line_no"
+    ).fetchall()
+
+
+@pytest.fixture
+def index(tmp_path):
+    search_index = SearchIndex(str(tmp_path / "search.db"))
+    search_index._create_schema()
+    connection = search_index._connect()
+    yield search_index, connection
+    connection.close()
+
+
+def test_scan_latest_appends(index, tmp_path):
+    search_index, connection = index
+    path = latest_log(tmp_path, ["[10:00:00] [main/INFO]: first"])
+    search_index._scan_latest(connection, "server", path)
+
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("[10:00:01] [main/INFO]: second\n[10:00:02] [main/INFO]: part")
+    search_index._scan_latest(connection, "server", path)
+
+    # the incomplete line waits for the next scan
+    assert indexed(connection) == [
+        (0, "[10:00:00] [main/INFO]: first"),
+        (1, "[10:00:01] [main/INFO]: second"),
+    ]
+
+
+def test_scan_latest_rotated_and_grown(index, tmp_path):
+    search_index, connection = index
+    old_lines = [f"[10:00:0{number}] [main/INFO]: old {number}" for number in range(3)]
+    path = latest_log(tmp_path, old_lines)
+    search_index._scan_latest(connection, "server", path)
+
+    # a new boot: the new file is already longer than the old one
+    new_lines = [f"[11:00:{number:02}] [main/INFO]: new {number}" for number in range(10)]
+    os.remove(path)
+    latest_log(tmp_path, new_lines)
+    search_index._scan_latest(connection, "server", path)
+
+    assert indexed(connection) == list(enumerate(new_lines))
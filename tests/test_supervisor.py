@@ -0,0 +1,119 @@
+"""
+Tests of the exit classification and restart backoff of the supervisor
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings as mcssettings
+from modules.servers import supervisor as supervisor_module
+from modules.servers.supervisor import (
+    CLEAN,
+    CRASH,
+    FAILED,
+    HUNG,
+    KILLED,
+    OOM_KILLED,
+    OUT_OF_MEMORY,
+    Supervisor,
+    classify_exit,
+)
+
+
+def make_server(**state) -> SimpleNamespace:
+    values = {
+        "uuid": "server",
+        "returncode": 0,
+        "hung": False,
+        "stop_requested": False,
+        "out_of_memory": False,
+        "crash_reported": False,
+    }
+    values.update(state)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.parametrize(
+    "state, reason",
+    [
+        ({"returncode": 0}, CLEAN),
+        ({"returncode": 1}, CRASH),
+        ({"returncode": 0, "crash_reported": True}, CRASH),
+        ({"returncode": None}, FAILED),
+        ({"returncode": 3, "out_of_memory": True}, OUT_OF_MEMORY),
+        ({"returncode": 1, "stop_requested": True}, CLEAN),
+        # killed by the watchdog: hung wins over the stop it requested
+        ({"returncode": -9, "stop_requested": True, "hung": True}, HUNG),
+    ],
+)
+def test_classify_exit(state, reason):
+    assert classify_exit(make_server(**state)) == reason
+
+
+@pytest.mark.parametrize("returncode", [-9, 137])
+def test_classify_exit_sigkill(monkeypatch, returncode):
+    server = make_server(returncode=returncode)
+
+    monkeypatch.setattr(supervisor_module, "_oom_kill_count", lambda: 7)
+    assert classify_exit(server, oom_kills_before=7) == KILLED
+    assert classify_exit(server, oom_kills_before=6) == OOM_KILLED
+    # unknown counter before the run: can't blame the OOM killer
+    assert classify_exit(server, oom_kills_before=None) == KILLED
+
+    monkeypatch.setattr(supervisor_module, "_oom_kill_count", lambda: None)
+    assert classify_exit(server, oom_kills_before=6) == KILLED
+
+
+@pytest.fixture
+def backoff_settings(monkeypatch):
+    monkeypatch.setattr(mcssettings, "RESTART_BACKOFF_BASE", 5)
+    monkeypatch.setattr(mcssettings, "RESTART_BACKOFF_MAX", 30)
+    monkeypatch.setattr(mcssettings, "RESTART_STABLE_UPTIME", 600)
+    monkeypatch.setattr(mcssettings, "CRASH_LOOP_COUNT", 5)
+    monkeypatch.setattr(mcssettings, "CRASH_LOOP_WINDOW", 900)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(supervisor_module.time, "time", lambda: now.value)
+    return now
+
+
+def test_backoff_doubles_up_to_max(backoff_settings, clock):
+    supervisor = Supervisor()
+    server = make_server()
+    delays = []
+    for _ in range(4):
+        delays.append(supervisor._backoff(server, uptime=1))
+        clock.value += 1
+    assert delays == [5, 10, 20, 30]
+
+
+def test_backoff_gives_up_in_crash_loop(backoff_settings, clock):
+    supervisor = Supervisor()
+    server = make_server()
+    for _ in range(mcssettings.CRASH_LOOP_COUNT - 1):
+        assert supervisor._backoff(server, uptime=1) is not None
+        clock.value += 1
+    assert supervisor._backoff(server, uptime=1) is None
+    # the count starts over after giving up
+    assert supervisor._backoff(server, uptime=1) == 5
+
+
+def test_backoff_forgets_old_crashes(backoff_settings, clock):
+    supervisor = Supervisor()
+    server = make_server()
+    assert supervisor._backoff(server, uptime=1) == 5
+    assert supervisor._backoff(server, uptime=1) == 10
+    clock.value += mcssettings.CRASH_LOOP_WINDOW + 1
+    assert supervisor._backoff(server, uptime=1) == 5
+
+
+def test_backoff_resets_after_stable_run(backoff_settings, clock):
+    supervisor = Supervisor()
+    server = make_server()
+    assert supervisor._backoff(server, uptime=1) == 5
+    assert supervisor._backoff(server, uptime=1) == 10
+    assert supervisor._backoff(server, uptime=mcssettings.RESTART_STABLE_UPTIME) == 5
@@ -0,0 +1,83 @@
+"""
+Tests of cloning server templates
+"""
+
+import json
+import socket
+
+import pytest
+
+from config import settings as mcssettings
+from modules.servers import templates as templates_module
+from modules.servers.templates import TEMPLATE_FILE, ServerTemplate, claim_port, set_port
+
+
+@pytest.fixture
+def claimed(monkeypatch):
+    """Starts every test without ports claimed by earlier ones"""
+    ports = set()
+    monkeypatch.setattr(templates_module, "_claimed_ports", ports)
+    return ports
+
+
+@pytest.fixture
+def template(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcssettings, "TEMPLATES_DIR", str(tmp_path / "templates"))
+    path = tmp_path / "templates" / "template"
+    (path / "files").mkdir(parents=True)
+    (path / "files" / "server.properties").write_text(
+        "motd=hello\nserver-port=25565\nlevel-name=world\n", encoding="utf-8"
+    )
+    (path / TEMPLATE_FILE).write_text(
+        json.dumps({"id": "template", "name": "t", "jar_type": 0, "version": "1.20"}),
+        encoding="utf-8",
+    )
+    return ServerTemplate(str(path))
+
+
+def read_properties(path) -> list[str]:
+    return path.read_text(encoding="utf-8").splitlines()
+
+
+def test_clone_into_sets_port(template, tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    template.clone_into(str(first), port=30001)
+    template.clone_into(str(second), port=30002)
+
+    assert read_properties(first / "server.properties") == [
+        "motd=hello",
+        "level-name=world",
+        "server-port=30001",
+    ]
+    assert "server-port=30002" in read_properties(second / "server.properties")
+    # the template itself is untouched
+    assert "server-port=25565" in read_properties(
+        tmp_path / "templates" / "template" / "files" / "server.properties"
+    )
+
+
+def test_set_port_creates_properties(tmp_path):
+    set_port(str(tmp_path), 30003)
+    assert read_properties(tmp_path / "server.properties") == ["server-port=30003"]
+
+
+def test_claim_port_skips_used_and_claimed(claimed, monkeypatch):
+    monkeypatch.setattr(templates_module, "_port_bindable", lambda port: True)
+    assert claim_port(25565, used={25565, 25566}) == 25567
+    # a concurrent clone doesn't get the same port
+    assert claim_port(25565, used={25565, 25566}) == 25568
+    assert claimed == {25567, 25568}
+
+
+def test_claim_port_skips_listening(claimed):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+        listener.bind(("", 0))
+        listener.listen()
+        busy = listener.getsockname()[1]
+        assert claim_port(busy, used=set()) != busy
+
+
+def test_claim_port_runs_out(claimed, monkeypatch):
+    monkeypatch.setattr(templates_module, "_port_bindable", lambda port: True)
+    with pytest.raises(ValueError):
+        claim_port(65535, used={65535})
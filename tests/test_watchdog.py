@@ -0,0 +1,150 @@
+"""
+Tests of the hang watchdog
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings as mcssettings
+from modules.servers import log_parser
+from modules.servers.log_parser import LogParser
+from modules.servers.models import READY, MinecraftServer
+from modules.servers.watchdog import STACK_DEPTH, Watchdog, is_stuck, server_thread_stack
+
+
+DUMP = """2026-10-18 12:00:00
+Full thread dump OpenJDK 64-Bit Server VM (21.0.2+13 mixed mode, sharing):
+
+"Reference Handler" #9 daemon prio=10 os_prio=0 cpu=0.12ms elapsed=60.00s tid=0x1 nid=0x2 waiting on condition
+   java.lang.Thread.State: RUNNABLE
+\tat java.lang.ref.Reference.waitForReferencePendingList(java.base@21.0.2/Native Method)
+
+"Server thread" #42 prio=5 os_prio=0 cpu=5000.00ms elapsed=60.00s tid=0x3 nid=0x4 runnable
+   java.lang.Thread.State: RUNNABLE
+\tat net.minecraft.world.level.Level.tick(Level.java:100)
+\tat net.minecraft.server.MinecraftServer.tickChildren(MinecraftServer.java:200)
+\tat net.minecraft.server.MinecraftServer.runServer(MinecraftServer.java:300)
+
+"Netty Epoll Server IO #0" #50 daemon prio=5 os_prio=0 tid=0x5 nid=0x6 runnable
+   java.lang.Thread.State: RUNNABLE
+\tat io.netty.channel.epoll.Native.epollWait(Native Method)
+"""
+
+
+def test_server_thread_stack():
+    state, frames = server_thread_stack(DUMP)
+    assert state == "RUNNABLE"
+    assert frames == [
+        "net.minecraft.world.level.Level.tick(Level.java:100)",
+        "net.minecraft.server.MinecraftServer.tickChildren(MinecraftServer.java:200)",
+        "net.minecraft.server.MinecraftServer.runServer(MinecraftServer.java:300)",
+    ]
+
+
+def test_server_thread_stack_last_thread():
+    dump = DUMP.split('"Netty Epoll')[0].rstrip() + "\n"
+    assert len(server_thread_stack(dump)[1]) == 3
+
+
+def test_server_thread_stack_without_server_thread():
+    assert server_thread_stack('"main" #1 prio=5\n   java.lang.Thread.State: WAITING\n') == (
+        None,
+        [],
+    )
+
+
+def test_is_stuck():
+    stack = [f"frame{number}" for number in range(STACK_DEPTH + 5)]
+    moved = ["elsewhere", *stack[1:]]
+    # only the top STACK_DEPTH frames are compared
+    deeper = stack[:STACK_DEPTH] + ["other"]
+
+    assert is_stuck([stack, list(stack), deeper])
+    assert not is_stuck([stack, moved, stack])
+    assert not is_stuck([stack])
+    assert not is_stuck([[], []])
+
+
+class SilentServer:
+    """A server that printed nothing for a while"""
+
+    def __init__(self, ping: bool, probe: bool):
+        self.uuid = "server"
+        self.state = READY
+        self.last_output = time.monotonic() - mcssettings.WATCHDOG_SILENCE - 1
+        self.unresponsive = False
+        self.hung = False
+        self.settings = {}
+        self._ping = ping
+        self._probe = probe
+
+    async def ping(self, _timeout: float) -> bool:
+        return self._ping
+
+    async def probe(self, _timeout: float) -> bool:
+        return self._probe
+
+
+@pytest.mark.parametrize(
+    "ping, probe, unresponsive",
+    [
+        (True, True, False),
+        # network threads still answer pings while the server thread is stuck
+        (True, False, True),
+        (False, True, True),
+    ],
+)
+def test_check_probes_the_server_thread(monkeypatch, ping, probe, unresponsive):
+    monkeypatch.setattr(mcssettings, "WATCHDOG_FAILED_PINGS", 2)
+    investigated = []
+
+    async def investigate(server):
+        investigated.append(server)
+        return {"stuck": True}
+
+    watchdog = Watchdog()
+    monkeypatch.setattr(watchdog, "investigate", investigate)
+    server = SilentServer(ping, probe)
+
+    asyncio.run(watchdog.check(server))
+    assert not server.unresponsive
+    asyncio.run(watchdog.check(server))
+
+    assert server.unresponsive == unresponsive
+    assert investigated == ([server] if unresponsive else [])
+    # restarts are opt-in
+    assert not server.hung
+
+
+class Stdin:
+    """JVM stdin of a server that answers list, or not"""
+
+    def __init__(self, parser: LogParser, answers: bool):
+        self.parser = parser
+        self.answers = answers
+
+    def write(self, data: bytes):
+        assert data == b"list\n"
+        if self.answers:
+            asyncio.get_running_loop().call_soon(
+                self.parser.feed, ["[12:00:00 INFO]: There are 0 out of maximum 20 players online."]
+            )
+
+    async def drain(self):
+        pass
+
+
+@pytest.mark.parametrize("answers", [True, False])
+def test_probe(answers):
+    parser = LogParser()
+    server = SimpleNamespace(
+        uuid="server",
+        log_parser=parser,
+        process=SimpleNamespace(stdin=Stdin(parser, answers)),
+    )
+
+    assert asyncio.run(MinecraftServer.probe(server, timeout=0.2)) == answers
+    assert not parser.subscribers[log_parser.PLAYER_LIST]